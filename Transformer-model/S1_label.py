@@ -1,4 +1,5 @@
 import os
+import sys
 import cv2
 import mediapipe as mp
 import numpy as np
@@ -9,6 +10,11 @@ import csv
 import time
 import json
 
+sys.path.append(os.path.join('..', 'src-web'))
+from video_source import VideoSource
+from landmark_track import LandmarkTrack
+from pose_backend import POSE_BACKEND, LocalPose
+
 # 增加 CSV 字段大小限制
 csv.field_size_limit(2147483647)
 
@@ -19,6 +25,7 @@ class PoseAnnotator:
         self.load_config()
         self.reset_variables()
         self.cap = None  # 初始化 cap 属性
+        self.landmark_track = None  # 整段视频的关键点缓存
 
     def load_config(self):
         with open('config.json', 'r') as f:
@@ -48,6 +55,9 @@ class PoseAnnotator:
         if self.cap:
             self.cap.release()
             self.cap = None
+        if self.landmark_track:
+            self.landmark_track.stop()
+            self.landmark_track = None
 
     def draw_skeleton(self, image, keypoints, connections, color, circle_radius=2):
         for connection in connections:
@@ -88,13 +98,17 @@ class PoseAnnotator:
         self.new_frame = False
         self.frame_to_show = None
 
-        self.cap = cv2.VideoCapture(self.video_path)
+        # 暂停后继续播放会再次进入这里，同一个视频复用已有的 VideoSource 和预览缓存
+        if self.cap is None or self.cap.path != self.video_path:
+            self.cap = VideoSource(self.video_path)
+            self.landmark_track = LandmarkTrack(self.video_path)
+            self.landmark_track.start()  # 后台计算整段视频的关键点，拖动/快进快退时直接使用
         self.keypoints_data = []
-        self.video_length = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.video_length = self.cap.frame_count
         self.video_playing = True
         self.start_time = time.time()
 
-        with self.mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as pose:
+        with LocalPose(POSE_BACKEND, min_detection_confidence=0.5, min_tracking_confidence=0.5) as pose:
             while self.cap.isOpened() and self.video_playing:
                 if self.paused:
                     root.update()
@@ -102,11 +116,11 @@ class PoseAnnotator:
 
                 times = [time.time()]
 
-                if not self.dragging:
-                    self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.current_frame)
-                ret, frame = self.cap.read()
+                # 顺序播放时不再 seek，只有跳转后 current_frame 变化时才会定位
+                ret, frame = self.cap.read(None if self.dragging else self.current_frame)
                 if not ret:
                     break
+                self.video_length = self.cap.frame_count  # 帧索引建立后会更新为真实帧数
 
                 times.append(time.time())  # Read frame time
                 if not self.dragging:
@@ -131,8 +145,7 @@ class PoseAnnotator:
                 for step, duration in zip(steps, durations):
                     print(f"{step} time: {duration:.4f}s")
 
-        self.video_playing = False
-        self.cap.release()
+        self.video_playing = False  # cap 保留到 stop_video_playback，播放结束后仍可拖动/快进快退
         cv2.destroyAllWindows()
 
     def save_annotations_to_csv(self):
@@ -365,10 +378,24 @@ class PoseAnnotationApp:
             self.update_annotation_list()
 
     def update_video_to_frame(self, frame_number):
-        self.pose_annotator.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
-        ret, frame = self.pose_annotator.cap.read()
-        if ret:
-            with self.pose_annotator.mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as pose:
+        if self.pose_annotator.cap is None:
+            return
+        # 从预览缓存取缩小后的帧，复制一份避免把骨骼画进缓存
+        preview = self.pose_annotator.cap.preview(frame_number)
+        if preview is None:
+            return
+
+        frame = preview.copy()
+        landmark_track = self.pose_annotator.landmark_track
+        if landmark_track is not None and landmark_track.is_ready(frame_number):
+            # 关键点已缓存，直接绘制骨骼
+            keypoints = landmark_track.keypoints(frame_number)
+            if keypoints:
+                self.pose_annotator.draw_skeleton(frame, keypoints, self.pose_annotator.mp_pose.POSE_CONNECTIONS,
+                                                  (0, 255, 0))
+            self.pose_annotator.update_video_panel(Image.fromarray(frame), video_panel)
+        else:
+            with LocalPose(POSE_BACKEND, min_detection_confidence=0.5, min_tracking_confidence=0.5) as pose:
                 image = self.pose_annotator.process_frame(frame, pose)
                 self.pose_annotator.update_video_panel(image, video_panel)
 
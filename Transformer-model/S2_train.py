@@ -1,6 +1,6 @@
 import os
+import sys
 import cv2
-import mediapipe as mp
 import numpy as np
 import torch
 import torch.nn as nn
@@ -12,11 +12,13 @@ import pandas as pd
 from sklearn.preprocessing import LabelEncoder
 from sklearn.model_selection import train_test_split
 
+sys.path.append(os.path.join('..', 'src-web'))
+from pose_backend import POSE_BACKEND, create_pose_backend
+
 
 # MediaPipe 数据提取函数
-def extract_mediapipe_data(video_path):
-    mp_pose = mp.solutions.pose
-    pose = mp_pose.Pose(static_image_mode=False, min_detection_confidence=0.5, min_tracking_confidence=0.5)
+def extract_mediapipe_data(video_path, backend=POSE_BACKEND):
+    pose = create_pose_backend(backend)
 
     cap = cv2.VideoCapture(video_path)
     frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
@@ -26,17 +28,16 @@ def extract_mediapipe_data(video_path):
 
     keypoints_data = []
 
-    for _ in tqdm(range(frame_count), desc="提取MediaPipe数据"):
+    for frame_index in tqdm(range(frame_count), desc="提取MediaPipe数据"):
         success, image = cap.read()
         if not success:
             break
 
         image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        results = pose.process(image)
+        landmarks = pose.process(image, int(frame_index * 1000 / max(fps, 1)))
 
-        if results.pose_landmarks:
-            landmarks = results.pose_landmarks.landmark
-            keypoints = [(lm.x, lm.y, lm.z) for lm in landmarks]
+        if landmarks is not None:
+            keypoints = [tuple(point) for point in landmarks[:, :3].tolist()]
             keypoints_data.append(keypoints)
         else:
             # 如果没有检测到姿势，添加一个全零的帧
@@ -0,0 +1,66 @@
+import cv2
+
+from ball_tracker import BallTracker, ball_boxes, roi_windows, detect_in_windows, ROI_SIZE
+from motion_gate import MotionGate
+from determine_region import RegionIndex, REGION_DIVISION_FILE
+
+
+class BallStage:
+    """
+    逐帧的球检测流程 (real-time.py 和 src-web/match_pipeline.py 共用):
+    MOG2 前景掩码 -> 运动门控 -> 卡尔曼跟踪 + YOLO (ROI / 全帧) -> 弹跳检测和落点区域。
+
+    帧必须按顺序传入 process()，MOG2 和跟踪器都有状态。
+    predict_args 原样传给 YOLO 模型 (conf、device、verbose 等)。
+    """
+
+    def __init__(self, model, detect_every=4, use_roi=True, region_path=REGION_DIVISION_FILE, **predict_args):
+        self.model = model
+        self.predict_args = predict_args
+
+        self.bg_subtractor = cv2.createBackgroundSubtractorMOG2(history=100, varThreshold=25, detectShadows=False)
+        self.kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+        self.tracker = BallTracker(detect_every=detect_every, roi_size=ROI_SIZE if use_roi else None)
+        self.motion_gate = MotionGate(propose_rois=use_roi)
+        self.region_index = RegionIndex(region_path)
+        self.foreground_mask = None
+
+    def detect_batch(self, crops):
+        # 所有 ROI 一次批量推理，检测框为窗口坐标；只转换裁剪出的部分
+        crops = [cv2.cvtColor(crop, cv2.COLOR_GRAY2RGB) for crop in crops]
+        results = self.model(crops, imgsz=ROI_SIZE, **self.predict_args)
+        return [ball_boxes([result]) for result in results]
+
+    def detect(self, centers):
+        centers = self.motion_gate.gate(centers)
+        if centers is None:
+            foreground_rgb = cv2.cvtColor(self.foreground_mask, cv2.COLOR_GRAY2RGB)
+            return ball_boxes(self.model(foreground_rgb, **self.predict_args))
+        # 空列表表示没有运动: 没有窗口，不运行 YOLO
+        windows = roi_windows(centers, self.foreground_mask.shape, ROI_SIZE)
+        return detect_in_windows(self.detect_batch, self.foreground_mask, windows)
+
+    def process(self, frame):
+        """
+        处理一帧。
+
+        返回:
+        - ball_box: 当前帧的球框 [x1, y1, x2, y2, conf, cls] (检测或预测)，没有轨迹时为 None
+        - bounce: (帧号, 球框, 区域名或 None, 速度 [vx, vy] 像素/帧)，本帧没有检测到弹跳时为 None
+        """
+        foreground_mask = self.bg_subtractor.apply(frame)
+        self.foreground_mask = cv2.morphologyEx(foreground_mask, cv2.MORPH_OPEN, self.kernel)
+        self.motion_gate.update(self.foreground_mask)
+
+        ball_box = self.tracker.step(self.detect)
+        bounce = self.tracker.check_bounce()
+        if bounce is not None:
+            bounce_frame, bounce_box, velocity = bounce
+            # 与 determine_region 相同: 按球框左上角判断区域
+            region = self.region_index.classify([bounce_box[:2]])[0]
+            bounce = (bounce_frame, bounce_box, region, velocity)
+        return ball_box, bounce
+
+    @property
+    def yolo_runs(self):
+        return self.tracker.detections_run - self.motion_gate.skipped
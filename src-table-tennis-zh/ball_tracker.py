@@ -0,0 +1,368 @@
+import numpy as np
+
+BALL_CLASS = 3  # YOLO 模型中球的类别
+
+# 2 自由度卡方分布 99.9% 分位数: 马氏距离平方超过该值的检测框不属于当前轨迹
+GATE_THRESHOLD = 13.8
+
+ROI_SIZE = 192  # ROI 检测的裁剪窗口边长 (像素)，取 YOLO 步长 32 的倍数
+
+
+class BallKalmanFilter:
+    """
+    匀加速运动模型的卡尔曼滤波，状态为 [x, y, vx, vy, ax, ay]，单位为像素和帧 (与帧率无关)。
+    观测为检测框中心 [x, y]。
+    """
+
+    def __init__(self, position, jerk_std=2.0, measurement_std=3.0):
+        self.x = np.zeros(6)
+        self.x[:2] = position
+        # 新轨迹的速度和加速度未知，初始方差取大值
+        self.P = np.diag([measurement_std ** 2] * 2 + [30.0 ** 2] * 2 + [5.0 ** 2] * 2)
+
+        self.F = np.eye(6)
+        self.F[0, 2] = self.F[1, 3] = 1.0
+        self.F[2, 4] = self.F[3, 5] = 1.0
+        self.F[0, 4] = self.F[1, 5] = 0.5
+
+        # 加加速度 (jerk) 为白噪声: Q = G G^T σ²
+        G = np.array([1 / 6, 1 / 6, 1 / 2, 1 / 2, 1.0, 1.0])
+        axis_mask = np.array([[1, 0, 1, 0, 1, 0], [0, 1, 0, 1, 0, 1]], dtype=float)
+        self.Q = sum(np.outer(G * mask, G * mask) for mask in axis_mask) * jerk_std ** 2
+
+        self.H = np.zeros((2, 6))
+        self.H[0, 0] = self.H[1, 1] = 1.0
+        self.R = np.eye(2) * measurement_std ** 2
+
+    def predict(self):
+        self.x = self.F @ self.x
+        self.P = self.F @ self.P @ self.F.T + self.Q
+        return self.x[:2]
+
+    def innovation(self, measurements):
+        """返回 (残差 (N, 2), 残差协方差 S, 马氏距离平方 (N,))"""
+        residuals = np.asarray(measurements, dtype=float).reshape(-1, 2) - self.x[:2]
+        S = self.H @ self.P @ self.H.T + self.R
+        distances = np.einsum('ni,ij,nj->n', residuals, np.linalg.inv(S), residuals)
+        return residuals, S, distances
+
+    def update(self, measurement):
+        residuals, S, _ = self.innovation(measurement)
+        K = self.P @ self.H.T @ np.linalg.inv(S)
+        self.x = self.x + K @ residuals[0]
+        self.P = (np.eye(6) - K @ self.H) @ self.P
+        return self.x[:2]
+
+    @property
+    def position_std(self):
+        """位置不确定度 (像素)，取 x/y 方差中较大的一个"""
+        return float(np.sqrt(max(self.P[0, 0], self.P[1, 1])))
+
+
+class BallTracker:
+    """
+    球的跟踪: 卡尔曼滤波逐帧预测，YOLO 只在需要时运行。
+
+    需要检测的情况 (needs_detection):
+    - 没有轨迹 (刚开始或跟丢)
+    - 距上次检测已过 detect_every 帧
+    - 位置不确定度超过 max_position_std (快速/变向运动时预测误差增长得更快)
+
+    检测框经过门限 (马氏距离) 筛选后更新轨迹；连续 max_missed 次检测都没有匹配时放弃轨迹。
+    输出的框格式与 YOLO 的 boxes.data 行相同: [x1, y1, x2, y2, conf, cls]。
+
+    roi_size 不为 None 时为 ROI 检测模式: 有稳定轨迹时只在预测位置附近 roi_size 的窗口内检测，
+    没有轨迹、上次检测未匹配或预测不确定度超出窗口时退回全帧检测。
+    """
+
+    def __init__(self, detect_every=4, max_position_std=15.0, max_missed=3, gate_threshold=GATE_THRESHOLD,
+                 bounce_speed=2.0, min_descent_frames=3, min_bounce_drop=10.0,
+                 min_bounce_gap=5, roi_size=None):
+        self.detect_every = detect_every
+        self.roi_size = roi_size
+        self.max_position_std = max_position_std
+        self.max_missed = max_missed
+        self.gate_threshold = gate_threshold
+
+        self.filter = None
+        self.box_size = None  # 最近一次检测框的宽和高
+        self.confidence = 0.0
+        self.frames_since_detection = 0
+        self.missed = 0
+
+        self.frames = 0
+        self.detections_run = 0
+        self.full_frame_runs = 0  # 其中全帧检测的次数
+
+        # 弹跳判断: 滤波后的 vy 由向下 (> bounce_speed) 变为向上 (< -bounce_speed)，
+        # 比逐帧比较 y 更不容易被检测框抖动触发。
+        # 迟滞: 连续 min_descent_frames 帧向下才算下落 (最高点附近 vy 的噪声会越过 ±bounce_speed)，
+        # 下落至少 min_bounce_drop 像素，且与上一次弹跳至少间隔 min_bounce_gap 帧
+        self.bounce_speed = bounce_speed
+        self.min_descent_frames = min_descent_frames
+        self.min_bounce_drop = min_bounce_drop
+        self.min_bounce_gap = min_bounce_gap
+        self.descent_frames = 0  # 连续 vy > bounce_speed 的帧数
+        self.descending = False
+        self.descent_top = None  # 开始下落时球框的下边缘 y
+        self.lowest = None  # 下落阶段 y 最大的 (帧号, 球框, 速度)
+        self.last_bounce_frame = None
+
+    def reset(self):
+        self.filter = None
+        self.missed = 0
+        self.descent_frames = 0
+        self.descending = False
+        self.lowest = None
+
+    def needs_detection(self):
+        if self.filter is None:
+            return True
+        return (self.frames_since_detection >= self.detect_every
+                or self.filter.position_std > self.max_position_std)
+
+    def predict(self):
+        """进入新的一帧: 有轨迹时向前预测一帧"""
+        self.frames += 1
+        self.frames_since_detection += 1
+        if self.filter is not None:
+            self.filter.predict()
+
+    def update(self, detections):
+        """
+        用本帧的检测结果更新轨迹。
+
+        参数:
+        - detections: (N, 6) [x1, y1, x2, y2, conf, cls]，只包含球的检测框，可以为空
+
+        返回:
+        - 匹配的检测框，没有匹配时返回 None
+        """
+        self.detections_run += 1
+        self.frames_since_detection = 0
+        detections = np.asarray(detections, dtype=float).reshape(-1, 6)
+
+        if len(detections) == 0:
+            self.record_miss()
+            return None
+
+        centers = (detections[:, :2] + detections[:, 2:4]) / 2
+        if self.filter is None:
+            # 与原来的逐帧逻辑相同: 取 y 最小 (最靠上) 的检测框开始新轨迹
+            match = int(np.argmin(detections[:, 1]))
+            self.filter = BallKalmanFilter(centers[match])
+        else:
+            _, _, distances = self.filter.innovation(centers)
+            match = int(np.argmin(distances))
+            if distances[match] > self.gate_threshold:
+                self.record_miss()
+                return None
+            self.filter.update(centers[match])
+
+        self.missed = 0
+        self.box_size = detections[match, 2:4] - detections[match, :2]
+        self.confidence = detections[match, 4]
+        return detections[match]
+
+    def record_miss(self):
+        self.missed += 1
+        if self.missed >= self.max_missed:
+            self.reset()
+
+    def search_centers(self, extra_centers=()):
+        """
+        ROI 检测的窗口中心: 轨迹的预测位置加上调用方提供的其他候选位置。
+        返回 None 表示需要全帧检测。
+        """
+        if self.roi_size is None or self.filter is None or self.missed > 0:
+            return None
+        # 3 倍标准差加上半个球框仍要落在窗口内，否则预测已不可靠
+        if 3 * self.filter.position_std + max(self.box_size) / 2 > self.roi_size / 2:
+            return None
+        return [tuple(self.filter.x[:2])] + [tuple(center) for center in extra_centers]
+
+    def step(self, detect, extra_centers=()):
+        """
+        处理一帧: 预测，需要时调用 detect(centers) 更新轨迹。
+
+        参数:
+        - detect: centers -> (N, 6) 球的检测框 (画面坐标)。centers 为 None 时检测全帧，
+          否则只检测以这些点为中心的窗口 (见 roi_windows / detect_in_windows)
+        - extra_centers: 除预测位置外需要检测的候选位置
+
+        返回:
+        - 当前帧的球框 (检测或预测)，没有轨迹时返回 None
+        """
+        self.predict()
+        if self.needs_detection():
+            centers = self.search_centers(extra_centers)
+            if centers is None:
+                self.full_frame_runs += 1
+            self.update(detect(centers))
+        return self.box()
+
+    def check_bounce(self):
+        """
+        每帧 step() 之后调用。检测到弹跳时返回 (帧号, 球框, 速度)，球框为下落阶段最低点，
+        速度为该帧滤波后的 [vx, vy] (像素/帧)；否则返回 None。
+        帧号从 0 开始计数。
+        """
+        box = self.box()
+        if box is None:
+            return None
+        vy = self.filter.x[3]
+        self.descent_frames = self.descent_frames + 1 if vy > self.bounce_speed else 0
+        if self.descent_frames >= self.min_descent_frames and not self.descending:
+            self.descending = True
+            self.descent_top = box[3]
+        if self.descending and (self.lowest is None or box[3] > self.lowest[1][3]):
+            self.lowest = (self.frames - 1, box, self.filter.x[2:4].copy())
+        if self.descending and vy < -self.bounce_speed:
+            bounce = self.lowest
+            self.descending = False
+            self.lowest = None
+            if bounce[1][3] - self.descent_top < self.min_bounce_drop:
+                return None
+            if self.last_bounce_frame is not None and bounce[0] - self.last_bounce_frame < self.min_bounce_gap:
+                return None
+            self.last_bounce_frame = bounce[0]
+            return bounce
+        return None
+
+    def box(self):
+        if self.filter is None:
+            return None
+        center = self.filter.x[:2]
+        half = self.box_size / 2
+        return np.array([center[0] - half[0], center[1] - half[1], center[0] + half[0], center[1] + half[1],
+                         self.confidence, BALL_CLASS])
+
+    @property
+    def velocity(self):
+        return None if self.filter is None else self.filter.x[2:4]
+
+
+def ball_boxes(results):
+    """YOLO 结果 -> 球的检测框 (N, 6)"""
+    all_boxes = [result.boxes.data.cpu().numpy() for result in results if len(result) > 0]
+    if not all_boxes:
+        return np.empty((0, 6))
+    all_boxes = np.vstack(all_boxes)
+    return all_boxes[all_boxes[:, 5] == BALL_CLASS]
+
+
+def roi_windows(centers, frame_shape, size=ROI_SIZE):
+    """
+    候选中心点 -> 裁剪窗口列表 [(x0, y0, x1, y1)]，窗口大小相同 (便于批量推理) 并限制在画面内。
+    中心点已位于某个窗口的中间区域 (距边缘 size / 4 以上) 时不再新建窗口。
+    """
+    height, width = frame_shape[:2]
+    size_x, size_y = min(size, width), min(size, height)
+    margin_x, margin_y = size_x / 4, size_y / 4
+    windows = []
+    for cx, cy in centers:
+        if any(x0 + margin_x <= cx <= x1 - margin_x and y0 + margin_y <= cy <= y1 - margin_y
+               for x0, y0, x1, y1 in windows):
+            continue
+        x0 = int(np.clip(round(cx - size_x / 2), 0, width - size_x))
+        y0 = int(np.clip(round(cy - size_y / 2), 0, height - size_y))
+        windows.append((x0, y0, x0 + size_x, y0 + size_y))
+    return windows
+
+
+def detect_in_windows(detect_batch, image, windows):
+    """
+    在多个窗口内检测并把检测框映射回画面坐标。
+
+    参数:
+    - detect_batch: 图像列表 -> 每张图像的 (N, 6) 检测框列表 (一次批量推理)
+    - windows: roi_windows() 的结果
+
+    返回:
+    - (M, 6) 画面坐标的检测框；窗口重叠时同一个球可能出现多次，由 BallTracker 的门限匹配选取
+    """
+    if not windows:
+        return np.empty((0, 6))
+    crops = [image[y0:y1, x0:x1] for x0, y0, x1, y1 in windows]
+    mapped = []
+    for (x0, y0, _, _), boxes in zip(windows, detect_batch(crops)):
+        boxes = np.array(boxes, dtype=float).reshape(-1, 6)
+        boxes[:, [0, 2]] += x0
+        boxes[:, [1, 3]] += y0
+        mapped.append(boxes)
+    return np.vstack(mapped)
+
+
+if __name__ == "__main__":
+    # 模拟测试: 带弹跳的抛物线轨迹，比较逐帧检测与每 N 帧检测的检测次数和弹跳点
+    rng = np.random.default_rng(0)
+
+    def simulate(frames=600, bounce_every=45, table_y=240):
+        # 球始终在画面内: 每 bounce_every 帧被击起一次，中间落在球台 (y = table_y) 上反弹
+        positions = []
+        x, y, vx, vy = 50.0, 200.0, 6.0, -4.0
+        for index in range(frames):
+            vy += 0.35  # 重力
+            x += vx
+            y += vy
+            if y > table_y:  # 落在球台上反弹
+                y = 2 * table_y - y
+                vy = -abs(vy) * 0.9
+            if x > 600 or x < 20:
+                vx = -vx
+            if index % bounce_every == 0:
+                vy = -7.9  # 击球
+            positions.append((x, y))
+        return np.array(positions)
+
+    def bounces(ys):
+        # 与 real-time.py 相同的判断: 前一帧 y 比前后两帧都大
+        return [i for i in range(1, len(ys) - 1) if ys[i - 1] < ys[i] and ys[i + 1] < ys[i]]
+
+    truth = simulate()
+    true_bounces = bounces(truth[:, 1])
+
+    frame_shape = (720, 1280)
+    frame_pixels = frame_shape[0] * frame_shape[1]
+
+    for detect_every, roi_size in [(1, None), (2, None), (4, None), (8, None), (1, ROI_SIZE), (4, ROI_SIZE)]:
+        tracker = BallTracker(detect_every=detect_every, roi_size=roi_size)
+        found = []
+        speed_errors = []
+        pixels = 0
+        for index, (x, y) in enumerate(truth):
+            def detect(centers):
+                global pixels
+                noisy = np.array([x, y]) + rng.normal(0, 1.5, 2)
+                ball = np.array([[noisy[0] - 4, noisy[1] - 4, noisy[0] + 4, noisy[1] + 4, 0.9, BALL_CLASS]])
+                if centers is None:
+                    pixels += frame_pixels
+                    return ball
+
+                def detect_batch(crops):
+                    global pixels
+                    pixels += sum(crop.shape[0] * crop.shape[1] for crop in crops)
+                    # 模拟的检测器只在球完全位于窗口内时检测到球 (窗口坐标)
+                    return [ball - [x0, y0, x0, y0, 0, 0] if x0 <= ball[0, 0] and ball[0, 2] <= x1
+                            and y0 <= ball[0, 1] and ball[0, 3] <= y1 else np.empty((0, 6))
+                            for x0, y0, x1, y1 in windows]
+
+                windows = roi_windows(centers, frame_shape, roi_size)
+                return detect_in_windows(detect_batch, np.zeros(frame_shape, dtype=np.uint8), windows)
+
+            tracker.step(detect)
+            bounce = tracker.check_bounce()
+            if bounce is not None:
+                found.append(bounce[0])
+                # 落台前一帧的真实速度 (像素/帧)
+                true_speed = np.linalg.norm(truth[bounce[0]] - truth[max(bounce[0] - 1, 0)])
+                speed_errors.append(abs(np.linalg.norm(bounce[2]) - true_speed) / true_speed)
+
+        hits = sum(any(abs(b - t) <= 2 for b in found) for t in true_bounces)
+        # 与任何真实弹跳都相差超过 2 帧的报告为误报
+        false_positives = sum(not any(abs(b - t) <= 2 for t in true_bounces) for b in found)
+        mode = f"roi {roi_size}" if roi_size else "full"
+        print(f"{mode:<8} detect every {detect_every}: YOLO runs {tracker.detections_run:4d}/{len(truth)} "
+              f"(full frame {tracker.full_frame_runs:3d})  pixels {pixels / (len(truth) * frame_pixels) * 100:5.1f}%  "
+              f"bounces found {hits}/{len(true_bounces)}, false positives {false_positives}, "
+              f"speed error {np.median(speed_errors) * 100:.0f}%")
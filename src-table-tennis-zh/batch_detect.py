@@ -0,0 +1,159 @@
+import time
+
+import cv2
+import numpy as np
+
+# 每个检测框一行: 帧号、类别、置信度、xyxy (像素)
+DETECTION_DTYPE = np.dtype([('frame', np.int32), ('cls', np.int16), ('conf', np.float32), ('xyxy', np.float32, 4)])
+
+BATCH_SIZES = (1, 4, 8, 16)
+
+
+class DetectionArray:
+    """
+    逐帧检测结果的紧凑数组 (DETECTION_DTYPE)，按帧号顺序追加，容量不足时加倍。
+
+    - append(): 追加一帧的 (N, 6) [x1, y1, x2, y2, conf, cls] 检测框 (YOLO boxes.data 的格式)
+    - frame(): 取出某一帧的检测框，帧号有序，二分查找
+    """
+
+    def __init__(self, capacity=1024):
+        self.data = np.zeros(capacity, dtype=DETECTION_DTYPE)
+        self.size = 0
+        self.frames = 0  # 已追加的帧数 (包括没有检测框的帧)
+
+    def append(self, frame_index, boxes):
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 6)
+        end = self.size + len(boxes)
+        if end > len(self.data):
+            grown = np.zeros(max(end, 2 * len(self.data)), dtype=DETECTION_DTYPE)
+            grown[:self.size] = self.data[:self.size]
+            self.data = grown
+        rows = self.data[self.size:end]
+        rows['frame'] = frame_index
+        rows['cls'] = boxes[:, 5]
+        rows['conf'] = boxes[:, 4]
+        rows['xyxy'] = boxes[:, :4]
+        self.size = end
+        self.frames = max(self.frames, frame_index + 1)
+
+    @property
+    def detections(self):
+        return self.data[:self.size]
+
+    def frame(self, frame_index):
+        frames = self.detections['frame']
+        start, end = np.searchsorted(frames, [frame_index, frame_index + 1])
+        return self.detections[start:end]
+
+    def __len__(self):
+        return self.size
+
+    def save(self, path):
+        np.save(path, self.detections)
+
+
+def foreground_preprocess():
+    """与 real-time.py 相同的前处理: MOG2 前景掩码 + 开运算，转为 RGB (MOG2 有状态，需按帧顺序调用)"""
+    bg_subtractor = cv2.createBackgroundSubtractorMOG2(history=100, varThreshold=25, detectShadows=False)
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+
+    def preprocess(frame):
+        foreground_mask = cv2.morphologyEx(bg_subtractor.apply(frame), cv2.MORPH_OPEN, kernel)
+        return cv2.cvtColor(foreground_mask, cv2.COLOR_GRAY2RGB)
+
+    return preprocess
+
+
+def read_batches(cap, batch_size, preprocess=None, max_frames=None):
+    """按顺序解码，产出 (第一帧的帧号, 图像列表)"""
+    frame_index = 0
+    batch = []
+    while max_frames is None or frame_index + len(batch) < max_frames:
+        success, frame = cap.read()
+        if not success:
+            break
+        batch.append(preprocess(frame) if preprocess is not None else frame)
+        if len(batch) == batch_size:
+            yield frame_index, batch
+            frame_index += len(batch)
+            batch = []
+    if batch:
+        yield frame_index, batch
+
+
+def detect_video(model, video_path, batch_size=8, preprocess=None, max_frames=None, **predict_args):
+    """
+    离线批量检测整个视频。
+
+    参数:
+    - model: ultralytics 的 YOLO / YOLOv10 模型
+    - preprocess: 帧 -> 检测器输入图像 (如 foreground_preprocess())，None 时直接使用原帧
+    - predict_args: 传给 model.predict 的参数 (conf、device、imgsz 等)
+
+    返回:
+    - (DetectionArray, 统计信息 {'frames', 'decode_seconds', 'detect_seconds'})
+    """
+    cap = cv2.VideoCapture(video_path)
+    detections = DetectionArray()
+    decode_seconds = detect_seconds = 0.0
+
+    batches = read_batches(cap, batch_size, preprocess, max_frames)
+    while True:
+        start = time.perf_counter()
+        batch = next(batches, None)
+        decode_seconds += time.perf_counter() - start
+        if batch is None:
+            break
+        first_frame, images = batch
+
+        start = time.perf_counter()
+        results = model.predict(images, verbose=False, **predict_args)
+        detect_seconds += time.perf_counter() - start
+
+        for offset, result in enumerate(results):
+            detections.append(first_frame + offset, result.boxes.data.cpu().numpy())
+
+    cap.release()
+    stats = {'frames': detections.frames, 'decode_seconds': decode_seconds, 'detect_seconds': detect_seconds}
+    return detections, stats
+
+
+if __name__ == "__main__":
+    # 批量大小对吞吐量的影响:
+    # python batch_detect.py best_bak.pt Yan2023.mp4 --foreground
+    # python batch_detect.py ../model/pingpong_table_best10.pt ../model/table.mp4 --yolov10
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Offline batched YOLO detection")
+    parser.add_argument('model')
+    parser.add_argument('video')
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=list(BATCH_SIZES))
+    parser.add_argument('--max-frames', type=int, default=300)
+    parser.add_argument('--foreground', action='store_true', help="detect on the MOG2 foreground mask (ball model)")
+    parser.add_argument('--yolov10', action='store_true', help="load the model with YOLOv10 (table model)")
+    parser.add_argument('--device', default='cpu')
+    parser.add_argument('--conf', type=float, default=0.25)
+    parser.add_argument('--output', help="save the detections of the last run as .npy")
+    args = parser.parse_args()
+
+    if args.yolov10:
+        from ultralytics import YOLOv10 as Model
+    else:
+        from ultralytics import YOLO as Model
+    model = Model(args.model)
+    # 预热: 第一次推理会初始化模型，不计入吞吐量
+    model.predict(np.zeros((640, 640, 3), dtype=np.uint8), verbose=False, device=args.device)
+
+    for batch_size in args.batch_sizes:
+        preprocess = foreground_preprocess() if args.foreground else None
+        detections, stats = detect_video(model, args.video, batch_size, preprocess, args.max_frames,
+                                         conf=args.conf, device=args.device)
+        total = stats['decode_seconds'] + stats['detect_seconds']
+        print(f"batch {batch_size:2d}: {stats['frames'] / total:6.1f} frames/s overall, "
+              f"{stats['frames'] / stats['detect_seconds']:6.1f} frames/s detector, "
+              f"{len(detections)} detections in {stats['frames']} frames")
+
+    if args.output:
+        detections.save(args.output)
+        print(f"saved {len(detections)} detections to {args.output}")
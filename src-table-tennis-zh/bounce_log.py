@@ -0,0 +1,165 @@
+import numpy as np
+
+from determine_region import region_mappings_L, region_mappings_R
+
+# 区域编号: L1~L9 为 0~8，R1~R9 为 9~17，与 RegionIndex.labels 的顺序相同；-1 表示不在球台区域内
+REGION_LABELS = list(region_mappings_L) + list(region_mappings_R)
+REGION_IDS = {label: index for index, label in enumerate(REGION_LABELS)}
+SIDE_L, SIDE_R = 0, 1
+SIDE_LABELS = ('L', 'R')
+
+RALLY_GAP = 2.0  # 与上一次落点间隔超过该时间 (秒) 时视为新的回合
+
+BOUNCE_DTYPE = np.dtype([('frame', np.int32), ('timestamp', np.float64), ('region', np.int8),
+                         ('speed', np.float32), ('side', np.int8), ('rally', np.int32)])
+
+
+def region_side(region):
+    if region < 0:
+        return -1
+    return SIDE_L if region < len(region_mappings_L) else SIDE_R
+
+
+class BounceLog:
+    """
+    落点事件记录: 只追加的 BOUNCE_DTYPE 数组 (帧号、时间戳、区域、球速、球台侧、回合编号)。
+
+    - append(): 记录一次落点，同时增量更新各区域计数、球速和回合统计 (每次 O(1))
+    - proportions(): 某一侧各区域的落点占比，由计数直接计算，不需要遍历事件
+    - save() / load(): 按列保存为 .npz，多场比赛可以一次读入后用 NumPy 查询
+    """
+
+    def __init__(self, capacity=1024, rally_gap=RALLY_GAP):
+        self.data = np.zeros(capacity, dtype=BOUNCE_DTYPE)
+        self.size = 0
+        self.rally_gap = rally_gap
+
+        self.region_counts = np.zeros(len(REGION_LABELS), dtype=np.int64)
+        self.side_counts = np.zeros(len(SIDE_LABELS), dtype=np.int64)
+        self.speed_sum = 0.0
+        self.speed_count = 0  # 球速已知的落点数
+        self.speed_max = 0.0
+
+        self.rally = -1  # 当前回合编号
+        self.rally_length = 0  # 当前回合的落点数
+        self.longest_rally = 0
+        self.last_timestamp = None
+
+    def append(self, frame, timestamp, region, speed=np.nan):
+        """
+        参数:
+        - region: 区域名 ('L1'~'R9')、区域编号或 None (不在球台区域内)
+        - speed: 落点时的球速 (km/h)，未知 (没有标定) 时为 NaN，不计入球速统计
+        """
+        if region is None:
+            region = -1
+        elif isinstance(region, str):
+            region = REGION_IDS[region]
+        side = region_side(region)
+
+        if self.last_timestamp is None or timestamp - self.last_timestamp > self.rally_gap:
+            self.rally += 1
+            self.rally_length = 0
+        self.rally_length += 1
+        self.longest_rally = max(self.longest_rally, self.rally_length)
+        self.last_timestamp = timestamp
+
+        if self.size == len(self.data):
+            grown = np.zeros(2 * len(self.data), dtype=BOUNCE_DTYPE)
+            grown[:self.size] = self.data
+            self.data = grown
+        self.data[self.size] = (frame, timestamp, region, speed, side, self.rally)
+        self.size += 1
+
+        if region >= 0:
+            self.region_counts[region] += 1
+            self.side_counts[side] += 1
+        if not np.isnan(speed):
+            self.speed_sum += speed
+            self.speed_count += 1
+            self.speed_max = max(self.speed_max, speed)
+        return region
+
+    @property
+    def events(self):
+        return self.data[:self.size]
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def rallies(self):
+        return self.rally + 1
+
+    @property
+    def mean_speed(self):
+        return self.speed_sum / self.speed_count if self.speed_count else 0.0
+
+    def proportions(self, side):
+        """某一侧各区域的落点占比 (%)，[(区域名, 占比)]；该侧没有落点时占比为 None"""
+        labels = list(region_mappings_L) if side == SIDE_L else list(region_mappings_R)
+        total = self.side_counts[side]
+        return [(label, self.region_counts[REGION_IDS[label]] / total * 100 if total else None) for label in labels]
+
+    def save(self, path):
+        events = self.events
+        np.savez(path, **{name: events[name] for name in BOUNCE_DTYPE.names})
+
+    @staticmethod
+    def load(path):
+        """读入 save() 的文件，返回 BOUNCE_DTYPE 事件数组"""
+        with np.load(path) as columns:
+            events = np.zeros(len(columns['frame']), dtype=BOUNCE_DTYPE)
+            for name in BOUNCE_DTYPE.names:
+                events[name] = columns[name]
+        return events
+
+
+def region_histogram(events):
+    """事件数组 -> 各区域落点数 (len(REGION_LABELS),)"""
+    regions = events['region']
+    return np.bincount(regions[regions >= 0], minlength=len(REGION_LABELS))
+
+
+def rally_lengths(events):
+    """事件数组 -> 每个回合的落点数 (回合编号连续)"""
+    return np.bincount(events['rally'])
+
+
+if __name__ == "__main__":
+    # 一个赛季的查询耗时: python bounce_log.py
+    import os
+    import tempfile
+    import time
+
+    rng = np.random.default_rng(0)
+    folder = tempfile.mkdtemp()
+    matches, bounces_per_match = 200, 2000
+
+    start = time.perf_counter()
+    paths = []
+    for match in range(matches):
+        log = BounceLog()
+        timestamp = 0.0
+        for frame in range(bounces_per_match):
+            timestamp += rng.choice([0.6, 5.0], p=[0.85, 0.15])
+            region = int(rng.integers(-1, len(REGION_LABELS)))
+            log.append(frame * 20, timestamp, region, float(rng.uniform(10, 80)))
+        paths.append(os.path.join(folder, f"match_{match:03d}.npz"))
+        log.save(paths[-1])
+    print(f"recorded and saved {matches} matches x {bounces_per_match} bounces in {time.perf_counter() - start:.1f} s")
+    print(f"last match: {log.rallies} rallies, longest {log.longest_rally}, mean speed {log.mean_speed:.1f} km/h")
+    print("L:", ", ".join(f"{label} {value:.1f}%" for label, value in log.proportions(SIDE_L)))
+
+    start = time.perf_counter()
+    season = np.concatenate([BounceLog.load(path) for path in paths])
+    load_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    histogram = region_histogram(season)
+    fast = season[season['speed'] > 60]
+    fast_share = region_histogram(fast) / np.maximum(histogram, 1) * 100
+    query_time = time.perf_counter() - start
+    print(f"season: {len(season)} bounces, load {load_time * 1e3:.0f} ms, query {query_time * 1e3:.1f} ms")
+    print("share of bounces above 60 km/h:",
+          ", ".join(f"{label} {value:.0f}%" for label, value in zip(REGION_LABELS, fast_share)))
@@ -1,52 +1,176 @@
-import matplotlib.path as mplPath
-def determine_region(prev_box):
-    x = prev_box[0]  # Extract x-coordinates from the box
-    y = prev_box[1]  # Extract y-coordinates from the box
+import numpy as np
+
+REGION_DIVISION_FILE = 'Region_division.txt'
+
+region_mappings_L = {
+    'L1': ['A5', 'B', 'B1', 'A5C1_1'],
+    'L2': ['A5C1_1', 'B1', 'B2', 'A5C1_2'],
+    'L3': ['A5C1_2', 'B2', 'C', 'C1'],
+    'L4': ['A4C2_2', 'A5C1_2', 'C1', 'C2'],
+    'L5': ['A3C3_2', 'A4C2_2', 'C2', 'C3'],
+    'L6': ['A3C3_1', 'A4C2_1', 'A4C2_2', 'A3C3_2'],
+    'L7': ['A3', 'A4', 'A4C2_1', 'A3C3_1'],
+    'L8': ['A4', 'A5', 'A5C1_1', 'A4C2_1'],
+    'L9': ['A4C2_1', 'A5C1_1', 'A5C1_2', 'A4C2_2'],
+}
+region_mappings_R = {
+    'R1': ['A', 'A1', 'A1C5_1', 'D2'],
+    'R2': ['D2', 'A1C5_1', 'A1C5_2', 'D1'],
+    'R3': ['D1', 'A1C5_2', 'C5', 'D'],
+    'R4': ['A1C5_2', 'A2C4_2', 'C4', 'C5'],
+    'R5': ['A2C4_2', 'A3C3_2', 'C3', 'C4'],
+    'R6': ['A2C4_1', 'A3C3_1', 'A3C3_2', 'A2C4_2'],
+    'R7': ['A2', 'A3', 'A3C3_1', 'A2C4_1'],
+    'R8': ['A1', 'A2', 'A2C4_1', 'A1C5_1'],
+    'R9': ['A1C5_1', 'A2C4_1', 'A2C4_2', 'A1C5_2']
+}
 
+
+def load_region_coordinates(path=REGION_DIVISION_FILE):
     region_coordinates = {}
-    with open('Region_division.txt', 'r') as file:
+    with open(path, 'r') as file:
         for line in file:
+            if not line.strip():
+                continue
             point, coord = line.strip().split(':')
             x_coord, y_coord = map(int, coord.strip().replace('(', '').replace(')', '').split(','))
             region_coordinates[point] = (x_coord, y_coord)
+    return region_coordinates
+
+
+class RegionIndex:
+    """
+    球台落点区域索引: 区域划分文件只读取一次，预先计算各区域多边形的边和整数像素的区域标签栅格。
+
+    classify() 一次判断多个点:
+    - 点所在像素格的四角标签相同 (区域内部) 时直接查栅格
+    - 靠近区域边界或顶点的点用预先计算的边做向量化的射线法判断
+    区域按 L1~L9、R1~R9 的顺序匹配，与原来逐个 contains_point 的结果相同。
+    """
+
+    EXACT = -2  # cell_labels 中需要逐点判断的像素格
+
+    def __init__(self, path=REGION_DIVISION_FILE):
+        self.region_coordinates = load_region_coordinates(path)
+        self.labels = list(region_mappings_L) + list(region_mappings_R)
+        mappings = {**region_mappings_L, **region_mappings_R}
+
+        # 每个区域 4 条边: (区域数, 4) 的起点和终点
+        vertices = np.array([[self.region_coordinates[point] for point in mappings[label]] for label in self.labels],
+                            dtype=np.float64)
+        self.edge_start = vertices
+        self.edge_end = np.roll(vertices, -1, axis=1)
+
+        # 标签栅格: 覆盖所有顶点的整数像素范围，-1 表示不在任何区域内
+        self.x_min, self.y_min = np.floor(vertices.reshape(-1, 2).min(axis=0)).astype(int)
+        x_max, y_max = np.ceil(vertices.reshape(-1, 2).max(axis=0)).astype(int)
+        xs, ys = np.meshgrid(np.arange(self.x_min, x_max + 1), np.arange(self.y_min, y_max + 1))
+        grid_points = np.stack([xs.ravel(), ys.ravel()], axis=1).astype(np.float64)
+        self.raster = self.classify_exact(grid_points).reshape(xs.shape)
+
+        # 每个像素格 (四角为相邻整数像素) 的标签: 四角标签相同且格内没有多边形顶点时，格内所有点同属该区域；
+        # 否则为 EXACT，需要逐点判断
+        corners = np.stack([self.raster[:-1, :-1], self.raster[:-1, 1:], self.raster[1:, :-1], self.raster[1:, 1:]])
+        self.cell_labels = np.where(np.all(corners == corners[0], axis=0), corners[0], self.EXACT)
+        for vx, vy in vertices.reshape(-1, 2).astype(int) - (self.x_min, self.y_min):
+            self.cell_labels[max(vy - 1, 0):vy + 1, max(vx - 1, 0):vx + 1] = self.EXACT
+
+    def classify_exact(self, points):
+        """射线法 (奇偶规则) 判断 (N, 2) 个点，返回区域下标 (N,)，-1 表示不在区域内"""
+        px = points[:, 0][:, None, None]
+        py = points[:, 1][:, None, None]
+        x0, y0 = self.edge_start[None, :, :, 0], self.edge_start[None, :, :, 1]
+        x1, y1 = self.edge_end[None, :, :, 0], self.edge_end[None, :, :, 1]
+
+        # 与 matplotlib 的 point_in_path 相同的判断方式，边界上的点结果也一致
+        yflag0 = y0 >= py
+        yflag1 = y1 >= py
+        crosses = (yflag0 != yflag1) & (((y1 - py) * (x0 - x1) >= (x1 - px) * (y0 - y1)) == yflag1)
+        inside = np.logical_xor.reduce(crosses, axis=2)  # (N, 区域数)
+
+        # 按 L1~L9、R1~R9 的顺序取第一个包含该点的区域
+        first = np.argmax(inside, axis=1)
+        return np.where(inside.any(axis=1), first, -1)
+
+    def classify_indices(self, points):
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        result = np.full(len(points), -1, dtype=np.int64)
+
+        height, width = self.cell_labels.shape
+        gx = np.floor(points[:, 0]).astype(np.int64) - self.x_min
+        gy = np.floor(points[:, 1]).astype(np.int64) - self.y_min
+        in_raster = (gx >= 0) & (gy >= 0) & (gx <= width) & (gy <= height)
+        # 恰好在栅格右/下边界上的点归入最后一格 (该格的四角都在区域外或为顶点格)
+        gx = np.minimum(gx, width - 1)
+        gy = np.minimum(gy, height - 1)
+
+        # 栅格范围外的点不可能在任何区域内；范围内先查像素格标签，靠近边界或顶点的点再精确判断
+        candidates = np.flatnonzero(in_raster)
+        labels = self.cell_labels[gy[in_raster], gx[in_raster]]
+        result[candidates] = labels
+        boundary = candidates[labels == self.EXACT]
+        if len(boundary):
+            result[boundary] = self.classify_exact(points[boundary])
+        return result
+
+    def classify(self, points):
+        """(N, 2) 个点 -> 区域名列表 ('L1'~'R9'，不在区域内为 None)"""
+        return [self.labels[index] if index >= 0 else None for index in self.classify_indices(points)]
+
+
+region_index = None
+
+
+def get_region_index():
+    # 第一次使用时才读取区域划分文件
+    global region_index
+    if region_index is None:
+        region_index = RegionIndex()
+    return region_index
+
+
+def determine_region(prev_box):
+    x = prev_box[0]  # Extract x-coordinates from the box
+    y = prev_box[1]  # Extract y-coordinates from the box
+    return get_region_index().classify([(x, y)])[0]
+
+
+if __name__ == "__main__":
+    # 与原实现 (每次读取文件 + matplotlib Path) 的对比: python determine_region.py
+    import time
+    import matplotlib.path as mplPath
+
+    def determine_region_path(prev_box):
+        region_coordinates = load_region_coordinates()
+        for region, points in {**region_mappings_L, **region_mappings_R}.items():
+            region_polygon = mplPath.Path([region_coordinates[point] for point in points])
+            if region_polygon.contains_point((prev_box[0], prev_box[1])):
+                return region
+        return None
+
+    rng = np.random.default_rng(0)
+    points = np.column_stack([rng.uniform(0, 610, 20000), rng.uniform(230, 325, 20000)])
+
+    start = time.perf_counter()
+    expected = [determine_region_path(point) for point in points[:2000]]
+    path_time = (time.perf_counter() - start) / 2000
+
+    start = time.perf_counter()
+    index = RegionIndex()
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    single = [index.classify([point])[0] for point in points[:2000]]
+    single_time = (time.perf_counter() - start) / 2000
 
-    region_mappings_L = {
-        'L1': ['A5', 'B', 'B1', 'A5C1_1'],
-        'L2': ['A5C1_1', 'B1', 'B2', 'A5C1_2'],
-        'L3': ['A5C1_2', 'B2', 'C', 'C1'],
-        'L4': ['A4C2_2', 'A5C1_2', 'C1', 'C2'],
-        'L5': ['A3C3_2', 'A4C2_2', 'C2', 'C3'],
-        'L6': ['A3C3_1', 'A4C2_1', 'A4C2_2', 'A3C3_2'],
-        'L7': ['A3', 'A4', 'A4C2_1', 'A3C3_1'],
-        'L8': ['A4', 'A5', 'A5C1_1', 'A4C2_1'],
-        'L9': ['A4C2_1', 'A5C1_1', 'A5C1_2', 'A4C2_2'],
-    }
-    region_mappings_R = {
-        'R1': ['A', 'A1', 'A1C5_1', 'D2'],
-        'R2': ['D2', 'A1C5_1', 'A1C5_2', 'D1'],
-        'R3': ['D1', 'A1C5_2', 'C5', 'D'],
-        'R4': ['A1C5_2', 'A2C4_2', 'C4', 'C5'],
-        'R5': ['A2C4_2', 'A3C3_2', 'C3', 'C4'],
-        'R6': ['A2C4_1', 'A3C3_1', 'A3C3_2', 'A2C4_2'],
-        'R7': ['A2', 'A3', 'A3C3_1', 'A2C4_1'],
-        'R8': ['A1', 'A2', 'A2C4_1', 'A1C5_1'],
-        'R9': ['A1C5_1', 'A2C4_1', 'A2C4_2', 'A1C5_2']
-    }
-
-    print("Region Coordinates:")
-    for point, coords in region_coordinates.items():
-        print(point, ":", coords)
-
-    # Iterate over the region coordinates and check if the point lies within the bounding box
-    for region, points in region_mappings_L.items():
-        region_polygon = mplPath.Path([region_coordinates[point] for point in points])
-        if region_polygon.contains_point((x, y)):
-            return region
-    for region, points in region_mappings_R.items():
-        region_polygon = mplPath.Path([region_coordinates[point] for point in points])
-        if region_polygon.contains_point((x, y)):
-            return region
-
-
-    return None  # If the region is not found or point is not within the bounding box, return None
+    start = time.perf_counter()
+    batch = index.classify(points)
+    batch_time = (time.perf_counter() - start) / len(points)
 
+    agreement = np.mean([a == b for a, b in zip(expected, batch[:2000])]) * 100
+    print(f"file + Path per call: {path_time * 1e6:8.1f} us")
+    print(f"RegionIndex build:    {build_time * 1e3:8.1f} ms (once)")
+    print(f"RegionIndex single:   {single_time * 1e6:8.1f} us")
+    print(f"RegionIndex batch:    {batch_time * 1e6:8.2f} us/point")
+    print(f"agreement with Path:  {agreement:.2f}% of {len(expected)} points "
+          f"({sum(e is not None for e in expected)} inside a region)")
@@ -0,0 +1,56 @@
+import time
+
+import cv2
+
+
+class FrameClock:
+    """
+    帧时间戳 (秒)，用于计算球速，与处理速度无关。
+
+    - 视频文件: CAP_PROP_POS_MSEC (当前帧的媒体时间)，后端不提供或不递增时按 帧号 / fps
+    - 摄像头: 后端提供的采集时间戳 (如 V4L2)，没有时用 read() 返回时的单调时钟
+    每次 cap.read() 成功后调用一次 tick()。
+    """
+
+    def __init__(self, cap, live=None):
+        self.cap = cap
+        self.fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        # 摄像头和网络流没有总帧数
+        self.live = cap.get(cv2.CAP_PROP_FRAME_COUNT) <= 0 if live is None else live
+        self.frame_index = -1
+        self.timestamp = None
+
+    def tick(self):
+        """返回刚读取的帧的时间戳 (秒)"""
+        self.frame_index += 1
+        media_time = self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+        # 文件的第一帧媒体时间可以是 0；之后的时间戳必须递增
+        valid = media_time > 0 or (self.frame_index == 0 and not self.live)
+        if valid and (self.timestamp is None or media_time > self.timestamp):
+            self.timestamp = media_time
+        elif self.live:
+            self.timestamp = time.monotonic()
+        else:
+            self.timestamp = 0.0 if self.timestamp is None else self.timestamp + 1.0 / self.fps
+        return self.timestamp
+
+
+if __name__ == "__main__":
+    # 时间戳与处理速度无关: python frame_clock.py video.mp4
+    import sys
+
+    cap = cv2.VideoCapture(sys.argv[1])
+    clock = FrameClock(cap)
+    timestamps = []
+    while True:
+        success, frame = cap.read()
+        if not success:
+            break
+        timestamps.append(clock.tick())
+        if clock.frame_index % 50 == 0:
+            time.sleep(0.1)  # 处理变慢不影响时间戳
+    cap.release()
+    intervals = [b - a for a, b in zip(timestamps, timestamps[1:])]
+    print(f"{len(timestamps)} frames, fps {clock.fps:.2f}, live {clock.live}")
+    print(f"frame interval min {min(intervals) * 1e3:.2f} ms, max {max(intervals) * 1e3:.2f} ms, "
+          f"1/fps {1e3 / clock.fps:.2f} ms")
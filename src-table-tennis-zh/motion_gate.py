@@ -0,0 +1,110 @@
+import cv2
+import numpy as np
+
+MOTION_SCALE = 0.25  # 运动判断使用的前景掩码缩放比例
+MIN_BALL_AREA = 16  # 球大小的运动区域面积范围 (原图像素)
+MAX_BALL_AREA = 1600
+MAX_BALL_SIZE = 60  # 运动区域外接框的最大边长 (原图像素)，排除细长的手臂、球拍等
+MAX_CANDIDATES = 4  # 候选区域超过该数量 (如镜头晃动) 时退回全帧检测
+
+
+class MotionGate:
+    """
+    基于 MOG2 前景掩码的检测门控: 在缩小的掩码上统计前景像素和连通区域。
+
+    - 没有球大小的运动区域时 (回合之间、画面静止)，跳过本次 YOLO 检测
+    - 有运动区域时，以区域中心作为候选 ROI，替代全帧检测
+    有稳定轨迹时仍按 BallTracker 的预测窗口检测 (球靠近球员时会与球员的前景连成一片)。
+    """
+
+    def __init__(self, scale=MOTION_SCALE, min_area=MIN_BALL_AREA, max_area=MAX_BALL_AREA, max_size=MAX_BALL_SIZE,
+                 max_candidates=MAX_CANDIDATES, propose_rois=True):
+        self.scale = scale
+        self.min_area = min_area * scale ** 2
+        self.max_area = max_area * scale ** 2
+        self.max_size = max_size * scale
+        self.max_candidates = max_candidates
+        self.propose_rois = propose_rois
+
+        self.foreground_pixels = 0  # 本帧缩小掩码中的前景像素数
+        self.candidates = []  # 本帧球大小运动区域的中心 (原图坐标)
+
+        self.frames = 0
+        self.skipped = 0  # 因没有运动而跳过的检测次数
+        self.proposed = 0  # 使用候选 ROI 代替全帧的检测次数
+
+    def update(self, foreground_mask):
+        """每帧调用一次: 在缩小的掩码上计算前景像素数和候选区域"""
+        self.frames += 1
+        # INTER_AREA 取区域平均，缩小后小球仍至少保留一个非零像素
+        small = cv2.resize(foreground_mask, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        self.foreground_pixels = cv2.countNonZero(small)
+        if self.foreground_pixels == 0:
+            self.candidates = []
+            return self.candidates
+
+        _, small = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY)
+        _, _, stats, centroids = cv2.connectedComponentsWithStats(small, connectivity=8)
+        stats, centroids = stats[1:], centroids[1:]  # 去掉背景
+        areas = stats[:, cv2.CC_STAT_AREA]
+        sizes = np.maximum(stats[:, cv2.CC_STAT_WIDTH], stats[:, cv2.CC_STAT_HEIGHT])
+        keep = (areas >= self.min_area) & (areas <= self.max_area) & (sizes <= self.max_size)
+        # 缩小后的像素 i 覆盖原图像素 [i / scale, (i + 1) / scale)
+        self.candidates = [(float(x), float(y)) for x, y in (centroids[keep] + 0.5) / self.scale - 0.5]
+        return self.candidates
+
+    def gate(self, centers):
+        """
+        BallTracker 请求的检测中心 -> 实际检测的中心。
+
+        返回:
+        - centers 不为 None (有轨迹，按预测窗口检测) 时原样返回
+        - []: 没有球大小的运动，跳过检测
+        - 候选区域中心列表，或 None (全帧检测: 候选过多或未开启 propose_rois)
+        """
+        if centers is not None:
+            return centers
+        if not self.candidates:
+            self.skipped += 1
+            return []
+        if not self.propose_rois or len(self.candidates) > self.max_candidates:
+            return None
+        self.proposed += 1
+        return self.candidates
+
+
+if __name__ == "__main__":
+    # 门控开销和候选区域: python motion_gate.py video.mp4
+    import sys
+    import time
+
+    if len(sys.argv) > 1:
+        cap = cv2.VideoCapture(sys.argv[1])
+        bg_subtractor = cv2.createBackgroundSubtractorMOG2(history=100, varThreshold=25, detectShadows=False)
+        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+        gate = MotionGate()
+        gate_time = 0.0
+        with_candidates = 0
+        while True:
+            success, frame = cap.read()
+            if not success:
+                break
+            foreground_mask = cv2.morphologyEx(bg_subtractor.apply(frame), cv2.MORPH_OPEN, kernel)
+            start = time.perf_counter()
+            candidates = gate.update(foreground_mask)
+            gate.gate(None)
+            gate_time += time.perf_counter() - start
+            with_candidates += bool(candidates)
+        cap.release()
+        print(f"{gate.frames} frames, gate {gate_time / max(gate.frames, 1) * 1e3:.2f} ms/frame, "
+              f"{with_candidates} frames with ball-sized motion, {gate.skipped} detections skipped")
+    else:
+        # 合成掩码: 一个球员大小的区域 + 一个球
+        mask = np.zeros((720, 1280), dtype=np.uint8)
+        gate = MotionGate()
+        print("empty mask:", gate.update(mask), "->", gate.gate(None))
+        cv2.rectangle(mask, (200, 100), (400, 600), 255, -1)
+        print("player only:", gate.update(mask), "->", gate.gate(None))
+        cv2.circle(mask, (900, 300), 5, 255, -1)
+        print("player + ball:", gate.update(mask), "->", gate.gate(None))
+        print(f"skipped {gate.skipped}, proposed {gate.proposed}")
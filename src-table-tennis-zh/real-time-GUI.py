@@ -2,10 +2,10 @@ import pygame
 import cv2
 
 
-import time
 import numpy as np
 from ultralytics import YOLO
 from determine_region import determine_region
+from frame_clock import FrameClock
 import torch
 
 # Initialize Pygame
@@ -58,6 +58,9 @@ video_path = 'Yan2023.mp4'
 
 # Open the video file
 cap = cv2.VideoCapture(video_path)
+# Frame timestamps (media time for files, capture time for cameras) so the speed
+# does not depend on how fast frames are processed
+frame_clock = FrameClock(cap)
 
 
 prev_frame = None  # Initialize prev_frame variable before the loop
@@ -65,7 +68,7 @@ prev_frame = None  # Initialize prev_frame variable before the loop
 # Initialize variables for previous frame
 prev_boxes = None
 prev2_boxes = None
-prev_time = time.time()
+prev_time = None
 
 # Define the class names
 names = {0: 'net', 1: '1-1', 2: 'paddle', 3: 'Table tennis ball', 4: '1-2', 5: '1-4', 6: '1-5', 7: '2-5', 8: '0-0', 9: '1-0'}
@@ -168,7 +171,7 @@ while running:
 
         # Initialize variables for current frame
         curr_boxes = None
-        curr_time = time.time()
+        curr_time = frame_clock.tick()
         all_boxes = []
         curr_labels = []
 
@@ -305,8 +308,8 @@ while running:
             distance_real = distances * scaling_factor * 0.036 # mm/s to km/h
             print(distance_real)
             # Calculate speed of the object
-            time_diff = curr_time - prev_time
-            if time_diff == 0:
+            time_diff = curr_time - prev_time if prev_time is not None else 0
+            if time_diff <= 0:
                 speed_str = "speed: 0km/h"
             else:
                 speed = np.abs(distance_real) / time_diff
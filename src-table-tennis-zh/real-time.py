@@ -1,8 +1,10 @@
 import cv2
 import numpy as np
-import time
 from ultralytics import YOLO
-from determine_region import determine_region
+from ball_stage import BallStage
+from frame_clock import FrameClock
+from bounce_log import BounceLog, SIDE_L, SIDE_R
+import os
 import torch
 
 # Initialize the YOLO model
@@ -14,6 +16,9 @@ video_path = 'Yan2023.mp4'
 
 # Open the video file
 cap = cv2.VideoCapture(video_path)
+# Frame timestamps (media time for files, capture time for cameras) so the speed
+# does not depend on how fast frames are processed
+frame_clock = FrameClock(cap)
 
 camera_matrix = np.load('camera_matrix.npy')
 dist_coeffs = np.load('dist_coeffs.npy')
@@ -25,23 +30,21 @@ square_size_pixels = 160  # Known size in pixels
 square_size = 100  # mm
 scaling_factor = square_size / square_size_pixels
 
-# Create a background subtractor object with threshold
-bg_subtractor = cv2.createBackgroundSubtractorMOG2(history=100, varThreshold=25, detectShadows=False)
+# Ball stage: MOG2 background subtraction, motion gating, Kalman tracking with YOLO and bounce regions.
+# YOLO runs every DETECT_EVERY frames (or when the track is uncertain/lost), the ball position is predicted
+# in between. With a stable track YOLO only sees ROI_SIZE windows around the predicted position, the full
+# frame is used when the track is lost; set USE_ROI = False to always detect on the full frame.
+# YOLO is skipped when the foreground mask has no ball-sized motion.
+DETECT_EVERY = 4
+USE_ROI = True
+ball_stage = BallStage(model, detect_every=DETECT_EVERY, use_roi=USE_ROI, conf=confidence_threshold, device='1')
 
 # Initialize variables for previous frame
 prev_boxes = None
-prev2_boxes = None
-prev_time = time.time()
-
-# Initialize region data
-region_data_L = [['L1', 0], ['L2', 0], ['L3', 0], ['L4', 0], ['L5', 0],
-               ['L6', 0], ['L7', 0], ['L8', 0], ['L9', 0]]
-region_data_R = [['R1', 0], ['R2', 0], ['R3', 0], ['R4', 0], ['R5', 0], ['R6', 0],
-               ['R7', 0], ['R8', 0], ['R9', 0]]
-proportion_region_data_L = [['L1', 0], ['L2', 0], ['L3', 0], ['L4', 0], ['L5', 0],
-               ['L6', 0], ['L7', 0], ['L8', 0], ['L9', 0]]
-proportion_region_data_R = [['R1', 0], ['R2', 0], ['R3', 0], ['R4', 0], ['R5', 0], ['R6', 0],
-               ['R7', 0], ['R8', 0], ['R9', 0]]
+prev_time = None
+
+# Bounce events (frame, timestamp, region, speed, side, rally), region counts are kept incrementally
+bounce_log = BounceLog()
 
 # Initialize a frame counter
 frame_counter = 0
@@ -49,6 +52,21 @@ frame_counter = 0
 # Initialize speed data
 speed = 0
 
+# Ball speed (km/h) between two ball centers (1, 2) in pixels, time_diff seconds apart
+def ball_speed(prev_center, curr_center, time_diff):
+    prev_points = cv2.undistortPoints(np.expand_dims(prev_center, axis=1), camera_matrix, dist_coeffs, None, camera_matrix)
+    curr_points = cv2.undistortPoints(np.expand_dims(curr_center, axis=1), camera_matrix, dist_coeffs, None, camera_matrix)
+    prev_points_3d = cv2.convertPointsToHomogeneous(prev_points)
+    curr_points_3d = cv2.convertPointsToHomogeneous(curr_points)
+    R, _ = cv2.Rodrigues(rvecs)
+    T = tvecs.reshape((3, 1))
+    prev_points_3d_cam = np.matmul(R, prev_points_3d.transpose(0, 2, 1)) + T
+    curr_points_3d_cam = np.matmul(R, curr_points_3d.transpose(0, 2, 1)) + T
+    displacement_3d = np.squeeze(curr_points_3d_cam - prev_points_3d_cam)
+    distances = np.linalg.norm(displacement_3d)
+    distance_real = distances * scaling_factor * 0.036
+    return np.abs(distance_real) / time_diff
+
 # Function to rotate a frame by 90 degrees
 def rotate_frame(frame):
     return cv2.rotate(frame, cv2.ROTATE_90_CLOCKWISE)
@@ -64,91 +82,22 @@ while True:
 
     if not success:
         break
-
-    # Apply background subtraction
-    foreground_mask = bg_subtractor.apply(frame)
-
-    # Perform morphological operations (noise removal)
-    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
-    foreground_mask = cv2.morphologyEx(foreground_mask, cv2.MORPH_OPEN, kernel)
-
-    # Convert foreground mask to RGB for YOLOv8 input
-    foreground_rgb = cv2.cvtColor(foreground_mask, cv2.COLOR_GRAY2RGB)
-
-    # Run YOLOv8 inference on the frame
-    results = model(foreground_rgb, conf=confidence_threshold, device='1')
+    curr_time = frame_clock.tick()
 
     # Initialize variables for current frame
-    curr_boxes = None
-    curr_time = time.time()
-    all_boxes = []
-
-    for result in results:
-        if len(result) == 0:  # No detections in this result
-            continue
-        boxes_tensor = result.boxes.data
-        boxes = boxes_tensor.cpu().numpy()
-        all_boxes.append(boxes)
-
-    if len(all_boxes) > 0:
-        all_boxes = np.vstack(all_boxes)
-        class_3_boxes = all_boxes[all_boxes[:, 5] == 3]
-        if len(class_3_boxes) > 0:
-            sorted_class_3_boxes = class_3_boxes[class_3_boxes[:, 1].argsort()]
-            curr_boxes = np.array([sorted_class_3_boxes[0]])
+    ball_box, bounce = ball_stage.process(frame)
+    curr_boxes = np.array([ball_box]) if ball_box is not None else None
 
+    # Speed of this frame, computed before the bounce is logged
     try:
-        if prev_boxes is not None and curr_boxes is not None and prev2_boxes is not None:
-            prev_y = prev_boxes[0][1]
-            prev2_y = prev2_boxes[0][1]
-
-            for box in curr_boxes:
-                for prev_box in prev_boxes:
-                    if prev2_y < prev_box[1] and box[1] < prev_box[1]:
-                        region = determine_region(prev_box)
-                        if region:
-                            for idx, data in enumerate(region_data_L):
-                                if data[0] == region:
-                                    region_data_L[idx][1] += 1
-                                    total_L = sum(item[1] for item in region_data_L)
-                                    for i in range(len(proportion_region_data_L)):
-                                        proportion_L = (region_data_L[i][1] / total_L) * 100
-                                        proportion_region_data_L[i][1] = "{:.2f}%".format(proportion_L)
-
-                            for idx, data in enumerate(region_data_R):
-                                if data[0] == region:
-                                    region_data_R[idx][1] += 1
-                                    total_R = sum(item[1] for item in region_data_R)
-                                    for i in range(len(proportion_region_data_R)):
-                                        proportion_R = (region_data_R[i][1] / total_R) * 100
-                                        proportion_region_data_R[i][1] = "{:.2f}%".format(proportion_R)
-
-    except Exception as e:
-        print("Error occurred:", str(e))
-
-    try:
-        if prev_boxes is not None and curr_boxes is not None:
-            curr_boxes_sorted = curr_boxes[curr_boxes[:, 4].argsort()[::-1]]
-            curr_box = curr_boxes_sorted[0]
+        if prev_boxes is not None and curr_boxes is not None and prev_time is not None:
             prev_center = (prev_boxes[:, :2] + prev_boxes[:, 2:4]) / 2
             curr_center = (curr_boxes[:, :2] + curr_boxes[:, 2:4]) / 2
-
-            prev_points = cv2.undistortPoints(np.expand_dims(prev_center, axis=1), camera_matrix, dist_coeffs, None, camera_matrix)
-            curr_points = cv2.undistortPoints(np.expand_dims(curr_center, axis=1), camera_matrix, dist_coeffs, None, camera_matrix)
-            prev_points_3d = cv2.convertPointsToHomogeneous(prev_points)
-            curr_points_3d = cv2.convertPointsToHomogeneous(curr_points)
-            R, _ = cv2.Rodrigues(rvecs)
-            T = tvecs.reshape((3, 1))
-            prev_points_3d_cam = np.matmul(R, prev_points_3d.transpose(0, 2, 1)) + T
-            curr_points_3d_cam = np.matmul(R, curr_points_3d.transpose(0, 2, 1)) + T
-            displacement_3d = np.squeeze(curr_points_3d_cam - prev_points_3d_cam)
-            distances = np.linalg.norm(displacement_3d)
-            distance_real = distances * scaling_factor * 0.036
             time_diff = curr_time - prev_time
-            if time_diff == 0:
+            if time_diff <= 0:
                 speed_str = "speed: 0km/h"
             else:
-                speed = np.abs(distance_real) / time_diff
+                speed = ball_speed(prev_center, curr_center, time_diff)
                 speed_str = 'speed: {:.2f}km/h'.format(speed)
         else:
             speed_str = "speed: 0km/h"
@@ -156,23 +105,36 @@ while True:
     except Exception as e:
         print("Error occurred:", str(e))
 
+    try:
+        if bounce is not None:
+            bounce_frame, bounce_box, region, velocity = bounce
+            # Timestamp of the bounce frame (the lowest point can be a few frames back)
+            bounce_time = curr_time - (frame_clock.frame_index - bounce_frame) / frame_clock.fps
+            # Speed at the bounce frame from the tracker velocity (pixels per frame), not the last box pair
+            bounce_center = ((bounce_box[:2] + bounce_box[2:4]) / 2).reshape(1, 2)
+            bounce_speed = ball_speed(bounce_center - velocity, bounce_center, 1 / frame_clock.fps)
+            bounce_log.append(bounce_frame, bounce_time, region, bounce_speed)
+
+    except Exception as e:
+        print("Error occurred:", str(e))
+
     # Update variables for next frame
-    if prev_boxes is not None:
-        prev2_boxes = prev_boxes
-        prev_boxes = curr_boxes
-        prev_time = curr_time
-    else:
-        prev_boxes = curr_boxes
-        prev_time = curr_time
+    prev_boxes = curr_boxes
+    prev_time = curr_time
 
 # Release the video capture object
 cap.release()
 
 # Print the statistics
+motion_gate = ball_stage.motion_gate
+print(f"YOLO runs: {ball_stage.yolo_runs}/{ball_stage.tracker.frames} frames, {motion_gate.skipped} skipped "
+      f"without motion ({motion_gate.proposed} on motion candidates)")
 print("Ball Speed:", speed_str)
-print("Proportion Region Data L:")
-for data in proportion_region_data_L:
-    print(f"{data[0]}: {data[1]}")
-print("Proportion Region Data R:")
-for data in proportion_region_data_R:
-    print(f"{data[0]}: {data[1]}")
+print(f"Bounces: {len(bounce_log)}, rallies: {bounce_log.rallies}, longest rally: {bounce_log.longest_rally}")
+for side, name in [(SIDE_L, "L"), (SIDE_R, "R")]:
+    print(f"Proportion Region Data {name}:")
+    for label, proportion in bounce_log.proportions(side):
+        print(f"{label}: {'{:.2f}%'.format(proportion) if proportion is not None else 0}")
+
+# Save the bounce events next to the video
+bounce_log.save(os.path.splitext(video_path)[0] + '_bounces.npz')
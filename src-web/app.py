@@ -1,18 +1,70 @@
-from flask import Flask, request, redirect, url_for, render_template, jsonify,send_from_directory
+from flask import Flask, request, redirect, url_for, render_template, jsonify,send_from_directory, Response
 import os
 import threading
 import json
 import time
 import signal
 import psutil
-import cv2
 from werkzeug.utils import secure_filename
-from pose_estimation import PoseEstimation, estimate_met, calculate_calories_burned, calculate_calories_burned_per_hour
+from job_pool import JobPool
+from stage_profiler import StageProfiler
+from metrics import render_metrics, merge_cache_stats
 
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = 'upload'
 app.config['ALLOWED_EXTENSIONS'] = {'mp4', 'mov', 'avi'}
 
+# /metrics 使用的运行状态: 所有任务共用一个阶段耗时统计
+stage_profiler = StageProfiler(report_interval=None)
+jobs = {}  # unique_id -> {'state': 'queued'/'running', 'processed_frames', 'start_time'}
+jobs_lock = threading.Lock()
+frames_processed_total = 0
+worker_memory = {}  # worker_id -> 最近一次汇报的常驻内存 (字节)
+
+JOB_WORKERS = 2  # 常驻 worker 进程数，每个进程各自加载模板、棋盘格配置和姿态后端 (pose_backend.POSE_BACKEND)
+job_pool = None
+job_pool_lock = threading.Lock()
+
+
+def get_job_pool():
+    # 第一次上传时才启动 worker (Flask debug 模式的重载进程不会重复启动)
+    global job_pool
+    with job_pool_lock:
+        if job_pool is None:
+            job_pool = JobPool(num_workers=JOB_WORKERS, upload_folder=app.config['UPLOAD_FOLDER'],
+                               on_event=handle_job_event)
+    return job_pool
+
+
+def handle_job_event(kind, unique_id, data):
+    """JobPool 监听线程的回调，更新 /metrics 使用的任务状态"""
+    global frames_processed_total
+    if kind == 'ready':
+        print(f"Pose worker {unique_id} ready")
+        with jobs_lock:
+            worker_memory[unique_id] = data[1]
+        return
+    with jobs_lock:
+        job = jobs.get(unique_id)
+        if kind == 'started' and job is not None:
+            job.update(state='running', processed_frames=0, start_time=time.time())
+        elif kind == 'progress':
+            processed_frames, histograms, cache_deltas, (worker_id, rss) = data
+            if job is not None:
+                frames_processed_total += processed_frames - job['processed_frames']
+                job['processed_frames'] = processed_frames
+            stage_profiler.merge(histograms)
+            merge_cache_stats(cache_deltas)
+            worker_memory[worker_id] = rss
+        elif kind in ('done', 'error'):
+            jobs.pop(unique_id, None)
+            if kind == 'done':
+                cache_deltas, (worker_id, rss) = data
+                merge_cache_stats(cache_deltas)
+                worker_memory[worker_id] = rss
+            if kind == 'error':
+                print(f"Job {unique_id} failed: {data}")
+
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
@@ -35,7 +87,12 @@ def upload_file():
         file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
         file.save(file_path)
         unique_id = str(int(time.time()))  # 使用时间戳作为唯一标识符
-        threading.Thread(target=process_video, args=(file_path, unique_id)).start()
+        with jobs_lock:
+            jobs[unique_id] = {'state': 'queued', 'processed_frames': 0, 'start_time': time.time()}
+        # 快速报告: stride > 1 时抽帧推理，adaptive=1 时快速动作段逐帧推理
+        stride = max(1, request.form.get('stride', 1, type=int))
+        adaptive = request.form.get('adaptive', 0, type=int) == 1
+        get_job_pool().submit(file_path, unique_id, stride, adaptive)
         return jsonify({"status": "processing", "filename": filename, "unique_id": unique_id})
     return redirect(request.url)
 
@@ -53,124 +110,21 @@ def progress_and_results(unique_id):
         return jsonify(
             {"status": "processing", "progress": {"progress": 0, "elapsed_time": "00:00:00", "estimated_time_remaining": "00:00:00"}})
 
+@app.route('/metrics')
+def metrics():
+    now = time.time()
+    with jobs_lock:
+        job_snapshot = {job_id: dict(job, now=now) for job_id, job in jobs.items()}
+        memory_snapshot = dict(worker_memory)
+    queue_depth = sum(1 for job in job_snapshot.values() if job['state'] == 'queued')
+    body = render_metrics(stage_profiler, job_snapshot, queue_depth, frames_processed_total, memory_snapshot)
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+
 @app.route('/upload/<filename>')
 def uploaded_file(filename):
     return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
 
-def format_time(seconds):
-    mins, secs = divmod(seconds, 60)
-    hours, mins = divmod(mins, 60)
-    return f"{int(hours):02}:{int(mins):02}:{int(secs):02}"
-
-
-def get_video_duration(cap):
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    if fps > 0:
-        return total_frames / fps
-    else:
-        return 0
-
-def process_video(file_path, unique_id):
-    pose_estimation = PoseEstimation()
-    cap = cv2.VideoCapture(file_path)
-    total_exercise_duration_seconds = get_video_duration(cap)
-    processed_frames = 0
-
-    def update_progress():
-        nonlocal processed_frames
-        elapsed_time = time.time() - start_time
-        progress = (processed_frames / total_frames) * 100
-        estimated_time_remaining = (elapsed_time / processed_frames) * (
-                    total_frames - processed_frames) if processed_frames > 0 else 0
-        progress_data = {"progress": progress, "elapsed_time": elapsed_time,
-                         "estimated_time_remaining": estimated_time_remaining}
-
-        # 更新结果文件中的进度信息
-        results["progress"] = {
-            "progress": progress,
-            "elapsed_time": format_time(elapsed_time),
-            "estimated_time_remaining": format_time(estimated_time_remaining)
-        }
-        with open(os.path.join(app.config['UPLOAD_FOLDER'], f"{unique_id}_results.json"), 'w') as f:
-            json.dump(results, f, indent=4)
-
-    start_time = time.time()
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-
-    total_exercise_duration_formatted = format_time(total_exercise_duration_seconds)
-
-    results = {
-        "speeds": {},
-        "calories_burned": 0,
-        "calories_burned_per_hour": 0,
-        "intensity": "",
-        "swing_count": 0,
-        "step_count": 0,
-        "highlight_ratios": {},
-        "covered_area": 0,
-        "match_counts": {},
-        "templates": pose_estimation.templates,
-        "total_exercise_duration": total_exercise_duration_formatted,
-        "progress": {"progress": 0, "elapsed_time": "00:00:00", "estimated_time_remaining": "00:00:00"}
-    }
-
-    with pose_estimation.mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5,
-                                      model_complexity=0) as pose:
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            pose_estimation.process_video(frame, pose)
-            processed_frames += 1
-
-            if processed_frames % 100 == 0:  # 每处理100帧更新一次进度
-                update_progress()
-
-    cap.release()
-
-    speeds = pose_estimation.speeds
-    swing_count = sum(pose_estimation.template_match_counts["Arm"].values())
-    step_count = sum(pose_estimation.template_match_counts["Footwork"].values())
-
-    average_speed = speeds['overall']['avg']
-    estimated_met = estimate_met(average_speed, step_count, swing_count)
-    calories_burned = calculate_calories_burned(estimated_met, 70, total_exercise_duration_seconds / 60)
-    calories_burned_per_hour, intensity = calculate_calories_burned_per_hour(calories_burned, total_exercise_duration_seconds / 60)
-
-    highlight_ratios = {str(tuple(map(tuple, vertices))): 0 for vertices in pose_estimation.grid_rects}
-    for cell_points_tuple in pose_estimation.highlight_counts:
-        if str(cell_points_tuple) in highlight_ratios:
-            highlight_ratios[str(cell_points_tuple)] = (pose_estimation.highlight_counts[cell_points_tuple] / sum(
-                pose_estimation.highlight_counts.values())) * 100
-
-    covered_area = pose_estimation.calculate_covered_area({eval(k): v for k, v in highlight_ratios.items()})
-
-    match_counts = pose_estimation.template_match_counts
-    results.update({
-        "speeds": speeds,
-        "calories_burned": calories_burned,
-        "calories_burned_per_hour": calories_burned_per_hour,
-        "intensity": intensity,
-        "swing_count": swing_count,
-        "step_count": step_count,
-        "highlight_ratios": highlight_ratios,
-        "covered_area": covered_area,
-        "match_counts": match_counts,
-        "progress": {
-            "progress": 100,
-            "elapsed_time": format_time(time.time() - start_time),
-            "estimated_time_remaining": format_time(0)
-        }
-    })
-
-    with open(os.path.join(app.config['UPLOAD_FOLDER'], f"{unique_id}_results.json"), 'w') as f:
-        json.dump(results, f, indent=4)
-
-
-
 
 def kill_previous_process(port=5000):
     for proc in psutil.process_iter(['pid', 'name', 'connections']):
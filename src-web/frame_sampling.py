@@ -0,0 +1,141 @@
+import numpy as np
+
+from pose_backend import POSE_BACKEND, LocalPose, as_pose_results, results_to_array
+
+DEFAULT_STRIDE = 3  # 抽帧模式下每 N 帧做一次姿态推理
+FAST_MOTION_THRESHOLD = 0.01  # 关键点平均位移 (归一化坐标/帧) 超过该值时视为快速动作
+
+
+def interpolate_landmarks(start, end, fraction):
+    """两组 (33, 4) 关键点之间线性插值，fraction 为 0~1"""
+    return start + (end - start) * fraction
+
+
+def landmark_motion(start, end, frames):
+    """两个关键帧之间关键点 x/y 的平均每帧位移"""
+    if start is None or end is None or frames <= 0:
+        return 0.0
+    return float(np.mean(np.linalg.norm(end[:, :2] - start[:, :2], axis=-1))) / frames
+
+
+def sample_frames(reader, detect, stride=DEFAULT_STRIDE, adaptive=False, motion_threshold=FAST_MOTION_THRESHOLD):
+    """
+    抽帧推理: 每 stride 帧调用一次 detect(frame)，中间帧的关键点由前后关键帧插值得到。
+
+    参数:
+    - reader: PrefetchReader (read() 返回 (ret, frame)，timestamp 为当前帧时间戳)
+    - detect: frame -> mp.solutions.pose 结构的结果
+    - adaptive: 为 True 时，上一段关键帧之间动作较快 (超过 motion_threshold) 则下一段逐帧推理
+
+    依次产出 (frame, timestamp, results, is_keyframe)。中间帧的 frame 为下一个关键帧的图像
+    (离线任务只用它做棋盘格标定)，视频结尾的帧为最后一个关键帧的图像；产出的 frame 在下一次迭代前有效。
+    """
+    stride = max(1, stride)
+    previous_landmarks = None
+    current_stride = 1  # 第一帧总是关键帧
+    pending_timestamps = []
+    last_keyframe = None  # 最后一个关键帧图像的副本，给视频结尾的帧使用
+
+    while True:
+        ret, frame = reader.read()
+        if not ret:
+            break
+        timestamp = reader.timestamp
+
+        if len(pending_timestamps) + 1 < current_stride:
+            pending_timestamps.append(timestamp)
+            continue
+
+        results = detect(frame)
+        landmarks = results_to_array(results)
+
+        # 补上关键帧之间的帧: 两端都检测到人体时插值，否则视为未检测到
+        gap = len(pending_timestamps) + 1
+        for offset, pending_timestamp in enumerate(pending_timestamps, start=1):
+            if previous_landmarks is not None and landmarks is not None:
+                interpolated = interpolate_landmarks(previous_landmarks, landmarks, offset / gap)
+                yield frame, pending_timestamp, as_pose_results(interpolated), False
+            else:
+                yield frame, pending_timestamp, as_pose_results(None), False
+        yield frame, timestamp, results, True
+
+        if last_keyframe is None or last_keyframe.shape != frame.shape:
+            last_keyframe = np.empty_like(frame)
+        np.copyto(last_keyframe, frame)
+
+        fast = adaptive and landmark_motion(previous_landmarks, landmarks, gap) > motion_threshold
+        current_stride = 1 if fast else stride
+        previous_landmarks = landmarks
+        pending_timestamps = []
+
+    # 视频结尾不足一个间隔的帧没有后一个关键帧，沿用最后一次的结果
+    for pending_timestamp in pending_timestamps:
+        yield last_keyframe, pending_timestamp, as_pose_results(previous_landmarks), False
+
+
+def compare_reports(reference, sampled):
+    """
+    抽帧结果与逐帧结果的差异 (job_pool.run_job 写出的结果 JSON)。
+
+    返回 {指标: (逐帧值, 抽帧值, 相对误差)}
+    """
+    metrics = {
+        'calories_burned': lambda r: r['calories_burned'],
+        'speed_overall_avg': lambda r: r['speeds']['overall']['avg'],
+        'speed_overall_max': lambda r: r['speeds']['overall']['max'],
+        'speed_forward_avg': lambda r: r['speeds']['forward']['avg'],
+        'speed_sideways_avg': lambda r: r['speeds']['sideways']['avg'],
+        'swing_count': lambda r: r['swing_count'],
+        'step_count': lambda r: r['step_count'],
+        'covered_area': lambda r: r['covered_area'],
+    }
+    comparison = {}
+    for name, extract in metrics.items():
+        full_value, sampled_value = extract(reference), extract(sampled)
+        error = abs(sampled_value - full_value) / abs(full_value) if full_value else float(sampled_value != 0)
+        comparison[name] = (full_value, sampled_value, error)
+    return comparison
+
+
+if __name__ == "__main__":
+    # 抽帧精度报告: python frame_sampling.py ../mp4/01.mov --strides 2 3 4
+    import argparse
+    import json
+    import os
+    import tempfile
+    import time
+
+    from job_pool import run_job
+    from pose_estimation import PoseEstimation, HEADLESS_OUTPUTS
+
+    parser = argparse.ArgumentParser(description="Compare frame-stride analysis against full-rate analysis")
+    parser.add_argument('video')
+    parser.add_argument('--strides', nargs='+', type=int, default=[2, 3, 4])
+    args = parser.parse_args()
+
+    output_folder = tempfile.mkdtemp()
+    pose_estimation = PoseEstimation(outputs=HEADLESS_OUTPUTS)
+    modes = [('full', 1, False)] + [(f'stride {k}', k, False) for k in args.strides] + \
+            [(f'adaptive {k}', k, True) for k in args.strides]
+
+    reports = {}
+    for label, stride, adaptive in modes:
+        with LocalPose(POSE_BACKEND, min_detection_confidence=0.5, min_tracking_confidence=0.5,
+                       model_complexity=0) as pose:
+            pose_estimation.reset_variables()
+            unique_id = label.replace(' ', '_')
+            start = time.time()
+            run_job(pose_estimation, pose, args.video, unique_id, output_folder, lambda processed_frames: None,
+                    stride=stride, adaptive=adaptive)
+            elapsed = time.time() - start
+        with open(os.path.join(output_folder, f"{unique_id}_results.json")) as f:
+            reports[label] = (json.load(f), elapsed)
+
+    reference, full_time = reports['full']
+    print(f"full: {full_time:.1f} s")
+    for label, (report, elapsed) in reports.items():
+        if label == 'full':
+            continue
+        print(f"\n{label}: {elapsed:.1f} s ({full_time / elapsed:.1f}x faster)")
+        for name, (full_value, sampled_value, error) in compare_reports(reference, report).items():
+            print(f"  {name:<20} full {full_value:10.3f}  sampled {sampled_value:10.3f}  error {error * 100:6.1f}%")
@@ -0,0 +1,349 @@
+import itertools
+import json
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+import psutil
+
+from metrics import take_cache_stats
+from pose_backend import POSE_BACKEND, LocalPose
+from pose_estimation import (PoseEstimation, HEADLESS_OUTPUTS, estimate_met, calculate_calories_burned,
+                             calculate_calories_burned_per_hour)
+from stage_profiler import StageProfiler
+from video_source import PrefetchReader
+from frame_sampling import sample_frames
+
+PROGRESS_EVERY = 30  # 每处理 N 帧向 app.py 汇报一次帧数和阶段耗时
+RESULTS_EVERY = 100  # 每处理 N 帧更新一次结果文件中的进度
+WARMUP_SHAPE = (720, 1280, 3)  # 预热用的空白帧尺寸
+PREFETCH_FRAMES = 8  # 预读取缓冲区帧数
+WORKER_CHECK_INTERVAL = 1.0  # 没有事件时检查 worker 是否存活的间隔 (秒)
+
+
+def format_time(seconds):
+    mins, secs = divmod(seconds, 60)
+    hours, mins = divmod(mins, 60)
+    return f"{int(hours):02}:{int(mins):02}:{int(secs):02}"
+
+
+def get_video_duration(cap):
+    fps = cap.fps
+    total_frames = cap.frame_count
+    if fps > 0:
+        return total_frames / fps
+    else:
+        return 0
+
+
+def run_job(pose_estimation, pose, file_path, unique_id, upload_folder, report_progress, stride=1, adaptive=False):
+    """
+    分析一个上传的视频并写入 <unique_id>_results.json。
+
+    pose_estimation 和 pose 由常驻 worker 提供，调用前已经 reset_variables()。
+    report_progress(processed_frames) 定期被调用。
+    stride > 1 时为快速模式: 每 stride 帧推理一次，中间帧插值 (adaptive 时快速动作段逐帧推理)。
+    """
+    results_path = os.path.join(upload_folder, f"{unique_id}_results.json")
+    # 解码在后台线程中进行，与 Pose 推理重叠
+    cap = PrefetchReader(file_path, buffer_size=PREFETCH_FRAMES)
+    total_exercise_duration_seconds = get_video_duration(cap)
+    processed_frames = 0
+
+    def update_progress():
+        elapsed_time = time.time() - start_time
+        progress = (processed_frames / total_frames) * 100
+        estimated_time_remaining = (elapsed_time / processed_frames) * (
+                    total_frames - processed_frames) if processed_frames > 0 else 0
+
+        # 更新结果文件中的进度信息
+        results["progress"] = {
+            "progress": progress,
+            "elapsed_time": format_time(elapsed_time),
+            "estimated_time_remaining": format_time(estimated_time_remaining)
+        }
+        with open(results_path, 'w') as f:
+            json.dump(results, f, indent=4)
+
+    start_time = time.time()
+    profiler = pose_estimation.profiler
+    total_frames = cap.frame_count
+
+    total_exercise_duration_formatted = format_time(total_exercise_duration_seconds)
+
+    results = {
+        "speeds": {},
+        "calories_burned": 0,
+        "calories_burned_per_hour": 0,
+        "intensity": "",
+        "swing_count": 0,
+        "step_count": 0,
+        "highlight_ratios": {},
+        "covered_area": 0,
+        "match_counts": {},
+        "templates": pose_estimation.templates,
+        "total_exercise_duration": total_exercise_duration_formatted,
+        "progress": {"progress": 0, "elapsed_time": "00:00:00", "estimated_time_remaining": "00:00:00"}
+    }
+
+    def detect(image):
+        detect_start = time.perf_counter()
+        results = pose_estimation.detect_pose(image, pose)
+        if profiler.enabled:
+            profiler.record('pose', time.perf_counter() - detect_start)
+        return results
+
+    def frames():
+        if stride > 1:
+            for frame, timestamp, results, _ in sample_frames(cap, detect, stride, adaptive):
+                yield frame, timestamp, results
+            return
+        while cap.isOpened():
+            decode_start = time.perf_counter()
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if profiler.enabled:
+                # 只记录等待解码线程的时间，即没有被推理掩盖的解码耗时
+                profiler.record('decode', time.perf_counter() - decode_start)
+            yield frame, cap.timestamp, None
+
+    # 出错时也释放解码线程和 VideoCapture，常驻 worker 会继续处理后面的任务
+    try:
+        for frame, timestamp, results in frames():
+            # 速度按帧的媒体时间戳计算，不依赖 fps
+            pose_estimation.process_video(frame, pose, timestamp=timestamp, results=results)
+            processed_frames += 1
+
+            if processed_frames % PROGRESS_EVERY == 0:
+                report_progress(processed_frames)
+            if processed_frames % RESULTS_EVERY == 0:  # 每处理100帧更新一次进度
+                update_progress()
+    finally:
+        cap.release()
+    report_progress(processed_frames)
+
+    speeds = pose_estimation.speeds
+    swing_count = sum(pose_estimation.template_match_counts["Arm"].values())
+    step_count = sum(pose_estimation.template_match_counts["Footwork"].values())
+
+    average_speed = speeds['overall']['avg']
+    estimated_met = estimate_met(average_speed, step_count, swing_count)
+    calories_burned = calculate_calories_burned(estimated_met, 70, total_exercise_duration_seconds / 60)
+    calories_burned_per_hour, intensity = calculate_calories_burned_per_hour(calories_burned, total_exercise_duration_seconds / 60)
+
+    highlight_ratios = {str(tuple(map(tuple, vertices))): 0 for vertices in pose_estimation.grid_rects}
+    for cell_points_tuple in pose_estimation.highlight_counts:
+        if str(cell_points_tuple) in highlight_ratios:
+            highlight_ratios[str(cell_points_tuple)] = (pose_estimation.highlight_counts[cell_points_tuple] / sum(
+                pose_estimation.highlight_counts.values())) * 100
+
+    covered_area = pose_estimation.calculate_covered_area({eval(k): v for k, v in highlight_ratios.items()})
+
+    match_counts = pose_estimation.template_match_counts
+    results.update({
+        "speeds": speeds,
+        "calories_burned": calories_burned,
+        "calories_burned_per_hour": calories_burned_per_hour,
+        "intensity": intensity,
+        "swing_count": swing_count,
+        "step_count": step_count,
+        "highlight_ratios": highlight_ratios,
+        "covered_area": covered_area,
+        "match_counts": match_counts,
+        "progress": {
+            "progress": 100,
+            "elapsed_time": format_time(time.time() - start_time),
+            "estimated_time_remaining": format_time(0)
+        }
+    })
+
+    with open(results_path, 'w') as f:
+        json.dump(results, f, indent=4)
+
+
+def job_worker_main(worker_id, job_queue, event_queue, upload_folder, current_job):
+    """
+    常驻 worker 进程入口。
+
+    模板、棋盘格配置和姿态后端 (POSE_BACKEND) 只在启动时加载一次，之后每个任务只调用 reset_variables()。
+    通过 event_queue 向 app.py 汇报: ('ready'/'started'/'progress'/'done'/'error', 任务 ID, 数据)。
+    缓存计数只在本进程中累加，随 progress/done 事件把增量和本进程的常驻内存一起发送。
+    current_job: 共享内存中的当前任务序号 (-1 为空闲)，进程崩溃时队列里未发出的事件会丢失，JobPool 靠它找到中断的任务。
+    """
+    profiler = StageProfiler(report_interval=None)
+    process = psutil.Process()
+
+    def memory():
+        return worker_id, process.memory_info().rss
+
+    pose_estimation = PoseEstimation(outputs=HEADLESS_OUTPUTS, profiler=profiler)
+
+    with LocalPose(POSE_BACKEND, min_detection_confidence=0.5, min_tracking_confidence=0.5,
+                   model_complexity=0) as pose:
+        # 预热: 第一次 process() 才会初始化计算图和加载模型
+        pose.process(np.zeros(WARMUP_SHAPE, dtype=np.uint8))
+        event_queue.put(('ready', worker_id, memory()))
+
+        while True:
+            job = job_queue.get()
+            if job is None:
+                break
+            job_number, file_path, unique_id, stride, adaptive = job
+            current_job.value = job_number
+
+            def report_progress(processed_frames):
+                # 只发送上次汇报之后的耗时，由 app.py 的 profiler 合并
+                event_queue.put(('progress', unique_id,
+                                 (processed_frames, profiler.histogram_items(), take_cache_stats(), memory())))
+                profiler.reset()
+
+            # 新视频的第一帧会因跟踪置信度低重新检测人体，姿态后端不需要重建
+            pose_estimation.reset_variables()
+            event_queue.put(('started', unique_id, worker_id))
+            try:
+                run_job(pose_estimation, pose, file_path, unique_id, upload_folder, report_progress, stride, adaptive)
+                event_queue.put(('done', unique_id, (take_cache_stats(), memory())))
+            except Exception as e:
+                print(f"Job {unique_id} failed: {e}")
+                event_queue.put(('error', unique_id, str(e)))
+            current_job.value = -1
+
+
+class JobPool:
+    """
+    预热的 worker 进程池，替代每个上传任务新建 PoseEstimation 和姿态后端。
+
+    - submit(): 任务进入队列，由空闲的 worker 处理
+    - on_event(kind, unique_id, data): 在监听线程中调用，app.py 用它更新任务状态和 /metrics
+
+    worker 进程意外退出 (MediaPipe 崩溃、被 OOM 杀掉) 时，它正在处理的任务以 'error' 事件结束，并重新启动该 worker。
+    """
+
+    def __init__(self, num_workers=2, upload_folder='upload', on_event=None):
+        # spawn: 与 PoseWorker 相同，子进程不继承 Flask 的线程状态
+        self.context = mp.get_context('spawn')
+        self.job_queue = self.context.Queue()
+        self.event_queue = self.context.Queue()
+        self.upload_folder = upload_folder
+        self.on_event = on_event
+        self.ready_ids = set()
+        self.job_ids = {}  # 任务序号 -> 任务 ID (已提交、尚未结束)
+        self.job_numbers = itertools.count()
+        self.closing = False
+
+        self.current_jobs = [self.context.Value('q', -1, lock=False) for _ in range(num_workers)]
+        self.workers = [self.start_worker(worker_id) for worker_id in range(num_workers)]
+
+        self.listener = threading.Thread(target=self.listen, daemon=True)
+        self.listener.start()
+
+    @property
+    def ready_workers(self):
+        return len(self.ready_ids)
+
+    def start_worker(self, worker_id):
+        self.current_jobs[worker_id].value = -1
+        worker = self.context.Process(target=job_worker_main,
+                                      args=(worker_id, self.job_queue, self.event_queue, self.upload_folder,
+                                            self.current_jobs[worker_id]),
+                                      daemon=True)
+        worker.start()
+        return worker
+
+    def submit(self, file_path, unique_id, stride=1, adaptive=False):
+        job_number = next(self.job_numbers)
+        self.job_ids[job_number] = unique_id
+        self.job_queue.put((job_number, file_path, unique_id, stride, adaptive))
+
+    def listen(self):
+        while True:
+            try:
+                event = self.event_queue.get(timeout=WORKER_CHECK_INTERVAL)
+            except queue.Empty:
+                event = ()
+            if event is None:
+                break
+            if event:
+                kind, unique_id, data = event
+                if kind == 'ready':
+                    self.ready_ids.add(unique_id)
+                elif kind in ('done', 'error'):
+                    for job_number, job_id in list(self.job_ids.items()):
+                        if job_id == unique_id:
+                            del self.job_ids[job_number]
+                self.dispatch(*event)
+            self.check_workers()
+
+    def dispatch(self, kind, unique_id, data):
+        if self.on_event is not None:
+            self.on_event(kind, unique_id, data)
+
+    def check_workers(self):
+        if self.closing:
+            return
+        for worker_id, worker in enumerate(self.workers):
+            if worker is None or worker.is_alive():
+                continue
+            worker.join()
+            message = f"worker {worker_id} exited with code {worker.exitcode}"
+            unique_id = self.job_ids.pop(self.current_jobs[worker_id].value, None)
+            if unique_id is not None:
+                self.dispatch('error', unique_id, message)
+            if worker_id not in self.ready_ids:
+                # 预热阶段就退出 (依赖缺失等)，重启也会同样失败
+                print(f"Pose {message} during startup")
+                self.workers[worker_id] = None
+                continue
+            self.ready_ids.discard(worker_id)
+            print(f"Pose {message}, restarting")
+            self.workers[worker_id] = self.start_worker(worker_id)
+
+    def close(self):
+        self.closing = True
+        for _ in self.workers:
+            self.job_queue.put(None)
+        for worker in self.workers:
+            if worker is None:
+                continue
+            worker.join(timeout=10)
+            if worker.is_alive():
+                worker.terminate()
+        self.event_queue.put(None)
+
+
+if __name__ == "__main__":
+    # 冷启动 vs 预热 worker: python job_pool.py ../mp4/01.mov
+    import sys
+    import tempfile
+
+    video_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join('..', 'mp4', '01.mov')
+    output_folder = tempfile.mkdtemp()
+    finished = threading.Event()
+    submit_times = {}
+
+    def print_event(kind, unique_id, data):
+        if kind == 'ready':
+            print(f"worker {unique_id} ready")
+        elif kind == 'started':
+            print(f"job {unique_id} started after {time.time() - submit_times[unique_id]:.2f} s")
+        elif kind in ('done', 'error'):
+            detail = data if kind == 'error' else f"(worker RSS {data[1][1] / 2 ** 20:.0f} MiB)"
+            print(f"job {unique_id} {kind} in {time.time() - submit_times[unique_id]:.2f} s {detail}")
+            if unique_id == 'job-2':
+                finished.set()
+
+    start = time.time()
+    pool = JobPool(num_workers=1, upload_folder=output_folder, on_event=print_event)
+    while pool.ready_workers < 1:
+        time.sleep(0.05)
+    print(f"pool warm-up: {time.time() - start:.2f} s")
+
+    for unique_id in ('job-1', 'job-2'):
+        submit_times[unique_id] = time.time()
+        pool.submit(video_path, unique_id)
+    finished.wait()
+    pool.close()
@@ -0,0 +1,97 @@
+import numpy as np
+
+from pose_backend import NUM_LANDMARKS
+
+# 关键点分组，均为连续下标，切片得到的是视图而不是副本
+HAND_SLICE = slice(17, 21)  # 左右手 17~20
+HIP_SLICE = slice(23, 25)  # 左右髋 23, 24
+FOOT_SLICE = slice(29, 33)  # 左右脚跟、脚尖 29~32
+
+
+def write_landmarks(row, landmarks):
+    """把一帧关键点写入 (33, 4) 的 row: 支持 (33, 4) 数组或 mp 的 landmark 列表"""
+    if isinstance(landmarks, np.ndarray):
+        np.copyto(row, landmarks)
+        return
+    row.reshape(-1)[:] = np.fromiter((value for lm in landmarks for value in (lm.x, lm.y, lm.z, lm.visibility)),
+                                     dtype=row.dtype, count=NUM_LANDMARKS * 4)
+
+
+class LandmarkRingBuffer:
+    """
+    预分配的 (capacity, 33, 4) 关键点环形缓冲区 (x, y, z, visibility)。
+
+    - push(): 每帧一次性转换并写入，返回该帧的 (33, 4) 视图，下游直接使用数组
+    - since(): 取出某一时刻之后写入的帧 (录制模板)，超过容量时只保留最近 capacity 帧
+    """
+
+    def __init__(self, capacity=600):
+        self.capacity = capacity
+        self.data = np.full((capacity, NUM_LANDMARKS, 4), np.nan, dtype=np.float32)
+        self.timestamps = np.full(capacity, np.nan, dtype=np.float64)
+        self.total = 0  # 累计写入的帧数
+
+    def clear(self):
+        self.data[:] = np.nan
+        self.timestamps[:] = np.nan
+        self.total = 0
+
+    def push(self, landmarks, timestamp=None):
+        slot = self.total % self.capacity
+        row = self.data[slot]
+        write_landmarks(row, landmarks)
+        self.timestamps[slot] = np.nan if timestamp is None else timestamp
+        self.total += 1
+        return row
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def since(self, start_total, end_total=None):
+        """返回累计计数在 [start_total, end_total) 之间的帧，按时间顺序，(N, 33, 4) 副本"""
+        end_total = self.total if end_total is None else min(end_total, self.total)
+        start_total = max(start_total, self.total - self.capacity)
+        if end_total <= start_total:
+            return np.empty((0, NUM_LANDMARKS, 4), dtype=np.float32)
+        indices = np.arange(start_total, end_total) % self.capacity
+        return self.data[indices]
+
+    def latest(self, count=1):
+        return self.since(self.total - count)
+
+
+if __name__ == "__main__":
+    # 转换开销对比: 元组列表 vs 环形缓冲区
+    import time
+    import tracemalloc
+    from types import SimpleNamespace
+
+    rng = np.random.default_rng(0)
+    frames = [[SimpleNamespace(x=float(x), y=float(y), z=float(z), visibility=float(v))
+               for x, y, z, v in rng.random((NUM_LANDMARKS, 4))] for _ in range(600)]
+
+    def record_tuples():
+        keypoints_data = []
+        for landmarks in frames:
+            keypoints = [(lm.x, lm.y, lm.z) for lm in landmarks]
+            foot_points = [(landmarks[idx].x, landmarks[idx].y, landmarks[idx].z) for idx in [29, 31, 30, 32]]
+            hand_points = [(landmarks[idx].x, landmarks[idx].y) for idx in [17, 19, 18, 20]]
+            keypoints_data.append(keypoints)
+        return keypoints_data
+
+    def record_buffer():
+        buffer = LandmarkRingBuffer(len(frames))
+        for landmarks in frames:
+            row = buffer.push(landmarks)
+            keypoints, foot_points, hand_points = row[:, :3], row[FOOT_SLICE, :3], row[HAND_SLICE, :2]
+        return buffer
+
+    for label, record in [("tuples", record_tuples), ("ring buffer", record_buffer)]:
+        start = time.perf_counter()
+        record()
+        elapsed = time.perf_counter() - start
+        tracemalloc.start()
+        recorded = record()
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(f"{label:<12} {elapsed / len(frames) * 1e6:5.1f} us/frame, {memory / 1024:5.0f} KiB for {len(frames)} frames")
@@ -0,0 +1,153 @@
+import json
+import os
+import threading
+
+import cv2
+import numpy as np
+
+from pose_backend import NUM_LANDMARKS, POSE_BACKEND, create_pose_backend
+
+# 每帧的计算状态
+FRAME_PENDING = 0
+FRAME_DETECTED = 1
+FRAME_NO_POSE = 2
+
+
+def landmark_track_paths(video_path):
+    base = os.path.splitext(video_path)[0]
+    return base + '_landmarks.npy', base + '_landmarks_state.npy', base + '_landmarks_meta.json'
+
+
+class LandmarkTrack:
+    """
+    整段视频的关键点缓存，拖动进度条/快进快退/暂停时直接读取，不再重新推理。
+
+    - 数据保存在视频旁边的 <video>_landmarks.npy (内存映射, T×33×4: x, y, z, visibility)，
+      未检测到人体的帧为 NaN
+    - <video>_landmarks_state.npy 记录每帧状态 (未计算 / 已检测 / 无人体)，
+      中途退出后下次打开会从第一个未计算的帧继续
+    - <video>_landmarks_meta.json 记录生成缓存时视频文件的大小、修改时间和后端名称，
+      视频被替换 (即使帧数相同) 或换了后端时重新计算
+    - start() 在后台线程中顺序读取视频并运行姿态估计后端 (默认 POSE_BACKEND)
+    """
+
+    def __init__(self, video_path, backend=POSE_BACKEND):
+        self.video_path = video_path
+        self.backend = backend
+        # 用容器记录的帧数作为缓存长度，重复打开同一视频时保持一致
+        cap = cv2.VideoCapture(video_path)
+        self.frame_count = max(1, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+        cap.release()
+        self.data_path, self.state_path, self.meta_path = landmark_track_paths(video_path)
+        video_stat = os.stat(video_path)
+        self.meta = {'video_size': video_stat.st_size, 'video_mtime': video_stat.st_mtime, 'backend': backend}
+
+        if not self.open_existing():
+            if os.path.exists(self.meta_path):
+                os.remove(self.meta_path)
+            self.landmarks = np.lib.format.open_memmap(self.data_path, mode='w+', dtype=np.float32,
+                                                       shape=(self.frame_count, NUM_LANDMARKS, 4))
+            self.landmarks[:] = np.nan
+            self.state = np.lib.format.open_memmap(self.state_path, mode='w+', dtype=np.uint8,
+                                                   shape=(self.frame_count,))
+            self.state[:] = FRAME_PENDING
+            self.state.flush()
+            # 最后写入元数据: 写到一半退出时下次打开仍会重建
+            with open(self.meta_path, 'w') as f:
+                json.dump(self.meta, f)
+
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def open_existing(self):
+        if not all(os.path.exists(path) for path in (self.data_path, self.state_path, self.meta_path)):
+            return False
+        try:
+            with open(self.meta_path, 'r') as f:
+                meta = json.load(f)
+            landmarks = np.load(self.data_path, mmap_mode='r+')
+            state = np.load(self.state_path, mmap_mode='r+')
+        except (ValueError, OSError) as e:
+            print(f"Landmark cache unreadable, rebuilding: {e}")
+            return False
+        if meta != self.meta:
+            print("Landmark cache is for a different video file or backend, rebuilding")
+            return False
+        if landmarks.shape != (self.frame_count, NUM_LANDMARKS, 4) or state.shape != (self.frame_count,):
+            return False
+        self.landmarks = landmarks
+        self.state = state
+        return True
+
+    @property
+    def complete(self):
+        return bool(np.all(self.state != FRAME_PENDING))
+
+    def start(self):
+        if self.complete or (self.thread is not None and self.thread.is_alive()):
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.compute, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=2)
+        self.flush()
+
+    def flush(self):
+        self.landmarks.flush()
+        self.state.flush()
+
+    def compute(self):
+        pending = np.flatnonzero(self.state == FRAME_PENDING)
+        if len(pending) == 0:
+            return
+        start_frame = int(pending[0])
+
+        cap = cv2.VideoCapture(self.video_path)
+        if start_frame > 0:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+
+        # 后台线程独占一个后端实例，按顺序处理可以使用跟踪模式
+        with create_pose_backend(self.backend) as pose:
+            index = start_frame
+            while index < self.frame_count and not self.stop_event.is_set():
+                ret, frame = cap.read()
+                if not ret:
+                    break
+
+                image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                landmarks = pose.process(image, int(index * 1000 / fps))
+                if landmarks is not None:
+                    self.landmarks[index] = landmarks
+                    self.state[index] = FRAME_DETECTED
+                else:
+                    self.state[index] = FRAME_NO_POSE
+
+                index += 1
+                if index % 300 == 0:
+                    self.flush()
+
+        # 视频实际帧数少于 frame_count 时，剩余帧标记为无人体
+        if not self.stop_event.is_set():
+            self.state[index:] = np.where(self.state[index:] == FRAME_PENDING, FRAME_NO_POSE, self.state[index:])
+        cap.release()
+        self.flush()
+        print(f"Landmark track {'stopped' if self.stop_event.is_set() else 'finished'} at frame {index}")
+
+    def is_ready(self, index):
+        return 0 <= index < self.frame_count and self.state[index] != FRAME_PENDING
+
+    def keypoints(self, index):
+        """
+        返回缓存的关键点 [(x, y, z), ...]，与 MediaPipe 结果的格式一致。
+
+        该帧尚未计算或未检测到人体时返回 None。
+        """
+        if not 0 <= index < self.frame_count or self.state[index] != FRAME_DETECTED:
+            return None
+        return [tuple(point) for point in self.landmarks[index, :, :3].tolist()]
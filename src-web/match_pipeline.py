@@ -0,0 +1,357 @@
+import multiprocessing as mp
+import os
+import queue
+import sys
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from pose_backend import NUM_LANDMARKS, POSE_BACKEND, create_pose_backend
+from table_calibration import load_table_calibration
+from video_source import PrefetchReader
+
+# 球检测代码在 src-table-tennis-zh 中 (ball_stage.py、bounce_log.py)
+BALL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src-table-tennis-zh')
+BALL_MODEL_PATH = os.path.join(BALL_PATH, 'best_bak.pt')
+REGION_DIVISION_PATH = os.path.join(BALL_PATH, 'Region_division.txt')
+
+STAGES = ('pose', 'ball')
+FRAME_SLOTS = 8  # 共享内存中的帧槽位数，两个阶段都处理完后槽位才被重用
+STAGE_TIMEOUT = 30  # 等待阶段结果的超时 (秒)
+
+WRIST_INDICES = [15, 16]  # 左右手腕
+SHOT_SPEED = 1.5  # 手腕速度峰值 (归一化坐标/秒) 超过该值时视为一次击球
+SHOT_MIN_GAP = 0.3  # 两次击球的最小间隔 (秒)
+ATTRIBUTION_WINDOW = 1.5  # 落点前该时间 (秒) 内的最近一次击球对应到该落点
+
+
+def add_ball_path():
+    if BALL_PATH not in sys.path:
+        sys.path.append(BALL_PATH)
+
+
+def create_stage(stage, infer_ms=None, **kwargs):
+    """
+    返回 process(frame, timestamp) -> 结果 和 close()。
+
+    - pose: (33, 4) 关键点或 None；kwargs 为 create_pose_backend 的参数 (backend=... 选择后端)
+    - ball: (球框或 None, 弹跳或 None)，见 BallStage.process；kwargs 传给 BallStage
+    infer_ms 不为 None 时不加载模型，每帧等待 infer_ms 毫秒，用于测量流水线本身的开销 (同 video_source --infer-ms)。
+    """
+    if infer_ms is not None:
+        return lambda frame, timestamp: time.sleep(infer_ms / 1000), lambda: None
+
+    if stage == 'pose':
+        backend = create_pose_backend(kwargs.pop('backend', POSE_BACKEND), **kwargs)
+        return lambda frame, timestamp: backend.process(frame, int(timestamp * 1000)), backend.close
+
+    add_ball_path()
+    from ultralytics import YOLO
+    from ball_stage import BallStage
+
+    model = YOLO(kwargs.pop('model_path', BALL_MODEL_PATH))
+    ball_stage = BallStage(model, region_path=REGION_DIVISION_PATH, verbose=False, **kwargs)
+    return lambda frame, timestamp: ball_stage.process(frame), lambda: None
+
+
+def stage_worker_main(stage, frame_shm_name, frame_shape, slots, request_queue, response_queue, stage_kwargs):
+    """
+    阶段进程入口。帧在共享内存中，队列里只传递 (槽位, 帧号, 时间戳)；
+    结果 (关键点、球框) 很小，直接通过队列返回: ('done', 阶段, 帧号, (槽位, 结果))。
+    """
+    frame_shm = shared_memory.SharedMemory(name=frame_shm_name)
+    frames = np.ndarray((slots,) + tuple(frame_shape), dtype=np.uint8, buffer=frame_shm.buf)
+    close = None
+    try:
+        process, close = create_stage(stage, **stage_kwargs)
+        response_queue.put(('ready', stage, None, None))
+        while True:
+            request = request_queue.get()
+            if request is None:
+                break
+            slot, frame_index, timestamp = request
+            response_queue.put(('done', stage, frame_index, (slot, process(frames[slot], timestamp))))
+    except Exception as e:
+        response_queue.put(('error', stage, None, str(e)))
+    finally:
+        if close is not None:
+            close()
+        del frames
+        frame_shm.close()
+
+
+class MatchPipeline:
+    """
+    球和球员的联合分析: 只解码一次，帧写入共享内存后由姿态和球两个阶段进程并行处理，结果按帧号合并。
+
+    - run(): 处理一个视频 (PrefetchReader，RGB)，返回 join_results() 的结果
+    - stages: 只启用部分阶段时与单独运行 src-web / real-time.py 的开销相当，用于对比
+    """
+
+    def __init__(self, frame_shape, stages=STAGES, slots=FRAME_SLOTS, stage_kwargs=None):
+        self.frame_shape = tuple(frame_shape)
+        self.stages = tuple(stages)
+        self.slots = slots
+
+        self.frame_shm = shared_memory.SharedMemory(create=True, size=slots * int(np.prod(self.frame_shape)))
+        self.frames = np.ndarray((slots,) + self.frame_shape, dtype=np.uint8, buffer=self.frame_shm.buf)
+
+        # spawn: 与 PoseWorker 相同
+        context = mp.get_context('spawn')
+        self.request_queues = {stage: context.Queue() for stage in self.stages}
+        self.response_queue = context.Queue()
+        self.processes = []
+        for stage in self.stages:
+            kwargs = (stage_kwargs or {}).get(stage, {})
+            process = context.Process(target=stage_worker_main,
+                                      args=(stage, self.frame_shm.name, self.frame_shape, slots,
+                                            self.request_queues[stage], self.response_queue, kwargs),
+                                      daemon=True)
+            process.start()
+            self.processes.append(process)
+
+        # 阶段进程在加载模型时崩溃不会发送任何消息: 按 STAGE_TIMEOUT 等待，并检查进程是否还在运行
+        ready = 0
+        deadline = time.monotonic() + STAGE_TIMEOUT
+        while ready < len(self.stages):
+            try:
+                status, stage, _, error = self.response_queue.get(timeout=1.0)
+            except queue.Empty:
+                dead = [stage for stage, process in zip(self.stages, self.processes) if not process.is_alive()]
+                if dead or time.monotonic() > deadline:
+                    self.close()
+                    reason = f"{', '.join(dead)} exited" if dead else f"no response within {STAGE_TIMEOUT} s"
+                    raise RuntimeError(f"Stage workers failed to start: {reason}")
+                continue
+            if status == 'error':
+                self.close()
+                raise RuntimeError(f"{stage} stage failed to start: {error}")
+            ready += 1
+
+        self.free_slots = list(range(slots))
+        self.slot_stages = {}  # 槽位 -> 尚未处理完该帧的阶段数
+        self.outputs = {stage: [] for stage in self.stages}  # 按帧号排列的各阶段结果
+
+    def handle_response(self):
+        try:
+            status, stage, frame_index, data = self.response_queue.get(timeout=STAGE_TIMEOUT)
+        except queue.Empty:
+            raise RuntimeError("Stage workers did not respond")
+        if status == 'error':
+            raise RuntimeError(f"{stage} stage error: {data}")
+
+        slot, result = data
+        self.outputs[stage][frame_index] = result
+        self.slot_stages[slot] -= 1
+        if self.slot_stages[slot] == 0:
+            del self.slot_stages[slot]
+            self.free_slots.append(slot)
+
+    def run(self, reader, max_frames=None, homography=None):
+        timestamps = []
+        for outputs in self.outputs.values():
+            outputs.clear()
+
+        while max_frames is None or len(timestamps) < max_frames:
+            ret, frame = reader.read()
+            if not ret:
+                break
+            # 两个阶段都处理完的槽位才能写入新帧
+            while not self.free_slots:
+                self.handle_response()
+            slot = self.free_slots.pop(0)
+            np.copyto(self.frames[slot], frame)
+
+            frame_index = len(timestamps)
+            timestamps.append(reader.timestamp)
+            self.slot_stages[slot] = len(self.stages)
+            for stage in self.stages:
+                self.outputs[stage].append(None)
+                self.request_queues[stage].put((slot, frame_index, reader.timestamp))
+
+        while self.slot_stages:
+            self.handle_response()
+
+        return join_results(np.array(timestamps, dtype=np.float64), self.outputs, homography)
+
+    def close(self):
+        for stage, process in zip(self.stages, self.processes):
+            if process.is_alive():
+                self.request_queues[stage].put(None)
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+        del self.frames
+        self.frame_shm.close()
+        self.frame_shm.unlink()
+
+
+def detect_shots(timestamps, landmarks, min_speed=SHOT_SPEED, min_gap=SHOT_MIN_GAP):
+    """
+    手腕速度的峰值视为击球。
+
+    参数:
+    - landmarks: (T, 33, 4)，未检测到人体的帧为 NaN
+
+    返回:
+    - [(帧号, 手腕速度)]
+    """
+    if len(timestamps) < 3:
+        return []
+    wrists = landmarks[:, WRIST_INDICES, :2]
+    dt = np.diff(timestamps)
+    distances = np.linalg.norm(np.diff(wrists, axis=0), axis=-1)  # (T - 1, 2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        speeds = np.fmax(distances[:, 0], distances[:, 1]) / np.where(dt > 0, dt, np.nan)
+    speeds = np.nan_to_num(speeds, nan=0.0)  # speeds[i] 为帧 i 到 i + 1 的速度
+
+    shots = []
+    for i in range(1, len(speeds) - 1):
+        if speeds[i] >= min_speed and speeds[i] >= speeds[i - 1] and speeds[i] > speeds[i + 1]:
+            frame_index = i + 1
+            if shots and timestamps[frame_index] - timestamps[shots[-1][0]] < min_gap:
+                # 间隔太近时保留速度较大的一次
+                if speeds[i] > shots[-1][1]:
+                    shots[-1] = (frame_index, float(speeds[i]))
+                continue
+            shots.append((frame_index, float(speeds[i])))
+    return shots
+
+
+def attribute_bounces(events, shots, timestamps, window=ATTRIBUTION_WINDOW):
+    """
+    落点 -> 击球: 每个落点对应其之前 window 秒内最近的一次击球，没有时为 None。
+
+    返回:
+    - [(落点帧号, 区域名或 None, 击球帧号或 None)]
+    """
+    from bounce_log import REGION_LABELS
+
+    shot_frames = np.array([frame_index for frame_index, _ in shots], dtype=np.int64)
+    shot_times = timestamps[shot_frames] if len(shot_frames) else np.empty(0)
+    attributions = []
+    for event in events:
+        index = np.searchsorted(shot_times, event['timestamp'], side='right') - 1
+        shot_frame = None
+        if index >= 0 and event['timestamp'] - shot_times[index] <= window:
+            shot_frame = int(shot_frames[index])
+        region = REGION_LABELS[event['region']] if event['region'] >= 0 else None
+        attributions.append((int(event['frame']), region, shot_frame))
+    return attributions
+
+
+def bounce_speed(box, velocity, frame_time, homography):
+    """
+    落点时的球速 (km/h)。
+
+    落点在台面上，用球台标定的单应矩阵把球框中心和一帧前的位置 (中心 - 跟踪速度) 映射到台面坐标 (厘米)。
+    没有标定时返回 NaN。
+    """
+    if homography is None or not frame_time > 0:
+        return np.nan
+    center = (np.asarray(box[:2], dtype=np.float64) + np.asarray(box[2:4], dtype=np.float64)) / 2
+    points = np.array([[center - velocity, center]], dtype=np.float64)
+    table_points = cv2.perspectiveTransform(points, np.linalg.inv(homography))[0]
+    distance_cm = np.linalg.norm(table_points[1] - table_points[0])
+    return float(distance_cm / frame_time * 0.036)
+
+
+def join_results(timestamps, outputs, homography=None):
+    """
+    各阶段的逐帧结果合并为按帧对齐的数组，并计算击球和落点的对应关系。
+
+    homography: 球台标定的单应矩阵 (台面厘米 -> 像素)，用于计算落点球速；为 None 时球速记为 NaN
+
+    返回 dict:
+    - timestamps: (T,)；landmarks: (T, 33, 4)；ball_boxes: (T, 6)，没有结果的帧为 NaN
+    - bounces: BounceLog；shots: detect_shots() 的结果；attributions: attribute_bounces() 的结果
+    """
+    add_ball_path()
+    from bounce_log import BounceLog
+
+    frame_count = len(timestamps)
+    landmarks = np.full((frame_count, NUM_LANDMARKS, 4), np.nan, dtype=np.float32)
+    ball_boxes = np.full((frame_count, 6), np.nan, dtype=np.float32)
+    bounces = BounceLog()
+    frame_time = float(np.median(np.diff(timestamps))) if frame_count > 1 else 0.0
+
+    for frame_index, result in enumerate(outputs.get('pose', [])):
+        if result is not None:
+            landmarks[frame_index] = result
+    for frame_index, result in enumerate(outputs.get('ball', [])):
+        if result is None:
+            continue
+        ball_box, bounce = result
+        if ball_box is not None:
+            ball_boxes[frame_index] = ball_box
+        if bounce is not None:
+            bounce_frame, box, region, velocity = bounce
+            speed = bounce_speed(box, velocity, frame_time, homography)
+            bounces.append(bounce_frame, timestamps[bounce_frame], region, speed)
+
+    shots = detect_shots(timestamps, landmarks)
+    return {
+        'timestamps': timestamps,
+        'landmarks': landmarks,
+        'ball_boxes': ball_boxes,
+        'bounces': bounces,
+        'shots': shots,
+        'attributions': attribute_bounces(bounces.events, shots, timestamps),
+    }
+
+
+def analyze_match(video_path, stages=STAGES, stage_kwargs=None, max_frames=None, calibration=None):
+    """
+    解码一次视频，返回 (join_results() 的结果, 处理耗时 (秒，不含阶段进程启动))
+
+    calibration: 球台标定 (calibrate_from_table 的结果)；为 None 时读取 pose_estimation 按分辨率缓存的标定
+    """
+    reader = PrefetchReader(video_path, buffer_size=FRAME_SLOTS, color='rgb')
+    if calibration is None:
+        height, width = reader.buffers.shape[1:3]
+        calibration = load_table_calibration(f"{width}x{height}")
+        if calibration is None:
+            print("No table calibration for this resolution, bounce speeds are not computed")
+    homography = calibration.get('homography') if calibration else None
+    pipeline = MatchPipeline(reader.buffers.shape[1:], stages, stage_kwargs=stage_kwargs)
+    try:
+        start = time.time()
+        results = pipeline.run(reader, max_frames, homography)
+        return results, time.time() - start
+    finally:
+        pipeline.close()
+        reader.release()
+
+
+if __name__ == "__main__":
+    # 联合流水线 vs 分别运行: python match_pipeline.py ../mp4/01.mov
+    # 没有模型时用 --infer-ms 40 15 模拟两个阶段的推理耗时
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Ball and player analysis with a single decode pass")
+    parser.add_argument('video')
+    parser.add_argument('--max-frames', type=int, default=300)
+    parser.add_argument('--infer-ms', nargs=2, type=float, metavar=('POSE', 'BALL'))
+    args = parser.parse_args()
+
+    if args.infer_ms:
+        stage_kwargs = {'pose': {'infer_ms': args.infer_ms[0]}, 'ball': {'infer_ms': args.infer_ms[1]}}
+    else:
+        stage_kwargs = {'pose': {'model_complexity': 0}, 'ball': {}}
+
+    separate = 0.0
+    for stage in STAGES:
+        _, elapsed = analyze_match(args.video, (stage,), stage_kwargs, args.max_frames)
+        print(f"{stage} only: {elapsed:.2f} s")
+        separate += elapsed
+
+    results, combined = analyze_match(args.video, STAGES, stage_kwargs, args.max_frames)
+    frame_count = len(results['timestamps'])
+    print(f"separate runs: {separate:.2f} s, combined: {combined:.2f} s "
+          f"({combined / separate * 100:.0f}% of separate, {frame_count / combined:.1f} FPS)")
+    attributed = sum(shot_frame is not None for _, _, shot_frame in results['attributions'])
+    print(f"{len(results['bounces'])} bounces, {len(results['shots'])} shots, {attributed} bounces attributed to a shot")
+    for bounce_frame, region, shot_frame in results['attributions']:
+        print(f"  bounce at frame {bounce_frame} in {region}: shot at frame {shot_frame}")
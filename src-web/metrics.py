@@ -0,0 +1,110 @@
+import threading
+
+# 导出到 Prometheus 的直方图桶 (秒)，由 StageHistogram 的细桶累加得到
+EXPORT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+cache_stats = {}  # 缓存名 -> [命中, 未命中]
+cache_lock = threading.Lock()
+
+
+def record_cache(name, hit):
+    with cache_lock:
+        stats = cache_stats.setdefault(name, [0, 0])
+        stats[0 if hit else 1] += 1
+
+
+def take_cache_stats():
+    """取出并清零本进程的缓存计数，worker 进程用它向 app.py 汇报增量"""
+    with cache_lock:
+        deltas = {name: tuple(stats) for name, stats in cache_stats.items()}
+        cache_stats.clear()
+    return deltas
+
+
+def merge_cache_stats(deltas):
+    """合并 worker 进程汇报的缓存计数增量"""
+    with cache_lock:
+        for name, (hits, misses) in deltas.items():
+            stats = cache_stats.setdefault(name, [0, 0])
+            stats[0] += hits
+            stats[1] += misses
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels.items()) + '}'
+
+
+def metric_header(lines, name, metric_type, help_text):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {metric_type}")
+
+
+def render_metrics(profiler, jobs, queue_depth, frames_total, worker_memory=None):
+    """
+    生成 Prometheus 文本格式 (0.0.4)。
+
+    参数:
+    - profiler: 各任务共用的 StageProfiler
+    - jobs: {job_id: {'state', 'processed_frames', 'start_time', 'now'}} 正在运行的任务快照
+    - queue_depth: 等待处理的任务数
+    - frames_total: 已处理的总帧数 (包括已完成的任务)
+    - worker_memory: {worker_id: 常驻内存字节数} 各 worker 进程最近一次汇报的内存
+    """
+    lines = []
+
+    metric_header(lines, 'pose_job_queue_depth', 'gauge', 'Uploaded videos waiting for a worker.')
+    lines.append(f"pose_job_queue_depth {queue_depth}")
+
+    active = [job for job in jobs.values() if job['state'] == 'running']
+    metric_header(lines, 'pose_jobs_active', 'gauge', 'Videos currently being analysed.')
+    lines.append(f"pose_jobs_active {len(active)}")
+
+    metric_header(lines, 'pose_job_frames_per_second', 'gauge', 'Processing throughput of each running job.')
+    for job_id, job in jobs.items():
+        if job['state'] != 'running':
+            continue
+        elapsed = job['now'] - job['start_time']
+        fps = job['processed_frames'] / elapsed if elapsed > 0 else 0.0
+        lines.append(f"pose_job_frames_per_second{format_labels({'job': job_id})} {fps:.3f}")
+
+    metric_header(lines, 'pose_frames_processed_total', 'counter', 'Frames processed by all jobs.')
+    lines.append(f"pose_frames_processed_total {frames_total}")
+
+    metric_header(lines, 'pose_stage_duration_seconds', 'histogram', 'Per-frame duration of each pipeline stage.')
+    for stage, histogram in profiler.histogram_items():
+        for upper_bound in EXPORT_BUCKETS:
+            labels = format_labels({'stage': stage, 'le': upper_bound})
+            lines.append(f"pose_stage_duration_seconds_bucket{labels} {histogram.cumulative_count(upper_bound)}")
+        lines.append(f"pose_stage_duration_seconds_bucket{format_labels({'stage': stage, 'le': '+Inf'})} "
+                     f"{histogram.count}")
+        lines.append(f"pose_stage_duration_seconds_sum{format_labels({'stage': stage})} {histogram.total:.6f}")
+        lines.append(f"pose_stage_duration_seconds_count{format_labels({'stage': stage})} {histogram.count}")
+
+    with cache_lock:
+        caches = {name: list(stats) for name, stats in cache_stats.items()}
+    metric_header(lines, 'pose_cache_hits_total', 'counter', 'Cache hits by cache.')
+    for name, (hits, _) in caches.items():
+        lines.append(f"pose_cache_hits_total{format_labels({'cache': name})} {hits}")
+    metric_header(lines, 'pose_cache_misses_total', 'counter', 'Cache misses by cache.')
+    for name, (_, misses) in caches.items():
+        lines.append(f"pose_cache_misses_total{format_labels({'cache': name})} {misses}")
+    metric_header(lines, 'pose_cache_hit_ratio', 'gauge', 'Cache hit ratio by cache.')
+    for name, (hits, misses) in caches.items():
+        ratio = hits / (hits + misses) if hits + misses else 0.0
+        lines.append(f"pose_cache_hit_ratio{format_labels({'cache': name})} {ratio:.4f}")
+
+    import psutil  # 只有导出时才需要，VideoSource 等组件导入本模块时不依赖 psutil
+    memory = psutil.Process().memory_info()
+    metric_header(lines, 'process_resident_memory_bytes', 'gauge', 'Resident memory of the web process.')
+    lines.append(f"process_resident_memory_bytes {memory.rss}")
+    metric_header(lines, 'process_virtual_memory_bytes', 'gauge', 'Virtual memory of the web process.')
+    lines.append(f"process_virtual_memory_bytes {memory.vms}")
+
+    # 视频在 worker 进程中处理，模型和帧缓冲区的内存在 worker 中
+    metric_header(lines, 'pose_worker_resident_memory_bytes', 'gauge', 'Resident memory of each job worker process.')
+    for worker_id, rss in sorted((worker_memory or {}).items()):
+        lines.append(f"pose_worker_resident_memory_bytes{format_labels({'worker': worker_id})} {rss}")
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,108 @@
+import os
+import sys
+import threading
+import time
+
+# 球台检测模型 (YOLOv10)
+TABLE_MODEL_PATH = os.path.join('..', 'model', 'pp_table_net.pt')
+YOLOV10_PATH = os.path.join('..', 'yolov10')
+
+# 导入 pose_estimation 的时间上限 (秒)，超出说明又有重量级依赖在导入时加载
+IMPORT_TIME_BUDGET = 1.5
+# 导入 pose_estimation 后不应出现在 sys.modules 中的模块
+HEAVY_MODULES = ('mediapipe', 'ultralytics', 'torch', 'matplotlib', 'certifi')
+
+DEBUG = True
+
+model_loaders = {}  # 模型名 -> 无参数的加载函数
+loaded_models = {}  # 模型名 -> 已加载的模型
+registry_lock = threading.Lock()
+
+
+def register_model(name, loader):
+    model_loaders[name] = loader
+
+
+def get_model(name):
+    """
+    返回已加载的模型，第一次调用时才加载 (线程安全，同一进程内只加载一次)。
+    """
+    model = loaded_models.get(name)
+    if model is not None:
+        return model
+
+    with registry_lock:
+        model = loaded_models.get(name)
+        if model is None:
+            if name not in model_loaders:
+                raise ValueError(f"Unknown model '{name}', available: {', '.join(model_loaders)}")
+            start = time.perf_counter()
+            model = model_loaders[name]()
+            loaded_models[name] = model
+            if DEBUG:
+                print(f"Loaded model '{name}' in {time.perf_counter() - start:.2f} s")
+    return model
+
+
+def is_loaded(name):
+    return name in loaded_models
+
+
+def release_model(name):
+    with registry_lock:
+        loaded_models.pop(name, None)
+
+
+def load_table_detector():
+    # ultralytics 首次运行会下载字体等文件，需要 certifi 的证书
+    import certifi
+    os.environ['SSL_CERT_FILE'] = certifi.where()
+
+    try:
+        from ultralytics import YOLOv10 as YOLO
+    except ImportError:
+        # 使用仓库内的 yolov10 源码；不再在导入时自动 pip install
+        if not os.path.isdir(YOLOV10_PATH):
+            raise ImportError(f"YOLOv10 not found, install it with: pip install -e {YOLOV10_PATH}")
+        if YOLOV10_PATH not in sys.path:
+            sys.path.append(YOLOV10_PATH)
+        from ultralytics import YOLOv10 as YOLO
+    return YOLO(TABLE_MODEL_PATH)
+
+
+def load_mediapipe_pose():
+    import mediapipe as mp
+    return mp.solutions.pose
+
+
+register_model('table_detector', load_table_detector)
+register_model('mediapipe_pose', load_mediapipe_pose)
+
+
+def check_import_time(module_name='pose_estimation', budget=IMPORT_TIME_BUDGET):
+    """
+    在新的解释器中导入模块，返回 (耗时, 已被导入的重量级模块)。
+    """
+    import subprocess
+
+    code = (f"import sys, time\n"
+            f"start = time.perf_counter()\n"
+            f"import {module_name}\n"
+            f"print(time.perf_counter() - start)\n"
+            f"print(','.join(name for name in {HEAVY_MODULES!r} if name in sys.modules))\n")
+    output = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True, check=True).stdout.split('\n')
+    elapsed = float(output[0])
+    heavy = [name for name in output[1].split(',') if name]
+    return elapsed, heavy
+
+
+if __name__ == "__main__":
+    # 导入耗时检查: python model_registry.py [模块名]，超出预算或导入了重量级模块时返回非零
+    module_name = sys.argv[1] if len(sys.argv) > 1 else 'pose_estimation'
+    elapsed, heavy = check_import_time(module_name)
+    print(f"import {module_name}: {elapsed:.3f} s (budget {IMPORT_TIME_BUDGET:.1f} s)")
+    if heavy:
+        print(f"heavy modules imported: {', '.join(heavy)}")
+    if elapsed > IMPORT_TIME_BUDGET or heavy:
+        sys.exit(1)
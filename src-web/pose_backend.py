@@ -0,0 +1,307 @@
+import inspect
+import os
+import time
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+
+NUM_LANDMARKS = 33
+# 部署使用的姿态后端 (solutions / tasks / onnx)，各入口都按它创建，可用环境变量 POSE_BACKEND 覆盖
+POSE_BACKEND = os.environ.get('POSE_BACKEND', 'solutions')
+
+
+class PoseBackend:
+    """
+    姿态估计后端的统一接口。
+
+    process() 输入 RGB 图像，输出 (33, 4) 的 float32 数组 (x, y, z, visibility，
+    x/y 为归一化图像坐标)，未检测到人体时返回 None。每次调用的耗时记录在 latencies 中 (秒)。
+    """
+
+    name = 'base'
+
+    def __init__(self):
+        self.latencies = []
+
+    def infer(self, image, timestamp_ms):
+        raise NotImplementedError
+
+    def process(self, image, timestamp_ms=None):
+        start = time.perf_counter()
+        landmarks = self.infer(image, timestamp_ms)
+        self.latencies.append(time.perf_counter() - start)
+        return landmarks
+
+    def run(self, frames, fps=30.0):
+        """
+        按顺序处理一组 RGB 帧。
+
+        返回:
+        - landmarks: (T, 33, 4) 数组，未检测到人体的帧为 NaN
+        - latencies: (T,) 每帧耗时 (秒)
+        """
+        landmarks = np.full((len(frames), NUM_LANDMARKS, 4), np.nan, dtype=np.float32)
+        start = len(self.latencies)
+        for index, frame in enumerate(frames):
+            result = self.process(frame, int(index * 1000 / fps))
+            if result is not None:
+                landmarks[index] = result
+        return landmarks, np.array(self.latencies[start:])
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class SolutionsPoseBackend(PoseBackend):
+    """旧版 mp.solutions.pose 接口 (目前各模块直接使用的方式)"""
+
+    name = 'solutions'
+
+    def __init__(self, model_complexity=1, min_detection_confidence=0.5, min_tracking_confidence=0.5,
+                 static_image_mode=False):
+        super().__init__()
+        import mediapipe as mp
+        self.pose = mp.solutions.pose.Pose(static_image_mode=static_image_mode, model_complexity=model_complexity,
+                                           min_detection_confidence=min_detection_confidence,
+                                           min_tracking_confidence=min_tracking_confidence)
+
+    def infer(self, image, timestamp_ms):
+        image.flags.writeable = False
+        results = self.pose.process(image)
+        image.flags.writeable = True
+        return results_to_array(results)
+
+    def close(self):
+        self.pose.close()
+
+
+class TasksPoseBackend(PoseBackend):
+    """MediaPipe Tasks PoseLandmarker，VIDEO 运行模式 (帧间跟踪，需要单调递增的时间戳)"""
+
+    name = 'tasks'
+
+    def __init__(self, model_path=os.path.join('..', 'model', 'pose_landmarker_lite.task'),
+                 min_detection_confidence=0.5, min_tracking_confidence=0.5):
+        super().__init__()
+        import mediapipe as mp
+        from mediapipe.tasks import python as mp_tasks
+        from mediapipe.tasks.python import vision
+
+        self.mp = mp
+        options = vision.PoseLandmarkerOptions(
+            base_options=mp_tasks.BaseOptions(model_asset_path=model_path),
+            running_mode=vision.RunningMode.VIDEO,
+            num_poses=1,
+            min_pose_detection_confidence=min_detection_confidence,
+            min_tracking_confidence=min_tracking_confidence)
+        self.landmarker = vision.PoseLandmarker.create_from_options(options)
+        self.last_timestamp_ms = -1
+
+    def infer(self, image, timestamp_ms):
+        if timestamp_ms is None:
+            timestamp_ms = self.last_timestamp_ms + 33
+        timestamp_ms = max(int(timestamp_ms), self.last_timestamp_ms + 1)  # VIDEO 模式要求时间戳严格递增
+        self.last_timestamp_ms = timestamp_ms
+
+        mp_image = self.mp.Image(image_format=self.mp.ImageFormat.SRGB, data=np.ascontiguousarray(image))
+        result = self.landmarker.detect_for_video(mp_image, timestamp_ms)
+        if not result.pose_landmarks:
+            return None
+        return np.array([(lm.x, lm.y, lm.z, lm.visibility) for lm in result.pose_landmarks[0]], dtype=np.float32)
+
+    def close(self):
+        self.landmarker.close()
+
+
+class OnnxPoseBackend(PoseBackend):
+    """
+    ONNX Runtime CPU 推理，模型为导出的 BlazePose GHUM 关键点模型
+    (输入 1×256×256×3 RGB [0, 1]，第一个输出为 195 = 39×5: x, y, z, visibility, presence，像素坐标)。
+
+    没有单独的人体检测/ROI 跟踪，整帧按比例缩放并补边后送入模型，适合单人、人体占画面较大的机位。
+    """
+
+    name = 'onnx'
+
+    def __init__(self, model_path=os.path.join('..', 'model', 'pose_landmark_full.onnx'), num_threads=None):
+        super().__init__()
+        import onnxruntime as ort
+
+        session_options = ort.SessionOptions()
+        if num_threads:
+            session_options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(model_path, sess_options=session_options,
+                                            providers=['CPUExecutionProvider'])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        shape = model_input.shape
+        self.channels_first = shape[1] == 3
+        self.input_size = int(shape[2] if not self.channels_first else shape[3])
+        self.input_buffer = np.zeros((self.input_size, self.input_size, 3), dtype=np.float32)
+
+    def infer(self, image, timestamp_ms):
+        height, width = image.shape[:2]
+        scale = self.input_size / max(height, width)
+        new_width, new_height = int(width * scale), int(height * scale)
+        pad_x = (self.input_size - new_width) // 2
+        pad_y = (self.input_size - new_height) // 2
+
+        resized = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+        self.input_buffer[:] = 0
+        self.input_buffer[pad_y:pad_y + new_height, pad_x:pad_x + new_width] = resized / 255.0
+
+        model_input = self.input_buffer.transpose(2, 0, 1) if self.channels_first else self.input_buffer
+        outputs = self.session.run(None, {self.input_name: model_input[np.newaxis]})
+
+        raw = outputs[0].reshape(-1, 5)[:NUM_LANDMARKS]
+        # 第二个输出为人体存在分数 (logit)
+        if len(outputs) > 1 and 1 / (1 + np.exp(-float(np.ravel(outputs[1])[0]))) < 0.5:
+            return None
+
+        landmarks = np.empty((NUM_LANDMARKS, 4), dtype=np.float32)
+        landmarks[:, 0] = (raw[:, 0] - pad_x) / new_width
+        landmarks[:, 1] = (raw[:, 1] - pad_y) / new_height
+        landmarks[:, 2] = raw[:, 2] / new_width
+        landmarks[:, 3] = 1 / (1 + np.exp(-raw[:, 3]))
+        return landmarks
+
+
+BACKENDS = {
+    SolutionsPoseBackend.name: SolutionsPoseBackend,
+    TasksPoseBackend.name: TasksPoseBackend,
+    OnnxPoseBackend.name: OnnxPoseBackend,
+}
+
+
+def create_pose_backend(name=POSE_BACKEND, **kwargs):
+    """
+    kwargs 中该后端不支持的参数被忽略: 调用方按 MediaPipe 的习惯传 model_complexity、置信度等，
+    不需要关心部署时配置的是哪个后端。
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown pose backend '{name}', available: {', '.join(BACKENDS)}")
+    backend_class = BACKENDS[name]
+    accepted = inspect.signature(backend_class.__init__).parameters
+    return backend_class(**{key: value for key, value in kwargs.items() if key in accepted})
+
+
+class LocalPose:
+    """
+    与 mp.solutions.pose.Pose 用法相同的包装 (process() 返回带 pose_landmarks.landmark 的结果)，
+    可以直接替换 `with mp_pose.Pose(...) as pose:`，实际推理由 create_pose_backend 创建的后端完成。
+    """
+
+    def __init__(self, backend=POSE_BACKEND, **backend_kwargs):
+        self.backend = create_pose_backend(backend, **backend_kwargs)
+
+    def process(self, image, timestamp_ms=None):
+        return as_pose_results(self.backend.process(image, timestamp_ms))
+
+    def close(self):
+        self.backend.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def as_pose_results(landmarks):
+    """(33, 4) 数组 -> 与 mp.solutions.pose 相同结构的结果 (results.pose_landmarks.landmark)"""
+    if landmarks is None:
+        return SimpleNamespace(pose_landmarks=None)
+    return SimpleNamespace(pose_landmarks=SimpleNamespace(
+        landmark=[SimpleNamespace(x=float(x), y=float(y), z=float(z), visibility=float(v))
+                  for x, y, z, v in landmarks]))
+
+
+def results_to_array(results):
+    """mp.solutions.pose 的结果 -> (33, 4) 数组，未检测到人体时返回 None"""
+    if not results.pose_landmarks:
+        return None
+    return np.array([(lm.x, lm.y, lm.z, lm.visibility) for lm in results.pose_landmarks.landmark],
+                    dtype=np.float32)
+
+
+def landmark_agreement(reference, landmarks, threshold=0.02):
+    """
+    两个后端输出的一致性。
+
+    返回:
+    - detection: 两者检测结果 (有/无人体) 一致的帧比例
+    - mean_error: 双方都检测到时，x/y 的平均欧氏距离 (归一化坐标)
+    - pck: 误差小于 threshold 的关键点比例
+    """
+    ref_detected = ~np.isnan(reference[:, 0, 0])
+    detected = ~np.isnan(landmarks[:, 0, 0])
+    both = ref_detected & detected
+
+    agreement = {'detection': float(np.mean(ref_detected == detected)) if len(reference) else 0.0,
+                 'mean_error': float('nan'), 'pck': float('nan')}
+    if np.any(both):
+        errors = np.linalg.norm(reference[both, :, :2] - landmarks[both, :, :2], axis=-1)
+        agreement['mean_error'] = float(np.mean(errors))
+        agreement['pck'] = float(np.mean(errors < threshold))
+    return agreement
+
+
+def load_frames(video_path, max_frames=300):
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    cap.release()
+    return frames, fps
+
+
+if __name__ == "__main__":
+    # 后端对比: python pose_backend.py ../mp4/01.mov --backends solutions tasks onnx
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark pose backends on local clips")
+    parser.add_argument('videos', nargs='+')
+    parser.add_argument('--backends', nargs='+', default=list(BACKENDS))
+    parser.add_argument('--max-frames', type=int, default=300)
+    args = parser.parse_args()
+
+    for video_path in args.videos:
+        frames, fps = load_frames(video_path, args.max_frames)
+        print(f"\n{video_path}: {len(frames)} frames")
+
+        reference = None
+        for name in args.backends:
+            try:
+                backend = create_pose_backend(name)
+            except (ImportError, RuntimeError, ValueError) as e:
+                print(f"  {name:<10} unavailable: {e}")
+                continue
+
+            with backend:
+                backend.process(frames[0])  # 预热，不计入统计
+                backend.latencies = []
+                landmarks, latencies = backend.run(frames, fps)
+
+            line = (f"  {name:<10} FPS {len(latencies) / latencies.sum():6.1f}  "
+                    f"p50 {np.percentile(latencies, 50) * 1000:6.1f} ms  "
+                    f"p95 {np.percentile(latencies, 95) * 1000:6.1f} ms  "
+                    f"detected {np.mean(~np.isnan(landmarks[:, 0, 0])) * 100:5.1f}%")
+            if reference is None:
+                reference = landmarks
+                line += "  (reference)"
+            else:
+                agreement = landmark_agreement(reference, landmarks)
+                line += (f"  agreement: detection {agreement['detection'] * 100:5.1f}%, "
+                         f"mean error {agreement['mean_error']:.4f}, PCK@0.02 {agreement['pck'] * 100:5.1f}%")
+            print(line)
@@ -1,19 +1,19 @@
 import os
-import sys
 import threading
-import logging
 import cv2
-import mediapipe as mp
 import numpy as np
 import csv
 import time
 import json
-import matplotlib.colors as mcolors
 
-import certifi
-os.environ['SSL_CERT_FILE'] = certifi.where()
-
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+from stage_profiler import StageProfiler
+from metrics import record_cache
+from model_registry import get_model
+from landmark_buffer import LandmarkRingBuffer, FOOT_SLICE, HAND_SLICE, HIP_SLICE
+from pose_backend import POSE_BACKEND, LocalPose
+from scene_change import SceneChangeDetector
+from table_calibration import (calibrate_from_table, calibration_drift, load_table_calibration,
+                               save_table_calibration, MAX_CALIBRATION_DRIFT)
 
 
 import warnings
@@ -21,24 +21,7 @@ import warnings
 warnings.filterwarnings("ignore", category=UserWarning, module='google.protobuf.symbol_database')
 warnings.filterwarnings("ignore", category=UserWarning, module='inference_feedback_manager')
 
-SETUP_YOLOV10 = False
-try:
-    from ultralytics import YOLOv10 as YOLO
-except ImportError:
-    print("YOLOv10 not found, setting up YOLOv10...")
-    SETUP_YOLOV10 = True
-
-if SETUP_YOLOV10:
-    yolov10_path = os.path.join('..', 'yolov10')
-    sys.path.append(yolov10_path)
-    os.system('pip install huggingface_hub -i https://mirrors.cloud.tencent.com/pypi/simple')
-    os.system(
-        f'pip install -r {os.path.join(yolov10_path, "requirements.txt")} -i https://mirrors.cloud.tencent.com/pypi/simple')
-    os.system(f'pip install -e {yolov10_path} -i https://mirrors.cloud.tencent.com/pypi/simple')
-    from ultralytics import YOLOv10 as YOLO
-
-model_file_path = os.path.join('..', 'model', 'pp_table_net.pt')
-model = YOLO(model_file_path)
+# mediapipe / YOLOv10 在第一次使用时由 model_registry 加载，导入本模块不再加载模型
 
 csv.field_size_limit(2147483647)
 
@@ -48,11 +31,53 @@ REAL_TABLE_HEIGHT_M = 0.76 + 0.1525
 REAL_TABLE_DIAGONAL_M = (REAL_TABLE_WIDTH_M ** 2 + REAL_TABLE_LENGTH_M ** 2) ** 0.5
 NOISE_THRESHOLD = 0.0006
 yolo_work = False
+CALIBRATION_MODE = 'chessboard'  # 'table': 由检测到的桌角和网柱标定相机，不需要棋盘格 (结果按相机缓存)
+TABLE_CALIBRATION_RETRY_FRAMES = 30  # 球台标定失败后间隔 N 帧再检测，不在每帧都运行 YOLO
+TABLE_REDETECT_FRAMES = 1800  # 镜头没有移动时也每 N 帧重新检测一次球台 (兜底)，0 表示只在镜头移动时检测
 DEBUG = True
+PROFILE_STAGES = True  # 阶段耗时统计，关闭后每帧只剩一次判断
+PROFILE_SAMPLE_EVERY = 1  # 每 N 帧采样一次
+PROFILE_REPORT_INTERVAL = 60.0  # 定时输出 p50/p95/p99 的间隔，单位：秒
+LANDMARK_HISTORY = 1800  # 关键点环形缓冲区的帧数 (录制模板时最多保留的帧数)
 
 
 PROGRESS_FILE = 'progress.json'
 
+# 每帧处理阶段: 名称 -> (产出, 依赖的产出)
+# 只运行被请求的产出及其依赖所需的阶段，无界面任务不再绘制画布/叠加层或计算身高
+PIPELINE_STAGES = {
+    'pose': (('landmarks',), ()),
+    'chessboard': (('chessboard_data',), ()),
+    'keypoints': (('keypoints', 'speeds', 'match_results'), ('landmarks', 'chessboard_data')),
+    'footwork': (('highlight_counts',), ('keypoints', 'match_results', 'chessboard_data')),
+    'height': (('height',), ('keypoints', 'chessboard_data')),
+    'yolo': (('table_objects',), ()),
+    'skeleton_canvas': (('skeleton_canvas',), ('keypoints', 'match_results', 'chessboard_data')),
+    'overlay': (('output_image',), ('table_objects',)),
+}
+
+# app.py 的后台任务只用到速度、模板匹配计数和脚步覆盖统计
+HEADLESS_OUTPUTS = ('speeds', 'match_results', 'highlight_counts')
+
+
+def resolve_pipeline_stages(outputs=None):
+    """根据需要的产出，返回需要运行的阶段集合；outputs 为 None 时运行全部阶段"""
+    if outputs is None:
+        return set(PIPELINE_STAGES)
+
+    producers = {output: name for name, (produced, _) in PIPELINE_STAGES.items() for output in produced}
+    enabled = set()
+    pending = list(outputs)
+    while pending:
+        output = pending.pop()
+        if output not in producers:
+            raise ValueError(f"Unknown pipeline output '{output}'")
+        name = producers[output]
+        if name not in enabled:
+            enabled.add(name)
+            pending.extend(PIPELINE_STAGES[name][1])
+    return enabled
+
 
 
 def save_progress(progress_data):
@@ -216,11 +241,20 @@ def calculate_chessboard_data(frame,
 
 
 class PoseEstimation:
-    def __init__(self):
-        self.mp_pose = mp.solutions.pose
+    def __init__(self, outputs=None, profiler=None):
+        self.enabled_stages = resolve_pipeline_stages(outputs)
+        # 传入 profiler 时多个任务共用同一组直方图 (app.py 的 /metrics)
+        self.profiler = profiler or StageProfiler(enabled=PROFILE_STAGES, sample_every=PROFILE_SAMPLE_EVERY,
+                                                  report_interval=PROFILE_REPORT_INTERVAL)
+        self.profiling_frame = False
+        self.height_m = 0
+        self.skeleton_canvas = None
         self.templates = {"Arm": [], "Footwork": []}
         self.recording = False
-        self.keypoints_data = []
+        self.landmark_buffer = LandmarkRingBuffer(LANDMARK_HISTORY)
+        self.recording_range = None  # 最近一次录制在 landmark_buffer 中的累计帧号 [开始, 结束)
+        self.recording_active = False
+        self.previous_hand_buffer = np.zeros((HAND_SLICE.stop - HAND_SLICE.start, 2), dtype=np.float32)
         self.video_playing = False
         self.video_length = 0
         self.current_frame = 0
@@ -246,10 +280,9 @@ class PoseEstimation:
         self.delay = 0
         self.CV_CUDA_ENABLED = cv2.cuda.getCudaEnabledDeviceCount() > 0
         self.calculate_chessboard = None
-        self.camera_params = self.load_camera_params()
-        self.total_speeds = {'forward': 0, 'sideways': 0, 'depth': 0, 'overall': 0}
-        self.count_speeds = {'forward': 0, 'sideways': 0, 'depth': 0, 'overall': 0}
-        self.max_speeds = {'forward': 0, 'sideways': 0, 'depth': 0, 'overall': 0}
+        # 球台标定模式下不使用棋盘格的相机参数 (世界坐标系不同)，标定成功前为 None
+        self.camera_params = self.load_camera_params() if CALIBRATION_MODE != 'table' else None
+        self.camera_id = None  # 球台标定缓存的相机标识，None 时按分辨率区分 (使用前都会与当前桌角核对)
 
 
 
@@ -258,11 +291,31 @@ class PoseEstimation:
         self.previous_foot_points = None
         self.previous_hand_points = None
         self.previous_time = None
+        self.frame_timestamp = None
         self.start_time = time.time()
         self.covered_area = set()
         self.highlight_counts = {}
         self.template_match_counts = {"Arm": {}, "Footwork": {}}
         self.last_matched_templates = {"Arm": set(), "Footwork": set()}
+        # 速度统计和逐帧数据也按任务重置，常驻 worker 复用同一个实例处理多个视频
+        self.total_speeds = {'forward': 0, 'sideways': 0, 'depth': 0, 'overall': 0}
+        self.count_speeds = {'forward': 0, 'sideways': 0, 'depth': 0, 'overall': 0}
+        self.max_speeds = {'forward': 0, 'sideways': 0, 'depth': 0, 'overall': 0}
+        self.landmark_buffer.clear()
+        self.recording_range = None
+        self.recording_active = False
+        self.height_m = 0
+        # 球台检测结果按任务缓存，只在第一帧、镜头移动或定期兜底时重新运行 YOLO
+        self.table_objects = None
+        self.frames_since_table_detection = 0
+        self.scene_change = SceneChangeDetector()
+        self.table_calibration = None
+        self.table_calibration_retry = 0
+        self.cached_table_calibration = None  # table_calibration.json 中该相机的条目 ({} 表示没有)
+        self.calibration_scene_change = SceneChangeDetector()
+        if CALIBRATION_MODE == 'table':
+            # 上一个任务的相机参数不适用于新视频，标定成功前不计算速度和身高
+            self.camera_params = None
 
     def load_camera_params(self):
         try:
@@ -407,8 +460,44 @@ class PoseEstimation:
             real_coords.append((X, Y, Z))
         return real_coords
 
-    def process_video(self, frame, pose):
-        start_time = time.time()
+    @property
+    def keypoints_data(self):
+        """录制期间每帧的关键点 (N, 33, 3)"""
+        if self.recording_range is None:
+            return np.empty((0, self.landmark_buffer.data.shape[1], 3), dtype=np.float32)
+        return self.landmark_buffer.since(*self.recording_range)[:, :, :3]
+
+    @property
+    def mp_pose(self):
+        # 第一次访问时才导入 mediapipe
+        return get_model('mediapipe_pose')
+
+    def stage_enabled(self, name):
+        return name in self.enabled_stages
+
+    def run_stage(self, name, func, *args):
+        if not self.profiling_frame:
+            return func(*args)
+        stage_start = time.perf_counter()
+        result = func(*args)
+        self.profiler.record(name, time.perf_counter() - stage_start)
+        return result
+
+    def report_stages(self):
+        print("Pipeline stages: " + ", ".join(
+            f"{name} {'on' if self.stage_enabled(name) else 'off'}" for name in PIPELINE_STAGES))
+        print(self.profiler.report())
+
+    def process_video(self, frame, pose, timestamp=None, results=None):
+        """
+        处理一帧。
+
+        - timestamp: 帧的媒体时间戳 (秒)，提供时速度按真实时间间隔计算，否则按 1 / fps
+        - results: 已有的姿态结果 (抽帧模式下插值得到)，提供时跳过 pose 阶段
+        """
+        self.profiling_frame = self.profiler.begin_frame()
+        self.frame_timestamp = timestamp
+        start_time = time.perf_counter() if self.profiling_frame else 0
 
         if self.fps == 0:  # Check if fps is not set and set it if necessary
             self.fps = 30  # Default value or calculate based on video properties
@@ -417,32 +506,20 @@ class PoseEstimation:
         if self.CV_CUDA_ENABLED:
             cv2.cuda.setDevice(1)
         if self.CV_CUDA_ENABLED:
-            gpu_frame_start = time.time()
-            gpu_frame = cv2.cuda_GpuMat()
-            gpu_frame.upload(frame)
-            image = gpu_frame.download()
-            gpu_frame_end = time.time()
-            logging.info(f'GPU Frame Processing Time: {gpu_frame_end - gpu_frame_start:.4f} seconds')
+            image = self.run_stage('gpu_upload', self.upload_frame_to_gpu, frame)
         else:
             image = frame
 
-        pose_start = time.time()
-        image.flags.writeable = False
-        results = pose.process(image)
-        image.flags.writeable = True
-        pose_end = time.time()
-        logging.info(f'Pose Processing Time: {pose_end - pose_start:.4f} seconds')
+        if results is None:
+            results = self.run_stage('pose', self.detect_pose, image, pose)
 
-        chessboard_start = time.time()
         if self.image_width is None or self.image_height is None:
             self.image_width = image.shape[1]
             self.image_height = image.shape[0]
 
-        chessboard_data, output_image = self.process_chessboard(frame)
-        chessboard_end = time.time()
-        logging.info(f'Chessboard Processing Time: {chessboard_end - chessboard_start:.4f} seconds')
+        calibrate = self.process_table_calibration if CALIBRATION_MODE == 'table' else self.process_chessboard
+        chessboard_data, output_image = self.run_stage('chessboard', calibrate, frame)
 
-        keypoints_start = time.time()
         keypoints = []
         foot_points = []
         hand_points = []
@@ -455,13 +532,20 @@ class PoseEstimation:
 
         match_results = {"Arm": {}, "Footwork": {}}  # 初始化 match_results
 
-        if results.pose_landmarks:
-            keypoints, foot_points, hand_points, current_speed = self.process_keypoints_and_speed(
-                results.pose_landmarks.landmark)
-            match_results = self.match_all_templates(keypoints, foot_points, hand_points)
+        # 录制状态每帧更新 (包括没有检测到人体的帧)，停止后再开始是新的一段录制
+        if self.recording and not self.recording_active:
+            self.recording_range = [self.landmark_buffer.total, self.landmark_buffer.total]
+        self.recording_active = self.recording
+
+        if results.pose_landmarks and self.stage_enabled('keypoints'):
+            keypoints, foot_points, hand_points, current_speed, match_results = self.run_stage(
+                'keypoints', self.process_keypoints_and_templates, results.pose_landmarks.landmark)
 
+            # process_keypoints_and_speed 已写入 landmark_buffer，这里只记录录制的帧号范围
             if self.recording:
-                self.keypoints_data.append(keypoints)
+                self.recording_range[1] = self.landmark_buffer.total
+                if self.recording_range[1] - self.recording_range[0] == LANDMARK_HISTORY + 1:
+                    print(f"Warning: recording exceeds {LANDMARK_HISTORY} frames, the earliest frames are dropped")
 
             # 更新速度总和、计数器和最大值
             for k in self.total_speeds.keys():
@@ -470,31 +554,24 @@ class PoseEstimation:
                     self.count_speeds[k] += 1
                     self.max_speeds[k] = max(self.max_speeds[k], current_speed[k])
 
-        keypoints_end = time.time()
-        logging.info(f'Keypoints and Speed Processing Time: {keypoints_end - keypoints_start:.4f} seconds')
-
-        yolo_start = time.time()
-        if yolo_work:
-            detected_objects = self.detect_pingpong_table(frame, model)
-            for (center_x, center_y, coord_text) in detected_objects:
-                cv2.circle(output_image, (center_x, center_y), 5, (0, 255, 0), -1)
-                cv2.putText(output_image, coord_text, (center_x + 10, center_y), cv2.FONT_HERSHEY_SIMPLEX, 0.5,
-                            (0, 255, 0), 2)
-        yolo_end = time.time()
-        logging.info(f'YOLO Processing Time: {yolo_end - yolo_start:.4f} seconds')
-
-        highlight_start = time.time()
-        output_image = self.process_speeds_and_highlight_ratios(keypoints, match_results, current_speed,
-                                                                chessboard_data, foot_points, output_image)
-        highlight_end = time.time()
-        logging.info(f'Highlight Ratios Processing Time: {highlight_end - highlight_start:.4f} seconds')
-
-        total_time = time.time() - start_time
-        logging.info(f'Total Frame Processing Time: {total_time:.4f} seconds')
-
-        logging.info(f'Processed frame: {self.current_frame}/{self.video_length}')
+        if yolo_work and self.stage_enabled('yolo'):
+            detected_objects = self.run_stage('yolo', self.update_table_detection, frame)
+            if self.stage_enabled('overlay'):
+                self.run_stage('overlay', self.draw_detected_objects, output_image, detected_objects)
+
+        output_image = self.run_stage('highlight', self.process_speeds_and_highlight_ratios, keypoints, match_results,
+                                      current_speed, chessboard_data, foot_points, output_image)
+
+        if self.profiling_frame:
+            self.profiler.record('total', time.perf_counter() - start_time)
+        self.profiler.maybe_report()
         return output_image
 
+    def upload_frame_to_gpu(self, frame):
+        gpu_frame = cv2.cuda_GpuMat()
+        gpu_frame.upload(frame)
+        return gpu_frame.download()
+
 
     def process_speeds_and_highlight_ratios(self, keypoints, match_results, current_speed, chessboard_data, foot_points,
                                             output_image):
@@ -527,23 +604,41 @@ class PoseEstimation:
             }
         }
 
-        height_m = self.calculate_physical_height(keypoints, self.camera_params, self.image_width, self.image_height)
+        if self.stage_enabled('height') and self.camera_params is not None:
+            self.height_m = self.run_stage('height', self.calculate_physical_height, keypoints, self.camera_params,
+                                           self.image_width, self.image_height)
 
-        skeleton_canvas = self.calculate_skeleton_image(keypoints, match_results, foot_points,
-                                                        chessboard_data)
+        if chessboard_data:
+            if self.stage_enabled('footwork'):
+                self.run_stage('footwork', self.update_highlight_counts, match_results, foot_points, chessboard_data)
+            if self.stage_enabled('skeleton_canvas'):
+                self.skeleton_canvas = self.run_stage('skeleton_canvas', self.calculate_skeleton_image, keypoints,
+                                                      match_results, foot_points, chessboard_data)
 
+        return output_image
 
-        highlight_ratios = {tuple(map(tuple, vertices)): 0 for vertices in self.grid_rects}
-        for cell_points_tuple in self.highlight_counts:
-            if cell_points_tuple in highlight_ratios:
-                highlight_ratios[cell_points_tuple] = (self.highlight_counts[cell_points_tuple] / sum(
-                    self.highlight_counts.values())) * 100
+    def detect_pose(self, image, pose):
+        image.flags.writeable = False
+        results = pose.process(image)
+        image.flags.writeable = True
+        return results
 
+    def process_keypoints_and_templates(self, landmarks):
+        keypoints, foot_points, hand_points, current_speed = self.process_keypoints_and_speed(landmarks)
+        match_results = self.match_all_templates(keypoints, foot_points, hand_points)
+        return keypoints, foot_points, hand_points, current_speed, match_results
 
-        return output_image
+    def draw_detected_objects(self, output_image, detected_objects):
+        for (center_x, center_y, coord_text) in detected_objects:
+            cv2.circle(output_image, (center_x, center_y), 5, (0, 255, 0), -1)
+            cv2.putText(output_image, coord_text, (center_x + 10, center_y), cv2.FONT_HERSHEY_SIMPLEX, 0.5,
+                        (0, 255, 0), 2)
 
     def process_chessboard(self, frame):
-        if self.grid_rects and self.red_cross_coords and self.camera_params and not self.calculate_chessboard:
+        calibration_cached = bool(self.grid_rects and self.red_cross_coords and self.camera_params
+                                  and not self.calculate_chessboard)
+        record_cache('chessboard_calibration', calibration_cached)
+        if calibration_cached:
             chessboard_data = {
                 'chessboard_vertices': self.grid_rects,
                 'right_top_vertex_img': self.red_cross_coords.get("right_top_vertex", (0, 0)),
@@ -585,18 +680,58 @@ class PoseEstimation:
 
         return chessboard_data, frame
 
-    def process_keypoints_and_speed(self, landmarks):
-        keypoints = [(lm.x, lm.y, lm.z) for lm in landmarks]
+    def process_table_calibration(self, frame):
+        """
+        由球台检测标定相机 (替代棋盘格)，结果按相机缓存在 table_calibration.json。
+        缓存不能直接信任 (同一分辨率可能是另一台相机或换了位置): 每个任务开始时运行一次 YOLO，
+        缓存与当前桌角一致时复用，否则重新标定；之后只有缩小画面上检测到镜头移动时才重新检测。
+        没有棋盘格就没有脚步格子，chessboard_data 始终为 None，只更新 camera_params (速度、身高)；标定成功前 camera_params 为 None。
+        """
+        if self.table_calibration is not None:
+            camera_moved = self.calibration_scene_change.update(frame)
+            record_cache('table_calibration', not camera_moved)
+            if not camera_moved:
+                return None, frame
+            print("Camera moved, recalibrating from the table")
+            self.table_calibration = None
+            self.table_calibration_retry = 0
+            self.camera_params = None
 
-        left_foot_points = [(landmarks[idx].x, landmarks[idx].y, landmarks[idx].z) for idx in [29, 31] if
-                            idx < len(landmarks)]
-        right_foot_points = [(landmarks[idx].x, landmarks[idx].y, landmarks[idx].z) for idx in [30, 32] if
-                             idx < len(landmarks)]
-        foot_points = left_foot_points + right_foot_points
+        if self.table_calibration_retry > 0:
+            self.table_calibration_retry -= 1
+            return None, frame
+
+        image_size = (frame.shape[1], frame.shape[0])
+        camera_key = self.camera_id or f"{image_size[0]}x{image_size[1]}"
+        if self.cached_table_calibration is None:
+            # 每个任务只读取一次缓存文件
+            self.cached_table_calibration = load_table_calibration(camera_key) or {}
+        try:
+            results = get_model('table_detector').predict(frame, verbose=False)
+            boxes = np.concatenate([result.boxes.data.cpu().numpy() for result in results])
+            calibration = self.cached_table_calibration
+            if not calibration or calibration_drift(calibration, boxes, image_size) > MAX_CALIBRATION_DRIFT:
+                calibration = calibrate_from_table(boxes, image_size)
+                save_table_calibration(camera_key, calibration)
+                self.cached_table_calibration = calibration
+        except Exception as e:
+            # 与棋盘格标定相同: 模型不可用或标定失败时不中断任务，稍后重试
+            print(f"Error in table calibration: {e} (speed and height are not computed until it succeeds)")
+            self.table_calibration_retry = TABLE_CALIBRATION_RETRY_FRAMES
+            return None, frame
+
+        self.table_calibration = calibration
+        self.calibration_scene_change.set_reference(frame)
+        self.camera_params = (calibration['mtx'], calibration['dist'], calibration['rvecs'], calibration['tvecs'])
+        return None, frame
 
-        left_hand_points = [(landmarks[idx].x, landmarks[idx].y) for idx in [17, 19] if idx < len(landmarks)]
-        right_hand_points = [(landmarks[idx].x, landmarks[idx].y) for idx in [18, 20] if idx < len(landmarks)]
-        hand_points = left_hand_points + right_hand_points
+    def process_keypoints_and_speed(self, landmarks):
+        # 每帧只转换一次，keypoints / 脚 / 手 / 髋都是环形缓冲区中该帧的视图
+        row = self.landmark_buffer.push(landmarks, self.frame_timestamp)
+        keypoints = row[:, :3]
+        foot_points = row[FOOT_SLICE, :3]
+        hand_points = row[HAND_SLICE, :2]
+        midpoint = row[HIP_SLICE, :2].mean(axis=0)
 
         current_speed = {
             'forward': 0,
@@ -605,12 +740,13 @@ class PoseEstimation:
             'overall': 0
         }
 
-        if self.previous_midpoint is not None:
-            delta_time = 1.0 / self.fps
-            current_midpoint = [(landmarks[23].x + landmarks[24].x) / 2,
-                                (landmarks[23].y + landmarks[24].y) / 2]
-
-            current_midpoint_phys = self.convert_to_physical_coordinates(current_midpoint, *self.camera_params)
+        if self.previous_midpoint is not None and self.camera_params is not None:
+            if self.frame_timestamp is not None and self.previous_time is not None \
+                    and self.frame_timestamp > self.previous_time:
+                delta_time = self.frame_timestamp - self.previous_time
+            else:
+                delta_time = 1.0 / self.fps
+            current_midpoint_phys = self.convert_to_physical_coordinates(midpoint, *self.camera_params)
             previous_midpoint_phys = self.convert_to_physical_coordinates(self.previous_midpoint, *self.camera_params)
 
             delta_distance = np.linalg.norm(current_midpoint_phys - previous_midpoint_phys)
@@ -629,19 +765,32 @@ class PoseEstimation:
             current_speed['sideways'] = delta_distance_x / delta_time
             current_speed['depth'] = delta_distance_z / delta_time
 
-        self.previous_midpoint = [(landmarks[23].x + landmarks[24].x) / 2,
-                                  (landmarks[23].y + landmarks[24].y) / 2]
+        self.previous_midpoint = midpoint
+        self.previous_time = self.frame_timestamp
 
-        if hand_points:
-            if self.previous_hand_points is not None:
-                delta_distance = np.mean([np.linalg.norm(np.array(p1) - np.array(p2)) for p1, p2 in
-                                          zip(hand_points, self.previous_hand_points)])
-                if delta_distance < NOISE_THRESHOLD:
-                    hand_points = self.previous_hand_points
-            self.previous_hand_points = hand_points
+        if self.previous_hand_points is not None:
+            delta_distance = np.mean(np.linalg.norm(hand_points - self.previous_hand_points, axis=-1))
+            if delta_distance < NOISE_THRESHOLD:
+                hand_points = self.previous_hand_points
+        # 保存副本: 环形缓冲区的行之后会被覆盖
+        np.copyto(self.previous_hand_buffer, hand_points)
+        self.previous_hand_points = self.previous_hand_buffer
 
         return keypoints, foot_points, hand_points, current_speed
 
+    def update_table_detection(self, frame):
+        """球台不动，复用上一次的检测结果；只有缩小画面上检测到镜头移动或到了兜底间隔时才重新检测"""
+        camera_moved = self.scene_change.update(frame)
+        self.frames_since_table_detection += 1
+        redetect_due = TABLE_REDETECT_FRAMES and self.frames_since_table_detection >= TABLE_REDETECT_FRAMES
+        cached = self.table_objects is not None and not camera_moved and not redetect_due
+        record_cache('table_detection', cached)
+        if not cached:
+            self.table_objects = self.detect_pingpong_table(frame, get_model('table_detector'))
+            self.scene_change.set_reference(frame)
+            self.frames_since_table_detection = 0
+        return self.table_objects
+
     def detect_pingpong_table(self, frame, model):
         table_results = model.predict(frame)
         label_map = {
@@ -664,10 +813,6 @@ class PoseEstimation:
                 coord_text = f'{label}({center_x}, {center_y})'
                 detected_objects.append((center_x, center_y, coord_text))
 
-                box_width = x2 - x1
-                box_height = y2 - y1
-                scaling_factor = REAL_TABLE_DIAGONAL_M / ((box_width ** 2 + box_height ** 2) ** 0.5)
-
         return detected_objects
 
     def match_all_templates(self, current_keypoints, foot_points, hand_points):
@@ -697,14 +842,16 @@ class PoseEstimation:
 
     def analyze_video(self, video_path):
         self.initialize_video_capture(video_path)
-        self.keypoints_data = []
+        self.recording_range = None
+        self.recording_active = False
         self.video_length = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
         self.current_frame = 0
         self.video_playing = True
         self.start_time = time.time()
         self.frame_count = 0
 
-        with self.mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5, model_complexity=0) as pose:
+        with LocalPose(POSE_BACKEND, min_detection_confidence=0.5, min_tracking_confidence=0.5,
+                       model_complexity=0) as pose:
             while self.cap.isOpened() and self.video_playing:
                 ret, frame = self.cap.read()
                 if not ret:
@@ -759,14 +906,11 @@ class PoseEstimation:
             return height_m
         return 0
 
-    def calculate_skeleton_image(self, keypoints, match_results, foot_points, chessboard_data):
+    def update_highlight_counts(self, match_results, foot_points, chessboard_data):
+        # 挥拍命中时统计脚所在的格子 (在 1280×720 坐标下判断，与原画布一致)
         screen_height = 720
         screen_width = 1280
 
-        skeleton_canvas = np.zeros((screen_height, screen_width, 3), dtype=np.uint8)
-
-        highlight_ratios = {tuple(map(tuple, vertices)): 0 for vertices in chessboard_data['chessboard_vertices']}
-
         arm_match = any(match_results["Arm"].values())
         if arm_match:
             foot_coords = [(int(foot_point[0] * screen_width), int(foot_point[1] * screen_height)) for foot_point in
@@ -785,14 +929,25 @@ class PoseEstimation:
                         self.highlight_counts[cell_points_tuple] += 1
                         break
 
-        total_highlights = sum(self.highlight_counts.values())
-        if total_highlights > 0:
-            for cell_points_tuple in highlight_ratios.keys():
-                highlight_ratios[cell_points_tuple] = self.highlight_counts.get(cell_points_tuple,
-                                                                                0) / total_highlights * 100
+    def calculate_skeleton_image(self, keypoints, match_results, foot_points, chessboard_data):
+        screen_height = 720
+        screen_width = 1280
 
+        skeleton_canvas = np.zeros((screen_height, screen_width, 3), dtype=np.uint8)
+        self.draw_skeleton(skeleton_canvas, keypoints, self.mp_pose.POSE_CONNECTIONS, (255, 255, 255))
         return skeleton_canvas
 
+    def draw_skeleton(self, image, keypoints, connections, color, circle_radius=2):
+        for connection in connections:
+            start_idx, end_idx = connection
+            if start_idx < len(keypoints) and end_idx < len(keypoints):
+                start_point = (int(keypoints[start_idx][0] * image.shape[1]),
+                               int(keypoints[start_idx][1] * image.shape[0]))
+                end_point = (int(keypoints[end_idx][0] * image.shape[1]), int(keypoints[end_idx][1] * image.shape[0]))
+                cv2.line(image, start_point, end_point, color, 2)
+                cv2.circle(image, start_point, circle_radius, color, -1)
+                cv2.circle(image, end_point, circle_radius, color, -1)
+
     def load_chessboard_pattern_config(self):
         try:
             with open('chessboard_pattern_config.json', 'r') as f:
@@ -0,0 +1,219 @@
+import multiprocessing as mp
+import queue
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from pose_backend import NUM_LANDMARKS, POSE_BACKEND, as_pose_results, create_pose_backend
+
+# 结果缓冲区每个槽位: 33×4 关键点 + [是否检测到, 推理耗时(秒)]
+RESULT_SIZE = NUM_LANDMARKS * 4 + 2
+STARTUP_TIMEOUT = 120  # 等待推理进程加载模型的最长时间 (秒)
+
+
+def pose_worker_main(frame_shm_name, result_shm_name, frame_shape, slots, backend, backend_kwargs,
+                     request_queue, response_queue):
+    """
+    推理进程入口。
+
+    帧和结果都放在共享内存中，队列里只传递槽位号和帧号，不序列化图像数据。
+    """
+    frame_shm = shared_memory.SharedMemory(name=frame_shm_name)
+    result_shm = shared_memory.SharedMemory(name=result_shm_name)
+    frames = np.ndarray((slots,) + tuple(frame_shape), dtype=np.uint8, buffer=frame_shm.buf)
+    results = np.ndarray((slots, RESULT_SIZE), dtype=np.float32, buffer=result_shm.buf)
+
+    try:
+        with create_pose_backend(backend, **backend_kwargs) as pose:
+            response_queue.put(('ready', None, None))
+            while True:
+                request = request_queue.get()
+                if request is None:
+                    break
+                slot, frame_id, timestamp_ms = request
+
+                landmarks = pose.process(frames[slot], timestamp_ms)
+                if landmarks is not None:
+                    results[slot, :NUM_LANDMARKS * 4] = landmarks.ravel()
+                    results[slot, -2] = 1
+                else:
+                    results[slot, -2] = 0
+                results[slot, -1] = pose.latencies[-1]
+                pose.latencies.clear()
+                response_queue.put(('done', slot, frame_id))
+    except Exception as e:
+        response_queue.put(('error', None, str(e)))
+    finally:
+        del frames, results
+        frame_shm.close()
+        result_shm.close()
+
+
+class PoseWorker:
+    """
+    独立进程中的姿态推理，避免与 OpenCV 绘图、matplotlib、Tk/pygame 争抢 GIL。
+
+    - submit(): 把 RGB 帧复制到共享内存环形缓冲区的空闲槽位，返回帧号 (满时返回 None，由调用方丢帧)
+    - get_result(): 取回 (frame_id, 关键点 (33, 4) 或 None, 推理耗时)
+    - process(): submit + 等待结果，同步调用
+    """
+
+    def __init__(self, frame_shape, slots=4, backend=POSE_BACKEND, **backend_kwargs):
+        self.frame_shape = tuple(frame_shape)
+        self.slots = slots
+
+        frame_bytes = int(np.prod(self.frame_shape))
+        self.frame_shm = shared_memory.SharedMemory(create=True, size=slots * frame_bytes)
+        self.result_shm = shared_memory.SharedMemory(create=True, size=slots * RESULT_SIZE * 4)
+        self.frames = np.ndarray((slots,) + self.frame_shape, dtype=np.uint8, buffer=self.frame_shm.buf)
+        self.results = np.ndarray((slots, RESULT_SIZE), dtype=np.float32, buffer=self.result_shm.buf)
+
+        # spawn: Windows 上的默认方式，子进程不继承 GUI 的线程和窗口状态
+        context = mp.get_context('spawn')
+        self.request_queue = context.Queue()
+        self.response_queue = context.Queue()
+        self.free_slots = list(range(slots))
+        self.next_frame_id = 0
+
+        self.process_handle = context.Process(
+            target=pose_worker_main,
+            args=(self.frame_shm.name, self.result_shm.name, self.frame_shape, slots, backend, backend_kwargs,
+                  self.request_queue, self.response_queue),
+            daemon=True)
+        self.process_handle.start()
+
+        status, error = self.wait_ready()
+        if status != 'ready':
+            self.close()
+            raise RuntimeError(f"Pose worker failed to start: {error}")
+
+    def wait_ready(self):
+        # 子进程在启动时崩溃 (导入失败、模型加载被杀) 不会发送任何消息，不能无限等待
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while True:
+            try:
+                status, _, error = self.response_queue.get(timeout=1.0)
+                return status, error
+            except queue.Empty:
+                if not self.process_handle.is_alive():
+                    return 'error', f"process exited with code {self.process_handle.exitcode}"
+                if time.monotonic() > deadline:
+                    return 'error', f"no response within {STARTUP_TIMEOUT} s"
+
+    def submit(self, image, timestamp_ms=None):
+        """返回帧号；没有空闲槽位 (推理跟不上) 时返回 None"""
+        if not self.free_slots:
+            return None
+        slot = self.free_slots.pop(0)
+        np.copyto(self.frames[slot], image)
+
+        frame_id = self.next_frame_id
+        self.next_frame_id += 1
+        self.request_queue.put((slot, frame_id, timestamp_ms))
+        return frame_id
+
+    def get_result(self, timeout=None):
+        try:
+            status, slot, frame_id = self.response_queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if status == 'error':
+            raise RuntimeError(f"Pose worker error: {frame_id}")
+
+        result = self.results[slot]
+        landmarks = result[:NUM_LANDMARKS * 4].reshape(NUM_LANDMARKS, 4).copy() if result[-2] else None
+        latency = float(result[-1])
+        self.free_slots.append(slot)
+        return frame_id, landmarks, latency
+
+    @property
+    def pending(self):
+        return self.slots - len(self.free_slots)
+
+    def process(self, image, timestamp_ms=None):
+        # 同步调用时先取回之前未处理的结果，保证槽位可用
+        while not self.free_slots:
+            if self.get_result(timeout=10) is None:
+                raise RuntimeError("Pose worker did not respond")
+        frame_id = self.submit(image, timestamp_ms)
+        while True:
+            result = self.get_result(timeout=10)
+            if result is None:
+                raise RuntimeError("Pose worker did not respond")
+            result_id, landmarks, _ = result
+            if result_id == frame_id:
+                return landmarks
+
+    def close(self):
+        if self.process_handle.is_alive():
+            self.request_queue.put(None)
+            self.process_handle.join(timeout=5)
+            if self.process_handle.is_alive():
+                self.process_handle.terminate()
+        del self.frames, self.results
+        self.frame_shm.close()
+        self.frame_shm.unlink()
+        self.result_shm.close()
+        self.result_shm.unlink()
+
+
+class RemotePose:
+    """
+    与 mp.solutions.pose.Pose 用法相同的包装 (process() 返回带 pose_landmarks.landmark 的结果)，
+    可以直接替换 `with mp_pose.Pose(...) as pose:`，推理在 PoseWorker 进程中完成。
+
+    第一次调用时按帧尺寸创建 worker，尺寸变化 (切换视频/摄像头) 时重建。
+    """
+
+    def __init__(self, backend=POSE_BACKEND, **backend_kwargs):
+        self.backend = backend
+        self.backend_kwargs = backend_kwargs
+        self.worker = None
+
+    def process(self, image):
+        if self.worker is None or self.worker.frame_shape != image.shape:
+            if self.worker is not None:
+                self.worker.close()
+            self.worker = PoseWorker(image.shape, backend=self.backend, **self.backend_kwargs)
+
+        return as_pose_results(self.worker.process(image))
+
+    def close(self):
+        if self.worker is not None:
+            self.worker.close()
+            self.worker = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+if __name__ == "__main__":
+    # 进程内 vs 独立进程对比: python pose_worker.py ../mp4/01.mov
+    import sys
+    from pose_backend import load_frames
+
+    video_path = sys.argv[1] if len(sys.argv) > 1 else '../mp4/01.mov'
+    frames, fps = load_frames(video_path, 300)
+
+    with create_pose_backend(POSE_BACKEND) as backend:
+        start = time.time()
+        backend.run(frames, fps)
+        print(f"in-process: {len(frames) / (time.time() - start):.1f} FPS")
+
+    worker = PoseWorker(frames[0].shape)
+    start = time.time()
+    done = 0
+    for index, frame in enumerate(frames):
+        # 流水线: 槽位满时先取回结果
+        while worker.submit(frame, int(index * 1000 / fps)) is None:
+            worker.get_result()
+            done += 1
+    while done < len(frames):
+        worker.get_result()
+        done += 1
+    print(f"worker process: {len(frames) / (time.time() - start):.1f} FPS")
+    worker.close()
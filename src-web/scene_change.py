@@ -0,0 +1,111 @@
+import cv2
+import numpy as np
+
+SCENE_SIZE = (64, 36)  # 比较用的缩小尺寸 (宽, 高)
+SHIFT_THRESHOLD = 1.0  # 整体平移超过该值 (缩小后的像素，约为画面宽度的 1/64) 时视为镜头移动
+MIN_RESPONSE = 0.1  # 相位相关的响应低于该值时平移估计不可靠 (只有球员在动)
+PIXEL_THRESHOLD = 20  # 灰度差超过该值的像素视为变化
+CHANGE_FRACTION = 0.5  # 变化像素超过该比例时视为画面切换或缩放 (球员走动只占画面的一小部分)
+SHIFT_TOLERANCE = 0.5  # 连续帧的平移估计相差不超过该值才算同一次镜头移动 (球员走动引起的估计抖动方向不定)
+CHANGE_FRAMES = 3  # 连续 N 帧变化才触发，忽略闪光、遮挡等瞬时变化
+
+
+class SceneChangeDetector:
+    """
+    在缩小的灰度图上检测镜头移动，与参考帧 (上一次检测球台时的画面) 比较:
+    - 相位相关估计整体平移，且连续几帧的平移一致，局部运动 (球员、球) 只会让估计小幅抖动
+    - 大部分像素都变化时 (切换画面、缩放) 也触发
+
+    - update(): 每帧调用，返回是否需要重新检测球台
+    - set_reference(): 重新检测后把当前帧设为参考帧
+    """
+
+    def __init__(self, size=SCENE_SIZE, shift_threshold=SHIFT_THRESHOLD, min_response=MIN_RESPONSE,
+                 pixel_threshold=PIXEL_THRESHOLD, change_fraction=CHANGE_FRACTION, shift_tolerance=SHIFT_TOLERANCE,
+                 change_frames=CHANGE_FRAMES):
+        self.size = size
+        self.shift_threshold = shift_threshold
+        self.shift_tolerance = shift_tolerance
+        self.min_response = min_response
+        self.window = cv2.createHanningWindow(size, cv2.CV_32F)
+        self.pixel_threshold = pixel_threshold
+        self.change_fraction = change_fraction
+        self.change_frames = change_frames
+        self.reference = None
+        self.changed_frames = 0
+        self.last_shift = (0.0, 0.0)
+        self.last_fraction = 0.0
+
+    def preprocess(self, frame):
+        # 先缩小再转灰度，每帧只处理 64×36 个像素
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (3, 3), 0).astype(np.float32)
+
+    def set_reference(self, frame):
+        self.reference = self.preprocess(frame)
+        self.changed_frames = 0
+        self.last_shift = (0.0, 0.0)
+
+    def update(self, frame):
+        small = self.preprocess(frame)
+        if self.reference is None:
+            self.reference = small
+            return False
+        diff = cv2.absdiff(small, self.reference)
+        self.last_fraction = np.count_nonzero(diff > self.pixel_threshold) / diff.size
+        # phaseCorrelate 会把窗函数原地乘到输入上，参考帧传副本
+        (dx, dy), response = cv2.phaseCorrelate(self.reference.copy(), small, self.window)
+        shift = (dx, dy) if response >= self.min_response else (0.0, 0.0)
+        steady = np.hypot(shift[0] - self.last_shift[0], shift[1] - self.last_shift[1]) <= self.shift_tolerance
+        self.last_shift = shift
+
+        # 镜头移动后相对参考帧的平移保持不变; 大面积变化 (切换画面、缩放) 时相位相关不可靠，单独判断
+        moved = (np.hypot(*shift) > self.shift_threshold and steady) or self.last_fraction > self.change_fraction
+        self.changed_frames = self.changed_frames + 1 if moved else 0
+        return self.changed_frames >= self.change_frames
+
+
+if __name__ == "__main__":
+    # 检测开销和触发帧: python scene_change.py [video]
+    # 视频 (或没有视频时的合成画面: 纹理背景 + 球台 + 左右走动的球员) 从中间开始平移 3% 画面宽度，模拟镜头移动
+    import sys
+    import time
+
+    if len(sys.argv) > 1:
+        cap = cv2.VideoCapture(sys.argv[1])
+        frames = []
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        cap.release()
+    else:
+        rng = np.random.default_rng(0)
+        background = cv2.resize(rng.integers(0, 255, (45, 80, 3), dtype=np.uint8), (1280, 720),
+                                interpolation=cv2.INTER_CUBIC)
+        cv2.rectangle(background, (300, 400), (980, 560), (40, 120, 40), -1)
+        frames = []
+        for index in range(300):
+            frame = background.copy()
+            player_x = int(500 + 300 * np.sin(index / 20))
+            cv2.rectangle(frame, (player_x, 150), (player_x + 180, 650), (200, 180, 160), -1)
+            frames.append(frame)
+
+    moved_at = len(frames) // 2
+    detector = SceneChangeDetector()
+    elapsed = 0.0
+    triggers = []
+    for index, frame in enumerate(frames):
+        if index >= moved_at:
+            shift = np.float32([[1, 0, frame.shape[1] * 0.03], [0, 1, 0]])
+            frame = cv2.warpAffine(frame, shift, (frame.shape[1], frame.shape[0]), borderMode=cv2.BORDER_REFLECT)
+        start = time.perf_counter()
+        if detector.update(frame):
+            triggers.append(index)
+            detector.set_reference(frame)  # 相当于重新检测球台
+        elapsed += time.perf_counter() - start
+    print(f"{len(frames)} frames, {elapsed / max(len(frames), 1) * 1e3:.3f} ms/frame, camera moved at frame {moved_at}")
+    print(f"re-detection triggered at frames {triggers}")
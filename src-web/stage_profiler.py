@@ -0,0 +1,149 @@
+import bisect
+import threading
+import time
+
+import numpy as np
+
+# 直方图桶边界 (秒): 0.05 ms ~ 10 s 之间按对数均匀划分
+BUCKET_EDGES = np.logspace(np.log10(0.00005), np.log10(10.0), 160).tolist()
+
+
+class StageHistogram:
+    """固定大小的耗时直方图，内存占用与记录次数无关"""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_EDGES) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        self.counts[bisect.bisect_left(BUCKET_EDGES, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other):
+        for idx, bucket_count in enumerate(other.counts):
+            self.counts[idx] += bucket_count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def cumulative_count(self, upper_bound):
+        """耗时 <= upper_bound 的次数 (按细桶上边界近似)，用于导出较粗的 Prometheus 桶"""
+        return sum(bucket_count for edge, bucket_count in zip(BUCKET_EDGES, self.counts) if edge <= upper_bound)
+
+    def percentile(self, q):
+        """返回第 q 百分位所在桶的上边界 (秒)"""
+        if self.count == 0:
+            return 0.0
+        target = q / 100 * self.count
+        cumulative = 0
+        for idx, bucket_count in enumerate(self.counts):
+            cumulative += bucket_count
+            if cumulative >= target:
+                return min(BUCKET_EDGES[idx], self.max) if idx < len(BUCKET_EDGES) else self.max
+        return self.max
+
+
+class StageProfiler:
+    """
+    每阶段耗时统计，替代逐帧 logging.info。
+
+    - 每 sample_every 帧采样一次，只有采样帧记录耗时
+    - 耗时写入固定大小的直方图，report() 输出 p50/p95/p99
+    - report_interval 秒输出一次 (maybe_report)，也可以随时调用 report()
+    - enabled=False 时 begin_frame() 直接返回 False，调用方跳过计时
+    """
+
+    def __init__(self, enabled=True, sample_every=1, report_interval=60.0):
+        self.enabled = enabled
+        self.sample_every = max(1, sample_every)
+        self.report_interval = report_interval
+        self.histograms = {}
+        self.frame_index = 0
+        self.last_report_time = time.time()
+        self.lock = threading.Lock()
+
+    def begin_frame(self):
+        """开始新的一帧，返回该帧是否需要计时 (多个任务共用一个 profiler 时由调用方各自保存)"""
+        if not self.enabled:
+            return False
+        sampling = self.frame_index % self.sample_every == 0
+        self.frame_index += 1
+        return sampling
+
+    def histogram_items(self):
+        with self.lock:
+            return list(self.histograms.items())
+
+    def record(self, name, seconds):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = StageHistogram()
+            histogram.record(seconds)
+
+    def merge(self, items):
+        """合并其他进程发来的 histogram_items() (常驻 worker 定期把直方图交给 app.py 的 profiler)"""
+        with self.lock:
+            for name, other in items:
+                histogram = self.histograms.get(name)
+                if histogram is None:
+                    histogram = self.histograms[name] = StageHistogram()
+                histogram.merge(other)
+
+    def snapshot(self):
+        """{阶段名: {count, avg, p50, p95, p99, max}}，单位秒"""
+        with self.lock:
+            return {name: {'count': histogram.count,
+                           'avg': histogram.total / histogram.count if histogram.count else 0.0,
+                           'p50': histogram.percentile(50),
+                           'p95': histogram.percentile(95),
+                           'p99': histogram.percentile(99),
+                           'max': histogram.max}
+                    for name, histogram in self.histograms.items()}
+
+    def report(self):
+        lines = [f"Stage timings ({self.frame_index} frames, sampled every {self.sample_every}):"]
+        for name, stats in self.snapshot().items():
+            lines.append(f"  {name:<16} n={stats['count']:<7} p50 {stats['p50'] * 1000:8.2f} ms  "
+                         f"p95 {stats['p95'] * 1000:8.2f} ms  p99 {stats['p99'] * 1000:8.2f} ms  "
+                         f"max {stats['max'] * 1000:8.2f} ms")
+        return "\n".join(lines)
+
+    def maybe_report(self):
+        if not self.enabled or self.report_interval is None:
+            return
+        now = time.time()
+        if now - self.last_report_time >= self.report_interval:
+            self.last_report_time = now
+            print(self.report())
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {}
+            self.frame_index = 0
+
+
+if __name__ == "__main__":
+    # 开销测试: 关闭时每帧只有一次属性判断
+    profiler = StageProfiler(enabled=False)
+    start = time.perf_counter()
+    for _ in range(100000):
+        if profiler.begin_frame():
+            profiler.record('pose', 0.01)
+    print(f"disabled: {(time.perf_counter() - start) / 100000 * 1e9:.0f} ns/frame")
+
+    profiler = StageProfiler()
+    rng = np.random.default_rng(0)
+    samples = rng.lognormal(np.log(0.02), 0.3, 100000)
+    start = time.perf_counter()
+    for seconds in samples:
+        if profiler.begin_frame():
+            profiler.record('pose', seconds)
+    print(f"enabled: {(time.perf_counter() - start) / len(samples) * 1e9:.0f} ns/frame")
+    print(profiler.report())
+    print(f"numpy p95: {np.percentile(samples, 95) * 1000:.2f} ms")
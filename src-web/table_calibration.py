@@ -0,0 +1,269 @@
+import json
+import os
+import tempfile
+
+import cv2
+import numpy as np
+
+# 与棋盘格标定相同，物理坐标单位为厘米
+TABLE_LENGTH_CM = 274.0
+TABLE_WIDTH_CM = 152.5
+NET_HEIGHT_CM = 15.25
+NET_OVERHANG_CM = 15.25  # 网柱在边线外侧的距离
+
+# 球台模型的检测类别 (dataset/dataset.yaml): 桌角、桌腿、网柱 (上下两端)
+TABLE_CORNER_CLASS = 15
+TABLE_LEG_CLASS = 16
+TABLE_NET_CLASS = 17
+
+MIN_DETECTION_CONF = 0.3
+FOCAL_RANGE = (0.3, 5.0)  # 焦距的合理范围 (图像宽度的倍数)，超出时视为估计失败
+DEFAULT_FOCAL = 1.0  # 无法从单应矩阵估计焦距时使用 (图像宽度的倍数，约 53° 水平视场角)
+MAX_REPROJECTION_ERROR = 0.02  # 网柱重投影误差超过图像宽度的该比例时认为标定失败
+MAX_CALIBRATION_DRIFT = 0.02  # 缓存的标定与当前桌角检测相差超过图像宽度的该比例时重新标定
+
+CALIBRATION_FILE = 'table_calibration.json'
+
+# 球台坐标系: 原点在台面中心，X 沿球台长边，Y 沿短边，Z 向上
+# 桌角按逆时针顺序
+TABLE_CORNERS = np.array([[-TABLE_LENGTH_CM / 2, -TABLE_WIDTH_CM / 2, 0],
+                          [TABLE_LENGTH_CM / 2, -TABLE_WIDTH_CM / 2, 0],
+                          [TABLE_LENGTH_CM / 2, TABLE_WIDTH_CM / 2, 0],
+                          [-TABLE_LENGTH_CM / 2, TABLE_WIDTH_CM / 2, 0]], dtype=np.float32)
+NET_POST_Y = TABLE_WIDTH_CM / 2 + NET_OVERHANG_CM
+NET_POINTS = np.array([[0, -NET_POST_Y, 0], [0, -NET_POST_Y, NET_HEIGHT_CM],
+                       [0, NET_POST_Y, 0], [0, NET_POST_Y, NET_HEIGHT_CM]], dtype=np.float32)
+
+
+def detection_centers(boxes, cls, limit):
+    """(N, 6) [x1, y1, x2, y2, conf, cls] 检测框 -> 某一类别置信度最高的 limit 个中心点"""
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 6)
+    boxes = boxes[(boxes[:, 5] == cls) & (boxes[:, 4] >= MIN_DETECTION_CONF)]
+    boxes = boxes[np.argsort(-boxes[:, 4])[:limit]]
+    return np.stack([(boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2], axis=1)
+
+
+def camera_matrix(focal, image_size):
+    width, height = image_size
+    return np.array([[focal, 0, width / 2], [0, focal, height / 2], [0, 0, 1]], dtype=np.float64)
+
+
+def estimate_focal(homography, image_size):
+    """
+    假设像素为正方形、主点在图像中心，由台面的单应矩阵估计焦距。
+    单应矩阵的前两列是台面 X、Y 轴方向，相互垂直且长度相等，各给出一个焦距估计。
+
+    两个估计都不可用时 (如正对台面) 返回默认焦距。
+    """
+    width, height = image_size
+    to_center = np.array([[1, 0, -width / 2], [0, 1, -height / 2], [0, 0, 1]])
+    h = to_center @ homography
+    (h11, h12), (h21, h22), (h31, h32) = h[0, :2], h[1, :2], h[2, :2]
+
+    estimates = []
+    for numerator, denominator in ((h11 * h12 + h21 * h22, h31 * h32),
+                                   (h11 ** 2 + h21 ** 2 - h12 ** 2 - h22 ** 2, h31 ** 2 - h32 ** 2)):
+        if abs(denominator) < 1e-12:
+            continue
+        squared = -numerator / denominator
+        if squared > 0 and FOCAL_RANGE[0] * width <= squared ** 0.5 <= FOCAL_RANGE[1] * width:
+            estimates.append(squared ** 0.5)
+
+    if not estimates:
+        return DEFAULT_FOCAL * width
+    return float(np.prod(estimates) ** (1 / len(estimates)))
+
+
+def axis_ratio(homography, mtx):
+    """台面 X、Y 轴方向在相机坐标系中的长度比，桌角对应关系正确时接近 1"""
+    axes = np.linalg.inv(mtx) @ homography[:, :2]
+    return np.linalg.norm(axes[:, 0]) / np.linalg.norm(axes[:, 1])
+
+
+def solve_table_pose(image_corners, nets, image_size):
+    """按给定的桌角对应关系求解相机，相机在台面下方 (对应关系是镜像) 时返回 None"""
+    homography, _ = cv2.findHomography(TABLE_CORNERS[:, :2], image_corners)
+    if homography is None:
+        return None
+    mtx = camera_matrix(estimate_focal(homography, image_size), image_size)
+    dist = np.zeros((1, 5))
+    success, rvec, tvec = cv2.solvePnP(TABLE_CORNERS, image_corners, mtx, dist, flags=cv2.SOLVEPNP_IPPE)
+    if not success:
+        return None
+    rotation, _ = cv2.Rodrigues(rvec)
+    if (-rotation.T @ tvec)[2, 0] <= 0:
+        return None
+
+    net_error = None
+    if len(nets):
+        # 网柱检测与投影点最近邻匹配，加入网柱 (不在台面上) 一起优化位姿
+        projected, _ = cv2.projectPoints(NET_POINTS, rvec, tvec, mtx, dist)
+        projected = projected.reshape(-1, 2)
+        matches = np.argmin(np.linalg.norm(nets[:, None] - projected[None], axis=2), axis=1)
+        object_points = np.concatenate([TABLE_CORNERS, NET_POINTS[matches]])
+        image_points = np.concatenate([image_corners, nets]).astype(np.float64)
+        success, rvec, tvec = cv2.solvePnP(object_points, image_points, mtx, dist, rvec, tvec,
+                                           useExtrinsicGuess=True, flags=cv2.SOLVEPNP_ITERATIVE)
+        projected, _ = cv2.projectPoints(NET_POINTS[matches], rvec, tvec, mtx, dist)
+        net_error = float(np.mean(np.linalg.norm(projected.reshape(-1, 2) - nets, axis=1))) / image_size[0]
+
+    return {
+        'mtx': mtx,
+        'dist': dist,
+        'rvecs': rvec,
+        'tvecs': tvec,
+        'homography': homography,
+        'net_error': net_error,
+        'score': net_error if net_error is not None else abs(np.log(axis_ratio(homography, mtx))),
+    }
+
+
+def calibrate_from_table(boxes, image_size):
+    """
+    由一帧的球台检测结果 (桌角 + 网柱) 估计相机内参和位姿，替代棋盘格标定。
+
+    参数:
+    - boxes: (N, 6) [x1, y1, x2, y2, conf, cls] 检测框 (YOLO boxes.data 的格式)
+    - image_size: (宽, 高)
+
+    返回:
+    - {'mtx', 'dist', 'rvecs', 'tvecs', 'homography', 'net_error'}，物理坐标为球台坐标系 (厘米)
+
+    桌角检测没有编号: 取凸包顺序后，长边是哪一组对边由网柱的重投影误差决定；
+    没有网柱时选台面两轴长度比最接近 1 的一组。检测不足时抛出 ValueError。
+    """
+    corners = detection_centers(boxes, TABLE_CORNER_CLASS, 4)
+    nets = detection_centers(boxes, TABLE_NET_CLASS, len(NET_POINTS))
+    if len(corners) < 4:
+        raise ValueError(f"只检测到 {len(corners)} 个桌角")
+    hull = cv2.convexHull(corners).reshape(-1, 2).astype(np.float64)
+    if len(hull) < 4:
+        raise ValueError("桌角不构成凸四边形")
+
+    best = None
+    # 球台旋转 180° 后不变，只需尝试两种长边对应和两种方向 (镜像的一种相机在台面下方)
+    for shift in (0, 1):
+        for direction in (1, -1):
+            image_corners = np.roll(hull[::direction], shift, axis=0)
+            calibration = solve_table_pose(image_corners, nets, image_size)
+            if calibration is not None and (best is None or calibration['score'] < best['score']):
+                best = calibration
+    if best is None:
+        raise ValueError("无法由桌角求解相机位姿")
+    if best['net_error'] is not None and best['net_error'] > MAX_REPROJECTION_ERROR:
+        raise ValueError(f"网柱重投影误差过大: {best['net_error']:.3f}")
+    del best['score']
+    return best
+
+
+def calibration_drift(calibration, boxes, image_size):
+    """
+    缓存的标定与当前帧桌角检测的偏差: 每个检测到的桌角到最近的投影桌角的平均距离 (图像宽度的比例)。
+    检测到的桌角少于 3 个时无法判断，返回 inf。
+    """
+    corners = detection_centers(boxes, TABLE_CORNER_CLASS, 4)
+    if len(corners) < 3:
+        return np.inf
+    projected, _ = cv2.projectPoints(TABLE_CORNERS, np.asarray(calibration['rvecs'], dtype=np.float64),
+                                     np.asarray(calibration['tvecs'], dtype=np.float64),
+                                     np.asarray(calibration['mtx'], dtype=np.float64),
+                                     np.asarray(calibration['dist'], dtype=np.float64))
+    distances = np.linalg.norm(corners[:, None] - projected.reshape(1, -1, 2), axis=2).min(axis=1)
+    return float(distances.mean()) / image_size[0]
+
+
+def load_table_calibration(camera_key, path=CALIBRATION_FILE):
+    """读取某个相机缓存的标定结果，没有时返回 None"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r') as f:
+            calibration = json.load(f).get(camera_key)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Error loading table calibration: {e}")
+        return None
+    if calibration is None:
+        return None
+    return {key: np.array(value, dtype=np.float32) if isinstance(value, list) else value
+            for key, value in calibration.items()}
+
+
+def save_table_calibration(camera_key, calibration, path=CALIBRATION_FILE):
+    """
+    多个 worker 进程共用同一个文件: 写入临时文件后用 os.replace 替换，读取方不会读到写了一半的文件；
+    替换前才重新读取并合并其他相机的条目，缩小并发写入互相覆盖的窗口。
+    """
+    entry = {key: value.tolist() if isinstance(value, np.ndarray) else value for key, value in calibration.items()}
+    directory = os.path.dirname(os.path.abspath(path))
+    temp_path = None
+    try:
+        with tempfile.NamedTemporaryFile('w', dir=directory, suffix='.tmp', delete=False) as f:
+            temp_path = f.name
+            calibrations = {}
+            if os.path.exists(path):
+                try:
+                    with open(path, 'r') as existing:
+                        calibrations = json.load(existing)
+                except (OSError, json.JSONDecodeError):
+                    calibrations = {}
+            calibrations[camera_key] = entry
+            json.dump(calibrations, f, indent=4)
+        os.replace(temp_path, path)
+        temp_path = None
+    except OSError as e:
+        # 缓存写入失败不影响本次标定的结果
+        print(f"Error saving table calibration: {e}")
+    finally:
+        if temp_path is not None and os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+if __name__ == "__main__":
+    # 合成相机的标定精度和耗时: python table_calibration.py
+    import time
+
+    rng = np.random.default_rng(0)
+    image_size = (1280, 720)
+    runs = 200
+    focal_errors, position_errors, elapsed, failures = [], [], 0.0, 0
+    for run in range(runs):
+        # 距台面中心 2.5~5 m、高 1.5~2.5 m 的相机，朝向台面中心
+        focal = rng.uniform(0.7, 1.5) * image_size[0]
+        angle = rng.uniform(-np.pi, np.pi)
+        distance = rng.uniform(250, 500)
+        position = np.array([distance * np.cos(angle), distance * np.sin(angle), rng.uniform(150, 250)])
+        forward = -position / np.linalg.norm(position)
+        right = np.cross(forward, [0, 0, 1])
+        right /= np.linalg.norm(right)
+        down = np.cross(forward, right)
+        rotation = np.stack([right, down, forward])
+        rvec, _ = cv2.Rodrigues(rotation)
+        tvec = -rotation @ position
+        mtx = camera_matrix(focal, image_size)
+
+        points = np.concatenate([TABLE_CORNERS, NET_POINTS])
+        projected, _ = cv2.projectPoints(points, rvec, tvec, mtx, None)
+        projected = projected.reshape(-1, 2) + rng.normal(0, 1.5, (len(points), 2))
+        classes = [TABLE_CORNER_CLASS] * len(TABLE_CORNERS) + [TABLE_NET_CLASS] * len(NET_POINTS)
+        boxes = np.array([[x - 10, y - 10, x + 10, y + 10, 0.8, cls] for (x, y), cls in zip(projected, classes)])
+        boxes = boxes[rng.permutation(len(boxes))]
+
+        start = time.perf_counter()
+        try:
+            calibration = calibrate_from_table(boxes, image_size)
+        except ValueError:
+            failures += 1
+            continue
+        finally:
+            elapsed += time.perf_counter() - start
+        estimated_rotation, _ = cv2.Rodrigues(calibration['rvecs'])
+        estimated_position = (-estimated_rotation.T @ calibration['tvecs']).ravel()
+        # 球台旋转 180° 对称，两种位置都正确
+        position_errors.append(min(np.linalg.norm(estimated_position - position),
+                                   np.linalg.norm(estimated_position * [-1, -1, 1] - position)))
+        focal_errors.append(abs(calibration['mtx'][0, 0] - focal) / focal)
+
+    print(f"{runs} synthetic cameras, {failures} failed, {elapsed / runs * 1e3:.2f} ms per calibration")
+    print(f"focal error: median {np.median(focal_errors) * 100:.1f}%, p95 {np.percentile(focal_errors, 95) * 100:.1f}%")
+    print(f"camera position error: median {np.median(position_errors):.1f} cm, "
+          f"p95 {np.percentile(position_errors, 95):.1f} cm")
@@ -0,0 +1,302 @@
+import queue
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from metrics import record_cache
+
+# 目标帧在当前位置之后且距离不超过该值时，顺序 grab() 比 seek 更快也更准确
+SEQUENTIAL_SEEK_LIMIT = 45
+
+
+class VideoSource:
+    """
+    视频读取组件，用于播放和拖动进度条。
+
+    - 正常播放时顺序读取，不再每帧 cap.set(CAP_PROP_POS_FRAMES)
+    - 首次打开时在后台线程建立帧索引 (每帧的时间戳和真实帧数)
+    - 随机访问时优先从 LRU 缓存中取缩小后的预览帧；未命中时，
+      近距离向前跳转用 grab()，远距离才 seek
+    """
+
+    def __init__(self, path, cache_size=240, preview_width=640, build_index=True):
+        self.path = path
+        self.cache_size = cache_size
+        self.preview_width = preview_width
+
+        self.cap = cv2.VideoCapture(path)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.position = 0  # 下一次 read() 返回的帧号
+
+        self.preview_cache = OrderedDict()
+        self.cache_lock = threading.Lock()
+
+        self.timestamps = None  # 每帧的媒体时间戳 (秒)，索引建立完成后可用
+        self.index_ready = threading.Event()
+        if build_index:
+            threading.Thread(target=self.build_index, daemon=True).start()
+
+    def isOpened(self):
+        return self.cap is not None and self.cap.isOpened()
+
+    def build_index(self):
+        """用独立的 VideoCapture 扫描一遍视频，记录每帧时间戳 (只 grab 不转换颜色)"""
+        cap = cv2.VideoCapture(self.path)
+        timestamps = []
+        while cap.grab():
+            timestamps.append(cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0)
+        cap.release()
+
+        if timestamps:
+            self.timestamps = np.array(timestamps, dtype=np.float64)
+            self.frame_count = len(timestamps)  # CAP_PROP_FRAME_COUNT 对部分 mov 文件不准确
+        self.index_ready.set()
+
+    def timestamp(self, index):
+        """返回帧的媒体时间 (秒)，索引尚未建立时按 fps 估算"""
+        if self.timestamps is not None and 0 <= index < len(self.timestamps):
+            return float(self.timestamps[index])
+        return index / self.fps
+
+    def seek(self, index):
+        index = max(0, index)
+        if index == self.position:
+            return
+        if self.position < index <= self.position + SEQUENTIAL_SEEK_LIMIT:
+            while self.position < index and self.cap.grab():
+                self.position += 1
+            return
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+        self.position = index
+
+    def read(self, index=None):
+        """
+        读取一帧全分辨率图像。
+
+        参数:
+        - index: 目标帧号，为 None 或等于当前位置时顺序读取
+
+        返回:
+        - (ret, frame)，与 cv2.VideoCapture.read() 相同
+        """
+        if index is not None:
+            self.seek(index)
+
+        ret, frame = self.cap.read()
+        if ret:
+            self.cache_preview(self.position, frame)
+            self.position += 1
+        return ret, frame
+
+    def make_preview(self, frame):
+        height, width = frame.shape[:2]
+        if self.preview_width is None or width <= self.preview_width:
+            return frame.copy()
+        preview_height = int(height * self.preview_width / width)
+        return cv2.resize(frame, (self.preview_width, preview_height), interpolation=cv2.INTER_AREA)
+
+    def cache_preview(self, index, frame):
+        preview = self.make_preview(frame)
+        with self.cache_lock:
+            self.preview_cache[index] = preview
+            self.preview_cache.move_to_end(index)
+            while len(self.preview_cache) > self.cache_size:
+                self.preview_cache.popitem(last=False)
+
+    def preview(self, index):
+        """
+        返回缩小后的预览帧 (用于拖动进度条)，缓存未命中时才解码。
+
+        注意: 未命中时会移动读取位置，之后的 read() 会从 index + 1 继续。
+        """
+        with self.cache_lock:
+            preview = self.preview_cache.get(index)
+            if preview is not None:
+                self.preview_cache.move_to_end(index)
+        record_cache('video_preview', preview is not None)
+        if preview is not None:
+            return preview
+
+        ret, frame = self.read(index)
+        if not ret:
+            return None
+        with self.cache_lock:
+            return self.preview_cache.get(index)
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+        with self.cache_lock:
+            self.preview_cache.clear()
+
+
+class PrefetchReader:
+    """
+    离线任务用的预读取解码器: 后台线程提前解码到有界的预分配帧缓冲区，解码与推理重叠进行。
+
+    - read() 返回 (ret, frame)，frame 指向内部缓冲区，下一次 read() 之前有效
+    - size=(width, height) 时在解码线程中缩小；color='rgb' 时在解码线程中转换颜色
+    - timestamp: 当前帧的媒体时间戳，可变帧率的手机视频也不依赖 fps 估算
+    - decode_seconds / wait_seconds: 解码总耗时 / 调用方实际等待的时间，两者之差即被推理掩盖的解码时间
+    """
+
+    def __init__(self, path, buffer_size=8, size=None, color='bgr'):
+        self.path = path
+        self.cap = cv2.VideoCapture(path)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.size = size
+        self.color = color
+        self.direct = size is None and color == 'bgr'
+        width = size[0] if size else int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = size[1] if size else int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+        # buffer_size 个缓冲区轮流使用: 调用方持有一个，其余由解码线程填充
+        self.buffers = np.empty((buffer_size, height, width, 3), dtype=np.uint8)
+        self.slot_timestamps = np.zeros(buffer_size, dtype=np.float64)
+        self.timestamp = None  # 最近一次 read() 返回帧的媒体时间戳 (秒)
+        self.free_slots = queue.Queue()
+        for slot in range(buffer_size):
+            self.free_slots.put(slot)
+        self.ready_slots = queue.Queue()
+        self.current_slot = None
+
+        self.decode_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.stopped = False
+        self.error = None  # 解码线程中的异常，由 read() 重新抛出
+        self.thread = threading.Thread(target=self.decode_loop, daemon=True)
+        self.thread.start()
+
+    def isOpened(self):
+        return self.cap is not None and self.cap.isOpened()
+
+    def decode_loop(self):
+        try:
+            while not self.stopped:
+                slot = self.free_slots.get()
+                if slot is None:
+                    break
+                start = time.perf_counter()
+                buffer = self.buffers[slot]
+                # 不缩放、不转换颜色时直接解码到预分配的缓冲区
+                ret, frame = self.cap.read(buffer) if self.direct else self.cap.read()
+                if ret and not np.shares_memory(frame, buffer):
+                    if frame.shape[:2] != buffer.shape[:2]:
+                        frame = cv2.resize(frame, (buffer.shape[1], buffer.shape[0]), interpolation=cv2.INTER_AREA)
+                    if self.color == 'rgb':
+                        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=buffer)
+                    else:
+                        np.copyto(buffer, frame)
+                self.decode_seconds += time.perf_counter() - start
+                if not ret:
+                    break
+                self.slot_timestamps[slot] = self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+                self.ready_slots.put(slot)
+        except Exception as e:
+            self.error = e
+        finally:
+            # 无论正常结束还是出错都发送结束标记，read() 不会永远等待
+            self.ready_slots.put(None)
+
+    def read(self):
+        if self.current_slot is not None:
+            self.free_slots.put(self.current_slot)
+            self.current_slot = None
+
+        start = time.perf_counter()
+        slot = self.ready_slots.get()
+        self.wait_seconds += time.perf_counter() - start
+        if slot is None:
+            self.ready_slots.put(None)  # 之后的 read() 也返回 False
+            if self.error is not None:
+                raise RuntimeError(f"Decoding {self.path} failed: {self.error}") from self.error
+            return False, None
+        self.current_slot = slot
+        self.timestamp = float(self.slot_timestamps[slot])
+        return True, self.buffers[slot]
+
+    def release(self):
+        self.stopped = True
+        self.free_slots.put(None)
+        self.thread.join(timeout=5)
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+
+def benchmark_prefetch(video_path, infer, max_frames=300):
+    """顺序 解码+推理 与 预读取 的对比，返回 {模式: (总耗时, 解码耗时, 等待解码的时间)}"""
+    cap = cv2.VideoCapture(video_path)
+    decode_seconds = 0.0
+    start = time.perf_counter()
+    for _ in range(max_frames):
+        decode_start = time.perf_counter()
+        ret, frame = cap.read()
+        decode_seconds += time.perf_counter() - decode_start
+        if not ret:
+            break
+        infer(frame)
+    sequential = (time.perf_counter() - start, decode_seconds, decode_seconds)
+    cap.release()
+
+    reader = PrefetchReader(video_path)
+    start = time.perf_counter()
+    for _ in range(max_frames):
+        ret, frame = reader.read()
+        if not ret:
+            break
+        infer(frame)
+    prefetch = (time.perf_counter() - start, reader.decode_seconds, reader.wait_seconds)
+    reader.release()
+    return {'sequential': sequential, 'prefetch': prefetch}
+
+
+if __name__ == "__main__":
+    # 拖动进度条响应时间测试: python video_source.py <video>
+    # 预读取测试: python video_source.py <video> --prefetch [--infer-ms 25]
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('video', nargs='?', default='../mp4/01.mov')
+    parser.add_argument('--prefetch', action='store_true')
+    parser.add_argument('--infer-ms', type=float, default=None,
+                        help="用 sleep 模拟推理耗时；不指定时使用 MediaPipe Pose")
+    args = parser.parse_args()
+    video_path = args.video
+
+    if args.prefetch:
+        if args.infer_ms is None:
+            from pose_backend import create_pose_backend
+            backend = create_pose_backend(model_complexity=0)
+            infer = lambda frame: backend.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        else:
+            infer = lambda frame: time.sleep(args.infer_ms / 1000)
+        for mode, (total, decode, wait) in benchmark_prefetch(video_path, infer).items():
+            hidden = (1 - wait / decode) * 100 if decode > 0 else 0
+            print(f"{mode:<10} total {total:6.2f} s  decode {decode:5.2f} s  "
+                  f"waiting for frames {wait:5.2f} s  decode hidden {hidden:5.1f}%")
+        sys.exit(0)
+
+    source = VideoSource(video_path)
+    source.index_ready.wait()
+    print(f"frames: {source.frame_count}, fps: {source.fps:.2f}")
+
+    rng = np.random.default_rng(0)
+    targets = rng.integers(0, source.frame_count, 50)
+    for label, frames in [("random", targets), ("repeat", targets)]:
+        durations = []
+        for index in frames:
+            start = time.time()
+            source.preview(int(index))
+            durations.append((time.time() - start) * 1000)
+        print(f"{label} scrub: p50 {np.percentile(durations, 50):.1f} ms, p95 {np.percentile(durations, 95):.1f} ms")
+    source.release()
@@ -0,0 +1,210 @@
+import cv2
+import numpy as np
+
+# 与 matplotlib 版本保持一致的格子编号顺序
+GRID_LABEL_ORDER = [
+    "L22", "L21", "L20", "L12", "L11", "L10", "L02", "L01", "L00",
+    "R00", "R01", "R02", "R10", "R11", "R12", "R20", "R21", "R22"
+]
+
+GRID_LABEL_MAP = {
+    9: "R00", 6: "R01", 3: "R02", 8: "R10", 5: "R11", 2: "R12",
+    7: "R20", 4: "R21", 1: "R22", 12: "L00", 15: "L01", 18: "L02",
+    11: "L10", 14: "L11", 17: "L12", 10: "L20", 13: "L21", 16: "L22"
+}
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)
+LIGHT_GRAY = (211, 211, 211)
+
+
+def build_heatmap_lut(norm, cmap, steps=101):
+    """
+    预先计算热力图颜色查找表，避免每次绘制都调用 cmap(norm(...))。
+
+    参数:
+    - norm: matplotlib 的 Normalize 对象 (0-100)
+    - cmap: matplotlib 的颜色映射
+    - steps: 查找表的等级数量
+
+    返回:
+    - (steps, 3) 的 uint8 RGB 数组
+    """
+    values = np.linspace(norm.vmin, norm.vmax, steps)
+    return (np.asarray(cmap(norm(values)))[:, :3] * 255).astype(np.uint8)
+
+
+def lut_color(lut, percentage):
+    idx = int(round(min(max(percentage, 0), 100) / 100 * (len(lut) - 1)))
+    return tuple(int(c) for c in lut[idx])
+
+
+def grid_label_indices():
+    """GRID_LABEL_ORDER 中每个标签对应的 chessboard_vertices 下标"""
+    label_to_idx = {label: idx - 1 for idx, label in GRID_LABEL_MAP.items()}
+    return [label_to_idx[label] for label in GRID_LABEL_ORDER]
+
+
+class GridCountChart:
+    """
+    格子命中占比的水平柱状图，直接用 OpenCV 绘制 (RGB)。
+
+    标签、坐标轴和颜色刻度只在创建时绘制一次作为背景层，之后每次 render
+    只重画数值发生变化的柱子和标题。
+    """
+
+    def __init__(self, width, height, lut, labels=GRID_LABEL_ORDER):
+        self.width = width
+        self.height = height
+        self.lut = lut
+        self.labels = list(labels)
+
+        self.title_height = 30
+        self.label_width = 40
+        self.colorbar_width = 14
+        self.colorbar_label_width = 42
+        self.value_text_width = 48
+
+        self.bar_left = self.label_width
+        self.bar_right = width - self.colorbar_width - self.colorbar_label_width - 8
+        self.bar_span = max(1, self.bar_right - self.bar_left - self.value_text_width)
+        self.row_height = (height - self.title_height - 10) / len(self.labels)
+
+        self.background = self.draw_background()
+        self.image = self.background.copy()
+        self.values = [None] * len(self.labels)
+        self.title = None
+
+    def row_top(self, idx):
+        return int(self.title_height + idx * self.row_height)
+
+    def draw_background(self):
+        background = np.full((self.height, self.width, 3), 255, dtype=np.uint8)
+
+        # 格子编号
+        for idx, label in enumerate(self.labels):
+            y = int(self.row_top(idx) + self.row_height / 2) + 4
+            cv2.putText(background, label, (4, y), FONT, 0.4, BLACK, 1, cv2.LINE_AA)
+
+        # 坐标轴
+        axis_bottom = self.row_top(len(self.labels))
+        cv2.line(background, (self.bar_left, self.title_height), (self.bar_left, axis_bottom), BLACK, 1)
+
+        # 热力刻度柱子
+        bar_top = self.title_height
+        bar_bottom = axis_bottom
+        x0 = self.width - self.colorbar_width - self.colorbar_label_width
+        for y in range(bar_top, bar_bottom):
+            percentage = (bar_bottom - y) / max(1, bar_bottom - bar_top) * 100
+            background[y, x0:x0 + self.colorbar_width] = self.lut[
+                int(round(percentage / 100 * (len(self.lut) - 1)))]
+        cv2.rectangle(background, (x0, bar_top), (x0 + self.colorbar_width, bar_bottom - 1), BLACK, 1)
+        for tick in (0, 20, 40, 60, 80, 100):
+            y = int(bar_bottom - tick / 100 * (bar_bottom - bar_top))
+            cv2.line(background, (x0 + self.colorbar_width, y), (x0 + self.colorbar_width + 3, y), BLACK, 1)
+            cv2.putText(background, f"{tick}%", (x0 + self.colorbar_width + 5, y + 4), FONT, 0.35, BLACK, 1,
+                        cv2.LINE_AA)
+
+        return background
+
+    def render(self, percentages, covered_area=None):
+        """
+        更新柱状图，返回是否有像素发生变化。
+
+        参数:
+        - percentages: 与 labels 顺序一致的占比列表 (0-100)
+        - covered_area: 覆盖面积 (m²)，为 None 时不显示标题
+        """
+        changed = False
+
+        title = f"Covered Area: {covered_area:.2f} m^2" if covered_area is not None else ""
+        if title != self.title:
+            self.image[:self.title_height] = self.background[:self.title_height]
+            if title:
+                (text_width, _), _ = cv2.getTextSize(title, FONT, 0.5, 1)
+                cv2.putText(self.image, title, ((self.width - text_width) // 2, self.title_height - 10), FONT,
+                            0.5, BLACK, 1, cv2.LINE_AA)
+            self.title = title
+            changed = True
+
+        for idx, percentage in enumerate(percentages):
+            value = round(float(percentage), 1)
+            if value == self.values[idx]:
+                continue
+
+            self.values[idx] = value
+            changed = True
+
+            top = self.row_top(idx)
+            bottom = self.row_top(idx + 1)
+            self.image[top:bottom, self.bar_left + 1:self.bar_right] = \
+                self.background[top:bottom, self.bar_left + 1:self.bar_right]
+
+            pad = max(1, int(self.row_height * 0.15))
+            bar_end = self.bar_left + int(self.bar_span * min(value, 100) / 100)
+            if bar_end > self.bar_left:
+                cv2.rectangle(self.image, (self.bar_left, top + pad), (bar_end, bottom - pad),
+                              lut_color(self.lut, value), -1)
+                cv2.rectangle(self.image, (self.bar_left, top + pad), (bar_end, bottom - pad), BLACK, 1)
+
+            cv2.putText(self.image, f"{value:.1f}%", (bar_end + 4, int((top + bottom) / 2) + 4), FONT, 0.4, BLACK,
+                        1, cv2.LINE_AA)
+
+        return changed
+
+
+class TemplateBarChart:
+    """
+    模板匹配占比图：每个模板一行 "名称: 占比%" 文字，下面是灰色底条和热力色填充条。
+
+    模板列表或尺寸变化时才重建背景层，其余情况只重画数值变化的行。
+    """
+
+    def __init__(self, width, lut, row_height=36):
+        self.width = width
+        self.lut = lut
+        self.row_height = row_height
+        self.names = None
+        self.values = []
+        self.image = None
+        self.background = None
+
+    def rebuild(self, names):
+        self.names = list(names)
+        height = max(1, len(self.names)) * self.row_height
+        self.background = np.full((height, self.width, 3), 255, dtype=np.uint8)
+        for idx in range(len(self.names)):
+            top = idx * self.row_height
+            cv2.rectangle(self.background, (0, top + self.row_height // 2),
+                          (self.width - 1, top + self.row_height - 4), LIGHT_GRAY, -1)
+        self.image = self.background.copy()
+        self.values = [None] * len(self.names)
+
+    def render(self, names, percentages):
+        """更新占比图，返回是否有像素发生变化"""
+        changed = False
+        if self.names != list(names):
+            self.rebuild(names)
+            changed = True
+
+        for idx, (name, percentage) in enumerate(zip(self.names, percentages)):
+            value = round(float(percentage), 2)
+            if value == self.values[idx]:
+                continue
+
+            self.values[idx] = value
+            changed = True
+
+            top = idx * self.row_height
+            bottom = top + self.row_height
+            self.image[top:bottom] = self.background[top:bottom]
+
+            cv2.putText(self.image, f"{name}: {value:.2f}%", (2, top + self.row_height // 2 - 4), FONT, 0.5,
+                        BLACK, 1, cv2.LINE_AA)
+            fill_width = int((self.width - 1) * min(value, 100) / 100)
+            if fill_width > 0:
+                cv2.rectangle(self.image, (0, top + self.row_height // 2), (fill_width, bottom - 4),
+                              lut_color(self.lut, value), -1)
+
+        return changed
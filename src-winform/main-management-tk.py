@@ -1,3 +1,4 @@
+import contextlib
 import os
 import sys
 import threading
@@ -12,12 +13,13 @@ import csv
 from threading import Thread
 import time
 import matplotlib.pyplot as plt
-import matplotlib.animation as animation
 
 import json
 import matplotlib.pyplot as plt
 import matplotlib.colors as mcolors
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+from chart_renderer import GridCountChart, TemplateBarChart, build_heatmap_lut, grid_label_indices
+from overlay_compositor import OverlayCompositor
 
 import warnings
 warnings.filterwarnings("ignore", category=UserWarning, module='google.protobuf.symbol_database')
@@ -25,21 +27,37 @@ warnings.filterwarnings("ignore", category=UserWarning, module='inference_feedba
 
 
 
-# Ensure the module for YOLOv10 is accessible
-yolov10_path = os.path.join('..', 'yolov10')
-sys.path.append(yolov10_path)
+# 共享组件 (src-web)
+sys.path.append(os.path.join('..', 'src-web'))
+from video_source import VideoSource
+from landmark_track import LandmarkTrack
+from pose_backend import POSE_BACKEND, LocalPose
+from pose_worker import RemotePose
 
-# Install dependencies
-os.system('pip install huggingface_hub -i https://mirrors.cloud.tencent.com/pypi/simple')
-os.system(
-    f'pip install -r {os.path.join(yolov10_path, "requirements.txt")} -i https://mirrors.cloud.tencent.com/pypi/simple')
-os.system(f'pip install -e {yolov10_path} -i https://mirrors.cloud.tencent.com/pypi/simple')
+model_file_path = os.path.join('..', 'model', 'pp_table_net.pt')
+table_model = None
 
-from ultralytics import YOLOv10
 
-# Load the YOLOv10 model
-model_file_path = os.path.join('..', 'model', 'pp_table_net.pt')
-model = YOLOv10(model_file_path)
+def get_table_model():
+    """
+    第一次使用时安装 YOLOv10 依赖并加载模型。
+    不放在模块顶层: 姿态推理进程以 spawn 方式启动，会重新导入本脚本。
+    """
+    global table_model
+    if table_model is None:
+        # Ensure the module for YOLOv10 is accessible
+        yolov10_path = os.path.join('..', 'yolov10')
+        sys.path.append(yolov10_path)
+
+        # Install dependencies
+        os.system('pip install huggingface_hub -i https://mirrors.cloud.tencent.com/pypi/simple')
+        os.system(
+            f'pip install -r {os.path.join(yolov10_path, "requirements.txt")} -i https://mirrors.cloud.tencent.com/pypi/simple')
+        os.system(f'pip install -e {yolov10_path} -i https://mirrors.cloud.tencent.com/pypi/simple')
+
+        from ultralytics import YOLOv10
+        table_model = YOLOv10(model_file_path)
+    return table_model
 
 # 增加 CSV 字段大小限制
 csv.field_size_limit(2147483647)
@@ -52,6 +70,7 @@ REAL_TABLE_HEIGHT_M = 0.76 + 0.1525  # 乒乓球台台面高加网高，单位
 REAL_TABLE_DIAGONAL_M = (REAL_TABLE_WIDTH_M ** 2 + REAL_TABLE_LENGTH_M ** 2) ** 0.5  # 乒乓球台对角线长度，单位：米
 FPS = 30  # 假设的帧率，单位：帧每秒
 NOISE_THRESHOLD = 0.0006  # 噪音阈值
+USE_POSE_WORKER = True  # 姿态推理放到独立进程 (共享内存传帧)，不与界面绘制争抢 GIL
 yolo_work = False
 
 
@@ -239,73 +258,6 @@ def calculate_chessboard_data(frame,
 
 
 
-def draw_chessboard_on_frame(frame, chessboard_data, show_overlay=False, covered_area=None, highlight_ratios=None):
-    if not show_overlay:
-        return frame
-
-    height, width, _ = frame.shape
-    output_image = frame.copy()
-
-    # 获取热力图设置
-    norm, cmap = get_heatmap_settings()
-
-    for idx, vertices in enumerate(chessboard_data['chessboard_vertices']):
-        pts = np.array([(int(pt[0] * width), int(pt[1] * height)) for pt in vertices], dtype=np.int32)
-
-        # 绘制热力图颜色
-        vertex_tuples = tuple(map(tuple, vertices))
-        if highlight_ratios and vertex_tuples in highlight_ratios:
-            color = cmap(norm(highlight_ratios[vertex_tuples]))[:3]
-            color = tuple(int(c * 255) for c in color)
-            cv2.fillPoly(output_image, [pts], color=color)
-
-        cv2.polylines(output_image, [pts], isClosed=True, color=(0, 255, 0), thickness=1)
-
-        # 绘制格子编号
-        center_x = int(np.mean([pt[0] for pt in pts]))
-        center_y = int(np.mean([pt[1] for pt in pts]))
-
-        text = str(idx + 1)  # 默认的格子编号
-        special_texts = {9: "R00", 6: "R01", 3: "R02", 8: "R10", 5: "R11", 2: "R12", 7: "R20", 4: "R21", 1: "R22",
-                         12: "L00", 15: "L01", 18: "L02", 11: "L10", 14: "L11", 17: "L12", 10: "L20", 13: "L21",
-                         16: "L22"}
-        if idx + 1 in special_texts:
-            text = special_texts[idx + 1]
-
-        cv2.putText(output_image, text, (center_x, center_y + 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-
-        # 如果高亮占比大于0，用红色边框勾勒
-        if highlight_ratios and vertex_tuples in highlight_ratios and highlight_ratios[vertex_tuples] > 0:
-            cv2.polylines(output_image, [pts], isClosed=True, color=(0, 0, 255), thickness=1)
-
-
-    if 'right_top_vertex_img' in chessboard_data and 'vertical_end_point_img' in chessboard_data:
-        right_top_vertex_img = (int(chessboard_data['right_top_vertex_img'][0] * width),
-                                int(chessboard_data['right_top_vertex_img'][1] * height))
-        vertical_end_point_img = (int(chessboard_data['vertical_end_point_img'][0] * width),
-                                  int(chessboard_data['vertical_end_point_img'][1] * height))
-        cv2.line(output_image, right_top_vertex_img, vertical_end_point_img, (255, 255, 255), 1)
-
-    if 'horizontal_start_point_img' in chessboard_data and 'horizontal_end_point_img' in chessboard_data:
-        horizontal_start_point_img = (int(chessboard_data['horizontal_start_point_img'][0] * width),
-                                      int(chessboard_data['horizontal_start_point_img'][1] * height))
-        horizontal_end_point_img = (int(chessboard_data['horizontal_end_point_img'][0] * width),
-                                    int(chessboard_data['horizontal_end_point_img'][1] * height))
-        cv2.line(output_image, horizontal_start_point_img, horizontal_end_point_img, (255, 255, 255), 1)
-
-    if 'vertical_line_1_end_img' in chessboard_data and 'vertical_line_2_end_img' in chessboard_data:
-        vertical_line_1_end_img = (int(chessboard_data['vertical_line_1_end_img'][0] * width),
-                                   int(chessboard_data['vertical_line_1_end_img'][1] * height))
-        vertical_line_2_end_img = (int(chessboard_data['vertical_line_2_end_img'][0] * width),
-                                   int(chessboard_data['vertical_line_2_end_img'][1] * height))
-        cv2.line(output_image, horizontal_start_point_img, vertical_line_1_end_img, (255, 255, 255), 1)
-        cv2.line(output_image, horizontal_end_point_img, vertical_line_2_end_img, (255, 255, 255), 1)
-
-    return output_image
-
-
-
-
 class PoseEstimation:
     def __init__(self):
         self.mp_pose = mp.solutions.pose
@@ -318,6 +270,9 @@ class PoseEstimation:
         self.current_frame = 0
         self.pingpong_class = 15
         self.cap = None
+        self.video_source = None  # 视频文件读取 (顺序读取 + 预览帧缓存)
+        self.remote_pose = None  # 姿态推理进程，整个程序只启动一次，每次播放复用
+        self.landmark_track = None  # 整段视频的关键点缓存，拖动进度条时使用
         self.TEMPLATES_FILE = 'templates.csv'
         self.dragging = False
         self.video_path = os.path.join('..', 'mp4', '01.mov')
@@ -335,6 +290,11 @@ class PoseEstimation:
         self.highlight_counts = {}  # 初始化highlight_counts
         self.large_square_width = 100.0  # 大格子的宽度（厘米）
         self.large_square_height = 75.0  # 大格子的高度（厘米）
+        self.heatmap_lut = build_heatmap_lut(*get_heatmap_settings())  # 预先计算的热力图颜色表
+        self.grid_label_indices = grid_label_indices()
+        self.grid_count_charts = {}  # 按尺寸缓存的高亮条形图
+        self.overlay_compositor = OverlayCompositor(self.heatmap_lut, border_color=(0, 0, 255))
+        self.skeleton_compositor = OverlayCompositor(self.heatmap_lut, border_color=(0, 0, 255))
 
     def reset_variables(self):
         self.previous_midpoint = None
@@ -371,82 +331,27 @@ class PoseEstimation:
 
         return covered_area
 
-    def highlight_bar_chart_vedio(self, frame, highlight_ratios, chessboard_data,covered_area):
-
-
-        # 创建一个图形对象，并设置尺寸
-        fig, ax = plt.subplots(figsize=(4, 8))  # 调整图形的尺寸，以适应在帧左侧绘制
-
-        # 将格子编号特殊化处理，并按照指定顺序排列
-        label_order = [
-            "L22", "L21", "L20", "L12", "L11", "L10", "L02", "L01", "L00",
-            "R00", "R01", "R02", "R10", "R11", "R12", "R20", "R21", "R22"
-        ]
-
-        label_map = {
-            9: "R00", 6: "R01", 3: "R02", 8: "R10", 5: "R11", 2: "R12",
-            7: "R20", 4: "R21", 1: "R22", 12: "L00", 15: "L01", 18: "L02",
-            11: "L10", 14: "L11", 17: "L12", 10: "L20", 13: "L21", 16: "L22"
-        }
-
-        # 提取高亮占比数据并按照指定顺序排列
-        percentages = [highlight_ratios.get(tuple(map(tuple, chessboard_data['chessboard_vertices'][idx - 1])), 0) for
-                       label in label_order for idx, val in label_map.items() if val == label]
-
-        # 创建热力图颜色映射
-        norm, cmap = get_heatmap_settings()
-
-
-        # 绘制水平柱状图
-        bars = ax.barh(label_order, percentages, color=cmap(norm(percentages)), edgecolor='black')
-        # 在每个条形图后面显示百分比数值
-        for bar, percentage in zip(bars, percentages):
-            width = bar.get_width()
-            ax.text(width + 1, bar.get_y() + bar.get_height() / 2, f'{percentage:.1f}%', va='center', ha='left')
-
-        # 设置X轴为百分比
-        ax.set_xlim(0, 100)
-        ax.set_xlabel('')
-
-        # 添加图表标题
-        ax.set_title(f'Covered Area: {covered_area}m²', fontsize=16)
+    def get_grid_count_chart(self, width, height):
+        key = (width, height)
+        if key not in self.grid_count_charts:
+            self.grid_count_charts[key] = GridCountChart(width, height, self.heatmap_lut)
+        return self.grid_count_charts[key]
 
-        # 添加热力刻度柱子
-        sm = plt.cm.ScalarMappable(cmap=cmap, norm=norm)
-        sm.set_array([])
-        cbar = plt.colorbar(sm, ax=ax)
-        cbar.set_ticks([0, 20, 40, 60, 80, 100])
-        cbar.set_ticklabels(['0%', '20%', '40%', '60%', '80%', '100%'])
+    def grid_count_percentages(self, highlight_ratios, chessboard_data):
+        # 按指定顺序提取高亮占比数据
+        vertices = chessboard_data['chessboard_vertices']
+        return [highlight_ratios.get(tuple(map(tuple, vertices[idx])), 0) for idx in self.grid_label_indices]
 
-        # 将图表绘制到一个 numpy 数组
-        fig.canvas.draw()
-        chart_img = np.frombuffer(fig.canvas.buffer_rgba(), dtype=np.uint8)
-        chart_img = chart_img.reshape(fig.canvas.get_width_height()[::-1] + (4,))
-
-        # 关闭图形对象，释放资源
-        plt.close(fig)
-        # 去掉alpha通道
-        chart_img = chart_img[..., :3]
-
-        # 将PIL图像转换回OpenCV图像
+    def highlight_bar_chart_vedio(self, frame, highlight_ratios, chessboard_data,covered_area):
         frame = np.array(frame)
-        frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
-
-        # 将图表添加到视频帧的左侧 1/3 区域
-        chart_height, chart_width, _ = chart_img.shape
         frame_height, frame_width, _ = frame.shape
 
-        # 确保图表和帧的高度一致，并调整图表宽度
-        chart_img_resized = cv2.resize(chart_img, (frame_width // 6, frame_height))
-
-        # 将图表添加到帧的左侧
-        frame[:, :frame_width // 6] = chart_img_resized
+        # 将图表添加到视频帧的左侧 1/6 区域，只重画变化的柱子
+        chart = self.get_grid_count_chart(frame_width // 6, frame_height)
+        chart.render(self.grid_count_percentages(highlight_ratios, chessboard_data), covered_area)
+        frame[:, :chart.width] = chart.image
 
-        # 将OpenCV图像转换回PIL图像
-        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        frame = Image.fromarray(frame)
-
-        return frame
+        return Image.fromarray(frame)
 
     def draw_skeleton(self, image, keypoints, connections, color, circle_radius=2):
 
@@ -679,12 +584,9 @@ class PoseEstimation:
                 'vertical_line_2_end_img': self.red_cross_coords.get("vertical_line_2_end_img", (0, 0))
 
             }
-            output_image = draw_chessboard_on_frame(frame, chessboard_data, show_overlay=self.show_overlay)
         else:
             try:
                 chessboard_data = calculate_chessboard_data(frame=frame)
-                output_image = draw_chessboard_on_frame(frame=frame, chessboard_data=chessboard_data,
-                                                        show_overlay=self.show_overlay)
                 self.grid_rects = chessboard_data['chessboard_vertices']
                 self.camera_params = (
                 chessboard_data['mtx'], chessboard_data['dist'], chessboard_data['rvecs'], chessboard_data['tvecs'])
@@ -713,8 +615,11 @@ class PoseEstimation:
                 chessboard_data = None
 
 
-        if chessboard_data:
-            output_image = draw_chessboard_on_frame(frame, chessboard_data, show_overlay=self.show_overlay)
+        if chessboard_data and self.show_overlay:
+            # 静态格子层只在标定变化时重建，输出写入预分配缓冲区 (后面 cvtColor 会复制)
+            output_image = self.overlay_compositor.compose(frame, chessboard_data)
+        elif chessboard_data:
+            output_image = frame
         else:
             output_image = frame.copy()
 
@@ -805,7 +710,7 @@ class PoseEstimation:
 
         # YOLOv10 inference for ping pong table detection
         if yolo_work:
-            table_results = model.predict(frame)
+            table_results = get_table_model().predict(frame)
             label_map = {
                 0: 'dog', 1: 'person', 2: 'cat', 3: 'tv', 4: 'car', 5: 'meatballs', 6: 'marinara sauce',
                 7: 'tomato soup', 8: 'chicken noodle soup', 9: 'french onion soup', 10: 'chicken breast',
@@ -912,21 +817,34 @@ class PoseEstimation:
         self.new_frame = False
         self.frame_to_show = None
 
-        cap = cv2.VideoCapture(self.video_path)
+        if self.video_source is not None:
+            self.video_source.release()
+        # 播放结束后保留 video_source，拖动进度条仍可使用预览缓存
+        self.video_source = VideoSource(self.video_path)
+        if self.landmark_track is not None:
+            self.landmark_track.stop()
+        self.landmark_track = LandmarkTrack(self.video_path)
+        self.landmark_track.start()  # 后台计算整段视频的关键点
         self.keypoints_data = []
-        self.video_length = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.video_length = self.video_source.frame_count
         self.current_frame = 0
         self.video_playing = True
         self.start_time = time.time()
 
-        with self.mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as pose:
-            while cap.isOpened() and self.video_playing:
-                if not self.dragging:
-                    cap.set(cv2.CAP_PROP_POS_FRAMES, self.current_frame)
-                ret, frame = cap.read()
+        if USE_POSE_WORKER:
+            if self.remote_pose is None:
+                self.remote_pose = RemotePose(POSE_BACKEND, min_detection_confidence=0.5, min_tracking_confidence=0.5)
+            pose_context = contextlib.nullcontext(self.remote_pose)
+        else:
+            pose_context = LocalPose(POSE_BACKEND, min_detection_confidence=0.5, min_tracking_confidence=0.5)
+        with pose_context as pose:
+            while self.video_source.isOpened() and self.video_playing:
+                # 顺序播放时不再 seek，只有拖动后 current_frame 跳变时才会定位
+                ret, frame = self.video_source.read(None if self.dragging else self.current_frame)
                 if not ret:
                     break
 
+                self.video_length = self.video_source.frame_count  # 帧索引建立后会更新为真实帧数
                 if not self.dragging:
                     self.current_frame += 1
                 image = self.process_video(frame, pose)
@@ -936,7 +854,6 @@ class PoseEstimation:
                 root.update()
 
         self.video_playing = False
-        cap.release()
         cv2.destroyAllWindows()
 
     def is_point_in_quad(self, point, quad):
@@ -990,7 +907,6 @@ class PoseEstimation:
         placeholder_image = Image.new("RGB", (image_width, image_height), (255, 255, 255))
         skeleton_image_tk = ImageTk.PhotoImage(placeholder_image)
 
-        skeleton_canvas = np.zeros((image_height, image_width, 3), dtype=np.uint8)
         color = (0, 255, 0) if any(any(match_results[category].values()) for category in match_results) else (
         255, 255, 255)
 
@@ -1022,18 +938,9 @@ class PoseEstimation:
                 highlight_ratios[cell_points_tuple] = self.highlight_counts.get(cell_points_tuple,
                                                                                 0) / total_highlights * 100
 
-        # 绘制棋盘格
-        skeleton_canvas = draw_chessboard_on_frame(skeleton_canvas, chessboard_data, show_overlay=True,
-                                                   covered_area=self.covered_area, highlight_ratios=highlight_ratios)
-
-        # 画红色高亮范围边框
-        if highlight_ratios:
-            for idx, vertices in enumerate(chessboard_data['chessboard_vertices']):
-                vertex_tuples = tuple(map(tuple, vertices))
-                if highlight_ratios[vertex_tuples] > 0:
-                    pts = np.array([(int(pt[0] * image_width), int(pt[1] * image_height)) for pt in vertices],
-                                   dtype=np.int32)
-                    cv2.polylines(skeleton_canvas, [pts], isClosed=True, color=(0, 0, 255), thickness=1)
+        # 绘制棋盘格 (预渲染的静态层 + 热力图，被踩过的格子带红框)
+        skeleton_canvas = self.skeleton_compositor.canvas(image_width, image_height, chessboard_data,
+                                                          highlight_ratios=highlight_ratios)
 
         # 仅在Arm模板命中时高亮脚踩到的格子
         if any(match_results["Arm"].values()):
@@ -1071,94 +978,16 @@ class PoseEstimation:
 
     def highlight_bar_chart_ske(self, image, highlight_ratios, chessboard_data,  chart_width,
                                 chart_height):
-        # 增加图表宽度一半
-        increased_chart_width = chart_width * 1.5
         covered_area = self.calculate_covered_area(highlight_ratios)
 
-        # 创建一个图形对象，并设置尺寸
-        fig, ax = plt.subplots(figsize=(increased_chart_width / 100, chart_height / 100), dpi=100)  # 调整图形的尺寸，以适应在帧左侧绘制
-
-        # 将格子编号特殊化处理，并按照指定顺序排列
-        label_order = [
-            "L22", "L21", "L20", "L12", "L11", "L10", "L02", "L01", "L00",
-            "R00", "R01", "R02", "R10", "R11", "R12", "R20", "R21", "R22"
-        ]
-
-        label_map = {
-            9: "R00", 6: "R01", 3: "R02", 8: "R10", 5: "R11", 2: "R12",
-            7: "R20", 4: "R21", 1: "R22", 12: "L00", 15: "L01", 18: "L02",
-            11: "L10", 14: "L11", 17: "L12", 10: "L20", 13: "L21", 16: "L22"
-        }
-
-        # 提取高亮占比数据并按照指定顺序排列
-        percentages = [highlight_ratios.get(tuple(map(tuple, chessboard_data['chessboard_vertices'][idx - 1])), 0) for
-                       label in label_order for idx, val in label_map.items() if val == label]
-
-        # 创建热力图颜色映射
-        norm, cmap = get_heatmap_settings()
-
-        # 绘制水平柱状图
-        bars = ax.barh(label_order, percentages, color=cmap(norm(percentages)), edgecolor='black')
-        # 在每个条形图后面显示百分比数值
-        for bar, percentage in zip(bars, percentages):
-            width = bar.get_width()
-            ax.text(width + 1, bar.get_y() + bar.get_height() / 2, f'{percentage:.1f}%', va='center', ha='left')
-
-        # 设置X轴为百分比
-        ax.set_xlim(0, 100)
-        ax.set_xlabel('')
-
-        # 添加图表标题
-        #ax.set_title(f'Covered Area: {covered_area:.2f} m²', fontsize=16, color='red', loc='center', pad=20)
-        # 使用 ax.annotate 方法添加图表标题，并增加标题和图之间的距离
-        ax.annotate(f'Covered Area: {covered_area:.2f} m²', xy=(0.5, 1.05), xycoords='axes fraction', fontsize=16,
-                     ha='center')
-
-        # 添加热力刻度柱子，并将其放在图形的右侧
-        sm = plt.cm.ScalarMappable(cmap=cmap, norm=norm)
-        sm.set_array([])
-        cbar = plt.colorbar(sm, ax=ax, pad=0.04,aspect=30)  # 调整 fraction 和 pad 参数以控制位置
-        cbar.set_ticks([0, 20, 40, 60, 80, 100])
-        cbar.set_ticklabels(['0%', '20%', '40%', '60%', '80%', '100%'])
-        cbar.ax.yaxis.set_ticks_position('right')
-        cbar.ax.yaxis.set_label_position('right')
-        cbar.ax.set_yticklabels(cbar.ax.get_yticklabels(), rotation=0)
-
-        # 手动调整子图参数，确保图表不会被裁剪
-        plt.subplots_adjust(left=0.15, right=0.85, top=0.9, bottom=0.1)
-
-        # 将图表绘制到一个 numpy 数组
-        fig.canvas.draw()
-        chart_img = np.frombuffer(fig.canvas.buffer_rgba(), dtype=np.uint8)
-        chart_img = chart_img.reshape(fig.canvas.get_width_height()[::-1] + (4,))
-
-        # 关闭图形对象，释放资源
-        plt.close(fig)
-
-        # 确保 chart_img 非空
-        if chart_img.size == 0:
-            return image
-
-        # 去掉alpha通道
-        chart_img = chart_img[..., :3]
-
-        # 将PIL图像转换回OpenCV图像
         frame = np.array(image)
-        frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
-
-        # 确保图表和帧的高度一致，并调整图表宽度
-        chart_img_resized = cv2.resize(chart_img, (int(chart_width * 1.5), chart_height))
-
-        # 将图表添加到帧的左侧
-        frame[:, :int(chart_width * 1.5)] = chart_img_resized
-
-        # 将OpenCV图像转换回PIL图像
-        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        frame = Image.fromarray(frame)
-
-        return frame
 
+        # 增加图表宽度一半，添加到帧的左侧
+        chart = self.get_grid_count_chart(int(chart_width * 1.5), chart_height)
+        chart.render(self.grid_count_percentages(highlight_ratios, chessboard_data), covered_area)
+        frame[:, :chart.width] = chart.image
 
+        return Image.fromarray(frame)
 
     def update_progress_bar(self):
         if self.video_length > 0:
@@ -1178,6 +1007,11 @@ class PoseEstimation:
             self.cap.release()
             self.cap = None
 
+    def close_pose_worker(self):
+        if self.remote_pose is not None:
+            self.remote_pose.close()
+            self.remote_pose = None
+
     def save_chessboard_pattern(self, chessboard_params, grid_rects, red_cross_coords, camera_params):
         config = {
             "chessboard_params": chessboard_params,
@@ -1222,6 +1056,7 @@ class PoseApp:
         self.pose_estimation.app = self  # 将 PoseApp 实例赋值给 PoseEstimation 的 app 属性
         self.current_layout = 1  # 初始化布局为第一种
         self.norm, self.cmap = self.get_custom_heatmap_settings()
+        self.heatmap_lut = build_heatmap_lut(self.norm, self.cmap)
         self.first_data_update = True
         self.temp_templates = {}
         # start with real_time
@@ -1407,22 +1242,15 @@ class PoseApp:
             self.data_panel_controls[category] = {
                 'frame': frame,
                 'title_label': tk.Label(frame),
-                'canvas': None,
-                'axes': None,
-                'bars': None,
-                'fig': None,  # Initialize as None,
-                'count_text': None
+                'chart_label': tk.Label(frame, bg="white"),
+                'chart': None,  # Created once the frame has a width
             }
             self.data_memory[category] = {
                 'template_names': [],
                 'match_percentages': []
             }
             self.data_panel_controls[category]['title_label'].pack()
-
-            # Set fig and ax to None initially
-            self.data_panel_controls[category]['fig'] = None
-            self.data_panel_controls[category]['axes'] = None
-
+            self.data_panel_controls[category]['chart_label'].pack(fill="both", expand=True)
 
     def init_speed_stats_panel_controls(self, panel):
         self.speed_stats_memory = {
@@ -1490,50 +1318,9 @@ class PoseApp:
             self.first_data_update = False
         else:
             self.update_data_plots()  # 立即更新显示
-            self.root.after(10000, self.schedule_data_update)  # 10秒后再次更新
-
-    def update_bar_chart(self, frame, ax, data, colors, norm, cmap):
-        bar_width = 0.7
-
-        # Add extra positions for text between bars
-        extended_positions = []
-        text_positions = []
-
-        for i in range(len(data['template_names'])):
-            text_positions.append(i * 2)  # Reduce the gap
-            extended_positions.append(data['template_names'][i])
-            extended_positions.append('')
-
-        # Clear existing bars and text
-        ax.clear()
-
-        # Bar chart for match percentages with black border
-        ax.barh([pos - bar_width * 0.9 for pos in text_positions], [100] * len(text_positions), height=bar_width,
-                color='lightgray')
-        bars = ax.barh(text_positions, data['match_percentages'], height=bar_width, color=colors)
-
-        ax.set_xlim(0, 100)
-
-        # Add match percentage as text at the bar positions
-        for i, (bar, percentage) in enumerate(zip(bars, data['match_percentages'])):
-            text_str = f'{data["template_names"][i]}: {percentage:.2f}%'
-            text_color = 'green' if data["template_names"][i] in data["match_percentages"] else 'black'
-            y = bar.get_y() + bar_width  # Move the text and bar chart down
-            ax.text(0, y - bar_width * 0.2, text_str, va='center', ha='left', color=text_color, fontsize=12)
-            bar.set_y(y - bar_width * 1.9)  # Adjust the position of the bar chart
-
-        # Remove labels, ticks, and title
-        ax.set_yticks([])
-        ax.set_xticks([])
-
-        # Remove borders
-        for spine in ax.spines.values():
-            spine.set_visible(False)
+            self.root.after(1000, self.schedule_data_update)  # 1秒后再次更新，只重画变化的行
 
     def update_data_plots(self):
-        norm = self.norm
-        cmap = self.cmap
-
         for category, data in self.data_memory.items():
             if category not in self.data_panel_controls:
                 continue
@@ -1541,40 +1328,23 @@ class PoseApp:
             if not data['template_names']:  # Skip if there's no data to plot
                 continue
 
-            # Clear the existing figure and axes
-            if self.data_panel_controls[category]['fig'] is not None:
-                plt.close(self.data_panel_controls[category]['fig'])
-                self.data_panel_controls[category]['fig'] = None
-                self.data_panel_controls[category]['axes'] = None
-                self.data_panel_controls[category]['canvas'].get_tk_widget().destroy()
-                self.data_panel_controls[category]['canvas'] = None
-
-            # Create the figure and axes
-            fig, ax = plt.subplots(figsize=(10, len(data['template_names']) * 0.4))
-            self.data_panel_controls[category]['fig'] = fig
-            self.data_panel_controls[category]['axes'] = ax
-
-            colors = [cmap(norm(percentage)) for percentage in data['match_percentages']]
-
-            # 使用 animation.FuncAnimation 来优化图表更新
-            ani = animation.FuncAnimation(fig, self.update_bar_chart, fargs=(ax, data, colors, norm, cmap),
-                                          interval=1000, repeat=False, cache_frame_data=False)
-
-            # Add bar chart to Tkinter frame
-            canvas = FigureCanvasTkAgg(fig, master=self.data_panel_controls[category]['frame'])
-            self.data_panel_controls[category]['canvas'] = canvas
-            self.data_panel_controls[category]['canvas'].draw()
-            self.data_panel_controls[category]['canvas'].get_tk_widget().pack(fill="both", expand=True)
-
-            # Update the title label only if it has changed
-            title_label = self.data_panel_controls[category]['title_label']
-            count_text = data['count_text']
-            title_label.config(text=count_text, font=("Arial", 12))  # Set font to match subplot text
+            controls = self.data_panel_controls[category]
+            chart_width = controls['frame'].winfo_width()
+            if chart_width <= 1:
+                continue  # Frame is not laid out yet
+
+            # Rebuild the cached chart only when the panel is resized
+            if controls['chart'] is None or controls['chart'].width != chart_width:
+                controls['chart'] = TemplateBarChart(chart_width, self.heatmap_lut)
 
-            self.data_panel_controls[category]['frame'].update_idletasks()
+            if controls['chart'].render(data['template_names'], data['match_percentages']):
+                chart_image = ImageTk.PhotoImage(Image.fromarray(controls['chart'].image))
+                controls['chart_label'].config(image=chart_image)
+                controls['chart_label'].image = chart_image
 
-        #self.root.update_idletasks()  # 刷新界面
-        #self.root.update()
+            # Update the title label
+            title_label = controls['title_label']
+            title_label.config(text=data['count_text'], font=("Arial", 12))  # Set font to match subplot text
 
     def schedule_speed_stats_update(self):
         self.update_speed_stats()  # 立即更新数据
@@ -1618,6 +1388,7 @@ class PoseApp:
     def on_key_press(self, event):
         if event.keysym == 'Escape':
             self.pose_estimation.close_camera()
+            self.pose_estimation.close_pose_worker()
             self.root.destroy()
             cv2.destroyAllWindows()
         elif event.keysym == 'a':
@@ -1710,8 +1481,7 @@ class PoseApp:
         if self.mode == "real_time":
             ret, frame = self.pose_estimation.cap.read()
             if ret:
-                with self.pose_estimation.mp_pose.Pose(min_detection_confidence=0.5,
-                                                       min_tracking_confidence=0.5) as pose:
+                with LocalPose(POSE_BACKEND, min_detection_confidence=0.5, min_tracking_confidence=0.5) as pose:
                     image = self.pose_estimation.process_video(frame, pose)
                     self.pose_estimation.update_video_panel(image, video_panel)
 
@@ -1731,14 +1501,23 @@ class PoseApp:
         self.pose_estimation.dragging = False
 
     def update_video_to_frame(self, frame_number):
-        cap = cv2.VideoCapture(self.pose_estimation.video_path)
-        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
-        ret, frame = cap.read()
-        if ret:
-            with self.pose_estimation.mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as pose:
-                image = self.pose_estimation.process_video(frame, pose)
-                self.pose_estimation.update_video_panel(image, video_panel)
-        cap.release()
+        video_source = self.pose_estimation.video_source
+        if video_source is None or not video_source.isOpened():
+            return
+
+        # 拖动时直接显示缓存的缩小预览帧，不再每次重新打开视频
+        preview = video_source.preview(frame_number)
+        if preview is not None:
+            image = cv2.cvtColor(preview, cv2.COLOR_BGR2RGB)
+
+            # 骨骼直接取自预先计算的关键点缓存，不再推理
+            landmark_track = self.pose_estimation.landmark_track
+            keypoints = landmark_track.keypoints(frame_number) if landmark_track is not None else None
+            if keypoints:
+                self.pose_estimation.draw_skeleton(image, keypoints, self.pose_estimation.mp_pose.POSE_CONNECTIONS,
+                                                   (255, 255, 255))
+
+            self.pose_estimation.update_video_panel(Image.fromarray(image), video_panel)
 
 
 class TemplateInputDialog:
@@ -1781,3 +1560,4 @@ if __name__ == "__main__":
     pose_estimation = PoseEstimation()
     app = PoseApp(root, pose_estimation)
     root.mainloop()
+    pose_estimation.close_pose_worker()
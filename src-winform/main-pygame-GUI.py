@@ -1,3 +1,4 @@
+import contextlib
 import os
 import sys
 import threading
@@ -10,11 +11,20 @@ import numpy as np
 import csv
 # from threading import Thread
 import time
+from collections import deque
 
 import json
 import matplotlib.pyplot as plt
 import matplotlib.colors as mcolors
 
+from chart_renderer import GridCountChart, build_heatmap_lut, grid_label_indices, lut_color
+from overlay_compositor import OverlayCompositor
+
+# 共享组件 (src-web)
+sys.path.append(os.path.join('..', 'src-web'))
+from pose_backend import POSE_BACKEND, LocalPose
+from pose_worker import RemotePose
+
 import certifi
 
 os.environ['SSL_CERT_FILE'] = certifi.where()
@@ -24,27 +34,32 @@ import warnings
 warnings.filterwarnings("ignore", category=UserWarning, module='google.protobuf.symbol_database')
 warnings.filterwarnings("ignore", category=UserWarning, module='inference_feedback_manager')
 
-SETUP_YOLOV10 = False
-try:
-    from ultralytics import YOLOv10 as YOLO
-except ImportError:
-    print("YOLOv10 not found, setting up YOLOv10...")
-    SETUP_YOLOV10 = True
-
-if SETUP_YOLOV10:
-    # Ensure the module for YOLOv10 is accessible
-    yolov10_path = os.path.join('..', 'yolov10')
-    sys.path.append(yolov10_path)
-    # Install dependencies
-    os.system('pip install huggingface_hub -i https://mirrors.cloud.tencent.com/pypi/simple')
-    os.system(
-        f'pip install -r {os.path.join(yolov10_path, "requirements.txt")} -i https://mirrors.cloud.tencent.com/pypi/simple')
-    os.system(f'pip install -e {yolov10_path} -i https://mirrors.cloud.tencent.com/pypi/simple')
-    from ultralytics import YOLOv10 as YOLO
-
-# Load the YOLO model
 model_file_path = os.path.join('..', 'model', 'pp_table_net.pt')
-model = YOLO(model_file_path)
+table_model = None
+
+
+def get_table_model():
+    """
+    第一次使用时加载 YOLO 模型 (没有 YOLOv10 时先安装)。
+    不放在模块顶层: 姿态推理进程以 spawn 方式启动，会重新导入本脚本。
+    """
+    global table_model
+    if table_model is None:
+        try:
+            from ultralytics import YOLOv10 as YOLO
+        except ImportError:
+            print("YOLOv10 not found, setting up YOLOv10...")
+            # Ensure the module for YOLOv10 is accessible
+            yolov10_path = os.path.join('..', 'yolov10')
+            sys.path.append(yolov10_path)
+            # Install dependencies
+            os.system('pip install huggingface_hub -i https://mirrors.cloud.tencent.com/pypi/simple')
+            os.system(
+                f'pip install -r {os.path.join(yolov10_path, "requirements.txt")} -i https://mirrors.cloud.tencent.com/pypi/simple')
+            os.system(f'pip install -e {yolov10_path} -i https://mirrors.cloud.tencent.com/pypi/simple')
+            from ultralytics import YOLOv10 as YOLO
+        table_model = YOLO(model_file_path)
+    return table_model
 
 # 增加 CSV 字段大小限制
 csv.field_size_limit(2147483647)
@@ -61,6 +76,9 @@ yolo_work = False
 SYS_TITLE = "Statistics of Footwork & Arm Swings of Table Tennis"
 GOLDEN_RATIO = 1.618
 DEBUG = True
+FRAME_READY_EVENT = pygame.USEREVENT + 1  # 分析线程产出新帧时投递的自定义事件
+LATENCY_REPORT_INTERVAL = 5.0  # 采集到显示延迟的统计输出间隔，单位：秒
+USE_POSE_WORKER = True  # 姿态推理放到独立进程 (共享内存传帧)，不与界面绘制争抢 GIL
 
 
 def calculate_calories_burned(met, weight_kg, duration_minutes):
@@ -289,70 +307,6 @@ def calculate_chessboard_data(frame,
     return chessboard_data
 
 
-def draw_chessboard_on_frame(frame, chessboard_data, show_overlay=False, covered_area=None, highlight_ratios=None):
-    if not show_overlay:
-        return frame
-
-    height, width, _ = frame.shape
-    output_image = frame.copy()
-
-    # 获取热力图设置
-    norm, cmap = get_heatmap_settings()
-
-    for idx, vertices in enumerate(chessboard_data['chessboard_vertices']):
-        pts = np.array([(int(pt[0] * width), int(pt[1] * height)) for pt in vertices], dtype=np.int32)
-
-        # 绘制热力图颜色
-        vertex_tuples = tuple(map(tuple, vertices))
-        if highlight_ratios and vertex_tuples in highlight_ratios:
-            color = cmap(norm(highlight_ratios[vertex_tuples]))[:3]
-            color = tuple(int(c * 255) for c in color)
-            cv2.fillPoly(output_image, [pts], color=color)
-
-        cv2.polylines(output_image, [pts], isClosed=True, color=(0, 255, 0), thickness=1)
-
-        # 绘制格子编号
-        center_x = int(np.mean([pt[0] for pt in pts]))
-        center_y = int(np.mean([pt[1] for pt in pts]))
-
-        text = str(idx + 1)  # 默认的格子编号
-        special_texts = {9: "R00", 6: "R01", 3: "R02", 8: "R10", 5: "R11", 2: "R12", 7: "R20", 4: "R21", 1: "R22",
-                         12: "L00", 15: "L01", 18: "L02", 11: "L10", 14: "L11", 17: "L12", 10: "L20", 13: "L21",
-                         16: "L22"}
-        if idx + 1 in special_texts:
-            text = special_texts[idx + 1]
-
-        cv2.putText(output_image, text, (center_x, center_y + 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-
-        # 如果高亮占比大于0，用红色边框勾勒
-        if highlight_ratios and vertex_tuples in highlight_ratios and highlight_ratios[vertex_tuples] > 0:
-            cv2.polylines(output_image, [pts], isClosed=True, color=(255, 0, 0), thickness=1)
-
-    if 'right_top_vertex_img' in chessboard_data and 'vertical_end_point_img' in chessboard_data:
-        right_top_vertex_img = (int(chessboard_data['right_top_vertex_img'][0] * width),
-                                int(chessboard_data['right_top_vertex_img'][1] * height))
-        vertical_end_point_img = (int(chessboard_data['vertical_end_point_img'][0] * width),
-                                  int(chessboard_data['vertical_end_point_img'][1] * height))
-        cv2.line(output_image, right_top_vertex_img, vertical_end_point_img, (255, 255, 255), 1)
-
-    if 'horizontal_start_point_img' in chessboard_data and 'horizontal_end_point_img' in chessboard_data:
-        horizontal_start_point_img = (int(chessboard_data['horizontal_start_point_img'][0] * width),
-                                      int(chessboard_data['horizontal_start_point_img'][1] * height))
-        horizontal_end_point_img = (int(chessboard_data['horizontal_end_point_img'][0] * width),
-                                    int(chessboard_data['horizontal_end_point_img'][1] * height))
-        cv2.line(output_image, horizontal_start_point_img, horizontal_end_point_img, (255, 255, 255), 1)
-
-    if 'vertical_line_1_end_img' in chessboard_data and 'vertical_line_2_end_img' in chessboard_data:
-        vertical_line_1_end_img = (int(chessboard_data['vertical_line_1_end_img'][0] * width),
-                                   int(chessboard_data['vertical_line_1_end_img'][1] * height))
-        vertical_line_2_end_img = (int(chessboard_data['vertical_line_2_end_img'][0] * width),
-                                   int(chessboard_data['vertical_line_2_end_img'][1] * height))
-        cv2.line(output_image, horizontal_start_point_img, vertical_line_1_end_img, (255, 255, 255), 1)
-        cv2.line(output_image, horizontal_end_point_img, vertical_line_2_end_img, (255, 255, 255), 1)
-
-    return output_image
-
-
 class PoseEstimation:
     def __init__(self):
         self.mp_pose = mp.solutions.pose
@@ -365,6 +319,7 @@ class PoseEstimation:
         self.current_frame = 0
         self.pingpong_class = 15
         self.cap = None
+        self.remote_pose = None  # 姿态推理进程，整个程序只启动一次，每次播放复用
         self.TEMPLATES_FILE = 'templates.csv'
         self.video_path = os.path.join('..', 'mp4', '01.mov')
         self.load_templates_from_csv()
@@ -381,6 +336,9 @@ class PoseEstimation:
         self.highlight_counts = {}  # 初始化highlight_counts
         self.large_square_width = 100.0  # 大格子的宽度（厘米）
         self.large_square_height = 75.0  # 大格子的高度（厘米）
+        overlay_lut = build_heatmap_lut(*get_heatmap_settings())
+        self.overlay_compositor = OverlayCompositor(overlay_lut, buffer_count=3)  # 视频帧: 队列 + 显示 + 正在处理
+        self.skeleton_compositor = OverlayCompositor(overlay_lut)
         self.cap = None
         self.fps = 0
         self.delay = 0
@@ -671,7 +629,7 @@ class PoseEstimation:
 
         # YOLO inference for ping pong table detection
         if yolo_work:
-            detected_objects = self.detect_pingpong_table(frame, model)
+            detected_objects = self.detect_pingpong_table(frame, get_table_model())
             for (center_x, center_y, coord_text) in detected_objects:
                 cv2.circle(output_image, (center_x, center_y), 5, (0, 255, 0), -1)
                 cv2.putText(output_image, coord_text, (center_x + 10, center_y), cv2.FONT_HERSHEY_SIMPLEX, 0.5,
@@ -764,12 +722,11 @@ class PoseEstimation:
                 'vertical_line_1_end_img': self.red_cross_coords.get("vertical_line_1_end_img", (0, 0)),
                 'vertical_line_2_end_img': self.red_cross_coords.get("vertical_line_2_end_img", (0, 0))
             }
-            output_image = draw_chessboard_on_frame(frame, chessboard_data, show_overlay=self.show_overlay)
+            output_image = self.compose_overlay(frame, chessboard_data)
         else:
             try:
                 chessboard_data = calculate_chessboard_data(frame=frame)
-                output_image = draw_chessboard_on_frame(frame=frame, chessboard_data=chessboard_data,
-                                                        show_overlay=self.show_overlay)
+                output_image = self.compose_overlay(frame, chessboard_data)
                 self.grid_rects = chessboard_data['chessboard_vertices']
                 self.camera_params = (
                     chessboard_data['mtx'], chessboard_data['dist'], chessboard_data['rvecs'], chessboard_data['tvecs'])
@@ -799,6 +756,11 @@ class PoseEstimation:
 
         return chessboard_data, output_image
 
+    def compose_overlay(self, frame, chessboard_data):
+        if not self.show_overlay:
+            return frame
+        return self.overlay_compositor.compose(frame, chessboard_data)
+
     def process_keypoints_and_speed(self, landmarks):
         keypoints = [(lm.x, lm.y, lm.z) for lm in landmarks]
 
@@ -931,11 +893,20 @@ class PoseEstimation:
         self.start_time = time.time()
         self.frame_count = 0
 
-        with self.mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5, model_complexity=0) as pose:
+        if USE_POSE_WORKER:
+            if self.remote_pose is None:
+                self.remote_pose = RemotePose(POSE_BACKEND, min_detection_confidence=0.5, min_tracking_confidence=0.5,
+                                              model_complexity=0)
+            pose_context = contextlib.nullcontext(self.remote_pose)
+        else:
+            pose_context = LocalPose(POSE_BACKEND, min_detection_confidence=0.5, min_tracking_confidence=0.5,
+                                     model_complexity=0)
+        with pose_context as pose:
             while self.cap.isOpened() and self.video_playing:
                 start_time = time.time()
                 ret, frame = self.cap.read()
-                time_read = time.time() - start_time
+                capture_time = time.time()  # 帧离开解码器/摄像头的时刻，用于计算采集到显示的延迟
+                time_read = capture_time - start_time
 
                 if not ret:
                     break
@@ -944,8 +915,9 @@ class PoseEstimation:
                 image = self.process_video(frame, pose)
                 time_process_video = time.time() - start_time
 
-                # 将图像和处理结果放入队列
-                queue.put(image)
+                # 将图像和采集时间放入队列，并唤醒主循环
+                queue.put((image, capture_time))
+                pygame.event.post(pygame.event.Event(FRAME_READY_EVENT))
 
                 self.frame_count += 1
                 elapsed_time = (time.time() - self.start_time) * 1000  # 转换为毫秒
@@ -1003,8 +975,6 @@ class PoseEstimation:
             screen_height = self.app.layout['region3']['height']
             screen_width = self.app.layout['region3']['width']
 
-        skeleton_canvas = np.zeros((screen_height, screen_width, 3), dtype=np.uint8)
-
         # 初始化 highlight_ratios
         highlight_ratios = {tuple(map(tuple, vertices)): 0 for vertices in chessboard_data['chessboard_vertices']}
 
@@ -1032,17 +1002,9 @@ class PoseEstimation:
                 highlight_ratios[cell_points_tuple] = self.highlight_counts.get(cell_points_tuple,
                                                                                 0) / total_highlights * 100
 
-        skeleton_canvas = draw_chessboard_on_frame(skeleton_canvas, chessboard_data, show_overlay=True,
-                                                   covered_area=self.covered_area, highlight_ratios=highlight_ratios)
-
-        # 被踩过，红框
-        if highlight_ratios:
-            for vertices in chessboard_data['chessboard_vertices']:
-                vertex_tuples = tuple(map(tuple, vertices))
-                if highlight_ratios[vertex_tuples] > 0:
-                    pts = np.array([(int(pt[0] * screen_width), int(pt[1] * screen_height)) for pt in vertices],
-                                   dtype=np.int32)
-                    cv2.polylines(skeleton_canvas, [pts], isClosed=True, color=(255, 0, 0), thickness=1)
+        # 预渲染的格子/编号/标定线 + 热力图，被踩过的格子带红框
+        skeleton_canvas = self.skeleton_compositor.canvas(screen_width, screen_height, chessboard_data,
+                                                          highlight_ratios=highlight_ratios)
 
         if arm_match:
             # 创建一个字典来记录
@@ -1074,6 +1036,11 @@ class PoseEstimation:
             self.cap.release()
             self.cap = None
 
+    def close_pose_worker(self):
+        if self.remote_pose is not None:
+            self.remote_pose.close()
+            self.remote_pose = None
+
     def save_chessboard_pattern(self, chessboard_params, grid_rects, red_cross_coords, camera_params):
         config = {
             "chessboard_params": chessboard_params,
@@ -1124,6 +1091,15 @@ class PoseApp:
 
         self.queue = queue.Queue(maxsize=1)  # 限制队列大小为1，确保最新的帧总是可用
 
+        # 脏矩形：各面板只登记自己变化的区域，由主循环统一刷新一次
+        self.dirty_rects = []
+        self.dirty_lock = threading.Lock()
+
+        # 采集到显示（glass-to-glass）延迟统计，单位：毫秒
+        self.pending_capture_time = None
+        self.latency_samples = deque(maxlen=300)
+        self.latency_last_report_time = None
+
         # 初始化 pygame 窗口
         pygame.init()
         self.screen = pygame.display.set_mode((1530, 930))
@@ -1148,8 +1124,11 @@ class PoseApp:
         self.data_panel_last_update_time = None
         self.speed_last_update_time = None
 
-        self.grid_count_bar_chart_update_interval = 5.0  # 高亮条形图更新间隔为5秒
-        self.grid_count_bar_chart_last_update_time = None  # 上次高亮条形图更新时间
+        # 高亮条形图：背景层只绘制一次，之后每帧只重画变化的柱子
+        self.heatmap_lut = build_heatmap_lut(self.norm, self.cmap)
+        self.grid_label_indices = grid_label_indices()
+        self.grid_count_chart = GridCountChart(self.layout['region2']['width'], self.layout['region2']['height'],
+                                               self.heatmap_lut)
 
         self.setup_ui()
 
@@ -1180,85 +1159,61 @@ class PoseApp:
             self.video_thread = None
 
     def update_grid_count_bar_chart(self, highlight_ratios, chessboard_data, covered_area):
-        current_time = time.time()
-
-        if self.grid_count_bar_chart_last_update_time is None:
-            self.grid_count_bar_chart_last_update_time = current_time - 100
-
-        if current_time - self.grid_count_bar_chart_last_update_time < self.grid_count_bar_chart_update_interval:
-            return  # 如果距离上次更新时间不足，直接返回
-
-        self.grid_count_bar_chart_last_update_time = current_time
-
-        chart_width = self.layout['region2']['width']
-        chart_height = self.layout['region2']['height']
-
-        print("region2 height:", chart_height)
-
-        # 创建一个图形对象，并设置尺寸
-        fig, ax = plt.subplots(figsize=(chart_width / 100, chart_height / 100), dpi=100)  # 调整图形的尺寸，以适应在帧左侧绘制
-
-        # 将格子编号特殊化处理，并按照指定顺序排列
-        label_order = [
-            "L22", "L21", "L20", "L12", "L11", "L10", "L02", "L01", "L00",
-            "R00", "R01", "R02", "R10", "R11", "R12", "R20", "R21", "R22"
-        ]
+        # 按指定顺序提取高亮占比数据
+        vertices = chessboard_data['chessboard_vertices']
+        percentages = [highlight_ratios.get(tuple(map(tuple, vertices[idx])), 0) for idx in self.grid_label_indices]
 
-        label_map = {
-            9: "R00", 6: "R01", 3: "R02", 8: "R10", 5: "R11", 2: "R12",
-            7: "R20", 4: "R21", 1: "R22", 12: "L00", 15: "L01", 18: "L02",
-            11: "L10", 14: "L11", 17: "L12", 10: "L20", 13: "L21", 16: "L22"
-        }
+        if not self.grid_count_chart.render(percentages, covered_area):
+            return  # 没有柱子发生变化，无需重新贴图
 
-        # 提取高亮占比数据并按照指定顺序排列
-        percentages = [highlight_ratios.get(tuple(map(tuple, chessboard_data['chessboard_vertices'][idx - 1])), 0) for
-                       label in label_order for idx, val in label_map.items() if val == label]
+        chart_surface = pygame.image.frombuffer(self.grid_count_chart.image.tobytes(),
+                                                (self.grid_count_chart.width, self.grid_count_chart.height), 'RGB')
+        self.screen.blit(chart_surface, (self.layout['region2']['x'], self.layout['region2']['y']))
+        self.mark_dirty('region2')
 
-        # 创建热力图颜色映射
-        norm, cmap = get_heatmap_settings()
+    def mark_dirty(self, region_name):
+        region = self.layout[region_name]
+        with self.dirty_lock:
+            self.dirty_rects.append(pygame.Rect(region['x'], region['y'], region['width'], region['height']))
 
-        # 绘制水平柱状图
-        bars = ax.barh(label_order, percentages, color=cmap(norm(percentages)), edgecolor='black')
-        # 在每个条形图后面显示百分比数值
-        for bar, percentage in zip(bars, percentages):
-            width = bar.get_width()
-            ax.text(width + 1, bar.get_y() + bar.get_height() / 2, f'{percentage:.1f}%', va='center', ha='left')
+    def flush_display(self):
+        with self.dirty_lock:
+            dirty_rects = self.dirty_rects
+            self.dirty_rects = []
 
-        # 设置X轴为百分比
-        ax.set_xlim(0, 100)
-        ax.set_xlabel('')
+        if dirty_rects:
+            # 只刷新本轮变化过的区域，而不是整个窗口
+            pygame.display.update(dirty_rects)
 
-        # 添加图表标题
-        ax.set_title(f'Covered Area: {covered_area:.2f} m²', fontsize=16)
+        if self.pending_capture_time is not None:
+            self.latency_samples.append((time.time() - self.pending_capture_time) * 1000)
+            self.pending_capture_time = None
+            self.report_latency()
 
-        # 添加热力刻度柱子
-        sm = plt.cm.ScalarMappable(cmap=cmap, norm=norm)
-        sm.set_array([])
-        cbar = plt.colorbar(sm, ax=ax)
-        cbar.set_ticks([0, 20, 40, 60, 80, 100])
-        cbar.set_ticklabels(['0%', '20%', '40%', '60%', '80%', '100%'])
+    def report_latency(self):
+        current_time = time.time()
 
-        # 将图表绘制到一个 numpy 数组
-        fig.canvas.draw()
-        chart_img = np.frombuffer(fig.canvas.buffer_rgba(), dtype=np.uint8)
-        chart_img = chart_img.reshape(fig.canvas.get_width_height()[::-1] + (4,))
+        if self.latency_last_report_time is None:
+            self.latency_last_report_time = current_time
 
-        # 关闭图形对象，释放资源
-        plt.close(fig)
+        if current_time - self.latency_last_report_time < LATENCY_REPORT_INTERVAL or not self.latency_samples:
+            return
 
-        # 去掉alpha通道
-        chart_img = chart_img[..., :3]
-        # 翻转
-        chart_img = np.rot90(chart_img, -1)
-        chart_img = np.fliplr(chart_img)
+        self.latency_last_report_time = current_time
+        samples = np.array(self.latency_samples)
+        if DEBUG:
+            print(f"Capture-to-display latency: p50 {np.percentile(samples, 50):.1f} ms, "
+                  f"p95 {np.percentile(samples, 95):.1f} ms, max {samples.max():.1f} ms "
+                  f"({len(samples)} frames)")
 
-        # 更新高亮条形图的显示
-        # chart_img_resized = cv2.resize(chart_img, (self.layout['region2']['width'], self.layout['region2']['height']))
+    def show_latest_frame(self):
+        try:
+            image, capture_time = self.queue.get_nowait()
+        except queue.Empty:
+            return  # 事件对应的帧已被取走
 
-        # 将图表转换为 Pygame 表面
-        chart_surface = pygame.surfarray.make_surface(chart_img)
-        self.screen.blit(chart_surface, (self.layout['region2']['x'], self.layout['region2']['y']))
-        pygame.display.update()
+        self.update_video_panel(image)
+        self.pending_capture_time = capture_time
 
     def update_mode_surface(self):
         mode_text = self.mode.replace("_", " ").title()
@@ -1282,7 +1237,7 @@ class PoseApp:
 
         # 将 mode_surface 绘制到屏幕上
         self.screen.blit(self.mode_surface, (centered_x, centered_y))
-        pygame.display.update()
+        self.mark_dirty('region4')
 
     def update_title_surface(self):
         title_text = f"{SYS_TITLE}"
@@ -1306,7 +1261,7 @@ class PoseApp:
 
         # 将 title_surface 绘制到屏幕上
         self.screen.blit(self.title_surface, (centered_x, centered_y))
-        pygame.display.update()
+        self.mark_dirty('region1')
 
     def create_label_surface(self, text, font, bg, fg):
         pygame_font = pygame.font.SysFont(font[0], font[1])
@@ -1346,13 +1301,13 @@ class PoseApp:
                 (self.layout['region3']['width'] - new_width) // 2,
                 (self.layout['region3']['height'] - new_height) // 2))
             self.screen.blit(self.video_surface, (self.layout['region3']['x'], self.layout['region3']['y']))
+            self.mark_dirty('region3')
         else:
             self.video_surface.blit(frame_resized, (
                 (self.layout['region6']['width'] - new_width) // 2,
                 (self.layout['region6']['height'] - new_height) // 2))
             self.screen.blit(self.video_surface, (self.layout['region6']['x'], self.layout['region6']['y']))
-
-        pygame.display.update()
+            self.mark_dirty('region6')
 
     def update_skeleton_surface(self, skeleton_canvas):
         # 颜色转换和图像旋转/翻转合并
@@ -1366,6 +1321,7 @@ class PoseApp:
             skeleton_surface = pygame.transform.scale(skeleton_surface, (
                 self.layout['region6']['width'], self.layout['region6']['height']))  # 调整显示大小
             self.screen.blit(skeleton_surface, (self.layout['region6']['x'], self.layout['region6']['y']))
+            self.mark_dirty('region6')
         else:
             # 计算右2/3部分的起始列
             width = skeleton_surface.get_width()
@@ -1380,8 +1336,7 @@ class PoseApp:
                 self.layout['region3']['width'], self.layout['region3']['height']))
 
             self.screen.blit(cropped_surface, (self.layout['region3']['x'], self.layout['region3']['y']))
-
-        pygame.display.update()
+            self.mark_dirty('region3')
 
     def update_data_panel(self, keypoints, match_results, speeds, swing_count, step_count, height_m):
         current_time = time.time()
@@ -1446,9 +1401,7 @@ class PoseApp:
                 bar_height = 20
                 pygame.draw.rect(panel_surface, (211, 211, 211), (bar_x, bar_y, bar_width, bar_height))
 
-                norm, cmap = get_heatmap_settings()
-                color = cmap(norm(percentage))[:3]
-                color = tuple(int(c * 255) for c in color)
+                color = lut_color(self.heatmap_lut, percentage)
                 fill_width = int(bar_width * (percentage / 100))
                 pygame.draw.rect(panel_surface, color, (bar_x, bar_y, fill_width, bar_height))
                 y_offset += bar_height + 5
@@ -1486,7 +1439,7 @@ class PoseApp:
         y_offset += text_surface.get_height() + 5
 
         self.screen.blit(panel_surface, (self.layout['region7']['x'], self.layout['region7']['y']))
-        pygame.display.update()
+        self.mark_dirty('region7')
 
     def setup_ui(self):
 
@@ -1566,7 +1519,7 @@ class PoseApp:
         speed_stats_surface = pygame.surfarray.make_surface(speed_stats_np)
 
         self.screen.blit(speed_stats_surface, (self.layout['region5']['x'], self.layout['region5']['y']))
-        pygame.display.update()
+        self.mark_dirty('region5')
         plt.close(fig)
 
     def mps_to_kph(self, speed_mps):
@@ -1580,6 +1533,7 @@ class PoseApp:
         if event.type == pygame.KEYDOWN:
             if event.key == pygame.K_ESCAPE:
                 self.pose_estimation.close_camera()
+                self.pose_estimation.close_pose_worker()
                 pygame.quit()
                 sys.exit()
             elif event.key == pygame.K_F5:
@@ -1629,26 +1583,21 @@ class PoseApp:
         self.video_thread.start()
 
     def main_loop(self):
-        clock = pygame.time.Clock()
-
         while True:
-            for event in pygame.event.get():
+            # 阻塞等待事件：分析线程每产出一帧会投递 FRAME_READY_EVENT，无需轮询休眠
+            events = [pygame.event.wait()] + pygame.event.get()
+            for event in events:
                 if event.type == pygame.QUIT:
                     self.pose_estimation.close_camera()
+                    self.pose_estimation.close_pose_worker()
                     pygame.quit()
                     sys.exit()
-                self.on_key_press(event)
-
-            # 从队列中读取图像并更新视频面板
-            if self.queue.empty():
-                time.sleep(0.1)
-                pass
-            else:
-                image = self.queue.get()
-                self.update_video_panel(image)
-                pygame.display.update()
+                elif event.type == FRAME_READY_EVENT:
+                    self.show_latest_frame()
+                else:
+                    self.on_key_press(event)
 
-            # clock.tick(5)  # 控制帧率
+            self.flush_display()
 
 
 if __name__ == "__main__":
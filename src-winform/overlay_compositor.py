@@ -0,0 +1,190 @@
+import cv2
+import numpy as np
+
+from chart_renderer import GRID_LABEL_MAP, lut_color
+
+GRID_COLOR = (0, 255, 0)
+HIGHLIGHT_BORDER_COLOR = (255, 0, 0)
+LINE_COLOR = (255, 255, 255)
+LABEL_COLOR = (255, 255, 255)
+
+# 标定线: (起点, 终点)
+CALIBRATION_LINES = [
+    ('right_top_vertex_img', 'vertical_end_point_img'),
+    ('horizontal_start_point_img', 'horizontal_end_point_img'),
+    ('horizontal_start_point_img', 'vertical_line_1_end_img'),
+    ('horizontal_end_point_img', 'vertical_line_2_end_img'),
+]
+
+
+class OverlayCompositor:
+    """
+    棋盘格叠加层合成器。
+
+    格子边框、编号和标定线只在标定结果或画面尺寸变化时预渲染一次；
+    热力图只重新着色颜色发生变化的格子 (颜色来自预先计算的 LUT)；
+    最终结果合成到预分配的输出缓冲区中，不再每帧 frame.copy() / np.zeros()。
+    """
+
+    def __init__(self, lut, buffer_count=1, border_color=HIGHLIGHT_BORDER_COLOR):
+        self.lut = lut
+        self.border_color = border_color  # Tk 界面按 BGR 绘制，需传入 (0, 0, 255)
+        # 输出缓冲区轮换使用，避免队列中尚未显示的帧被覆盖
+        self.buffer_count = buffer_count
+        self.buffers = []
+        self.buffer_index = 0
+
+        self.key = None
+        self.cell_keys = []
+        self.cell_pts = []
+        self.values = []
+        self.colors = []
+        self.highlighted = None
+
+    def prepare(self, width, height, chessboard_data):
+        """标定数据或尺寸变化时重建静态层，返回是否发生重建"""
+        vertices = chessboard_data['chessboard_vertices']
+        key = (width, height, tuple(tuple(map(tuple, cell)) for cell in vertices),
+               tuple(tuple(chessboard_data.get(name, ())) for name in
+                     ['right_top_vertex_img', 'vertical_end_point_img', 'horizontal_start_point_img',
+                      'horizontal_end_point_img', 'vertical_line_1_end_img', 'vertical_line_2_end_img']))
+        if key == self.key:
+            return False
+
+        self.key = key
+        self.width = width
+        self.height = height
+        self.cell_keys = [tuple(map(tuple, cell)) for cell in vertices]
+        self.cell_pts = [np.array([(int(pt[0] * width), int(pt[1] * height)) for pt in cell], dtype=np.int32)
+                         for cell in vertices]
+
+        # 静态层: 格子边框、编号、标定线
+        self.static_layer = np.zeros((height, width, 3), dtype=np.uint8)
+        self.static_mask = np.zeros((height, width), dtype=np.uint8)
+        for idx, pts in enumerate(self.cell_pts):
+            cv2.polylines(self.static_layer, [pts], isClosed=True, color=GRID_COLOR, thickness=1)
+            cv2.polylines(self.static_mask, [pts], isClosed=True, color=255, thickness=1)
+
+            center_x = int(np.mean(pts[:, 0]))
+            center_y = int(np.mean(pts[:, 1]))
+            text = GRID_LABEL_MAP.get(idx + 1, str(idx + 1))
+            cv2.putText(self.static_layer, text, (center_x, center_y + 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5,
+                        LABEL_COLOR, 1)
+            cv2.putText(self.static_mask, text, (center_x, center_y + 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, 255, 1)
+
+        for start_name, end_name in CALIBRATION_LINES:
+            if start_name in chessboard_data and end_name in chessboard_data:
+                start = (int(chessboard_data[start_name][0] * width), int(chessboard_data[start_name][1] * height))
+                end = (int(chessboard_data[end_name][0] * width), int(chessboard_data[end_name][1] * height))
+                cv2.line(self.static_layer, start, end, LINE_COLOR, 1)
+                cv2.line(self.static_mask, start, end, 255, 1)
+
+        # 热力图层和被踩格子的红框层，按需更新
+        self.tint_layer = np.zeros((height, width, 3), dtype=np.uint8)
+        self.tint_mask = np.zeros((height, width), dtype=np.uint8)
+        self.border_layer = np.zeros((height, width, 3), dtype=np.uint8)
+        self.border_mask = np.zeros((height, width), dtype=np.uint8)
+        self.values = [None] * len(self.cell_pts)
+        self.colors = [None] * len(self.cell_pts)
+        self.highlighted = None
+
+        # 只在叠加层覆盖的矩形范围内合成
+        all_pts = np.concatenate(self.cell_pts + [np.argwhere(self.static_mask)[:, ::-1].astype(np.int32)])
+        x, y, w, h = cv2.boundingRect(all_pts)
+        self.roi = (slice(max(0, y - 2), min(height, y + h + 2)), slice(max(0, x - 2), min(width, x + w + 2)))
+
+        self.buffers = [np.empty((height, width, 3), dtype=np.uint8) for _ in range(self.buffer_count)]
+        self.buffer_index = 0
+        return True
+
+    def update_heatmap(self, highlight_ratios):
+        """只重新着色 LUT 颜色变化的格子"""
+        for idx, cell_key in enumerate(self.cell_keys):
+            value = highlight_ratios.get(cell_key) if highlight_ratios else None
+            self.values[idx] = value
+            color = lut_color(self.lut, value) if value is not None else None
+            if color == self.colors[idx]:
+                continue
+
+            self.colors[idx] = color
+            pts = self.cell_pts[idx]
+            if color is None:
+                cv2.fillPoly(self.tint_mask, [pts], color=0)
+            else:
+                cv2.fillPoly(self.tint_layer, [pts], color=color)
+                cv2.fillPoly(self.tint_mask, [pts], color=255)
+
+        highlighted = tuple(idx for idx, value in enumerate(self.values) if value is not None and value > 0)
+        if highlighted != self.highlighted:
+            self.highlighted = highlighted
+            self.border_mask[:] = 0
+            for idx in highlighted:
+                cv2.polylines(self.border_layer, [self.cell_pts[idx]], isClosed=True, color=self.border_color,
+                              thickness=1)
+                cv2.polylines(self.border_mask, [self.cell_pts[idx]], isClosed=True, color=255, thickness=1)
+
+    def next_buffer(self):
+        buffer = self.buffers[self.buffer_index]
+        self.buffer_index = (self.buffer_index + 1) % self.buffer_count
+        return buffer
+
+    def compose(self, frame, chessboard_data, highlight_ratios=None):
+        """
+        将叠加层合成到下一个预分配缓冲区上。
+
+        参数:
+        - frame: 背景图像 (H, W, 3)，为 None 时使用黑色背景 (骨骼画布)
+        - chessboard_data: 包含归一化 chessboard_vertices 和标定线端点的字典
+        - highlight_ratios: {格子顶点元组: 占比} 字典，用于热力图着色
+        """
+        if frame is not None:
+            height, width, _ = frame.shape
+        else:
+            height, width = self.height, self.width
+        self.prepare(width, height, chessboard_data)
+        self.update_heatmap(highlight_ratios)
+
+        output = self.next_buffer()
+        if frame is not None:
+            np.copyto(output, frame)
+        else:
+            output[:] = 0
+
+        roi = self.roi
+        out_roi = output[roi]
+        # cv2.copyTo 按掩码原地写入 ROI 视图
+        cv2.copyTo(self.tint_layer[roi], self.tint_mask[roi], out_roi)
+        cv2.copyTo(self.static_layer[roi], self.static_mask[roi], out_roi)
+        if self.highlighted:
+            cv2.copyTo(self.border_layer[roi], self.border_mask[roi], out_roi)
+        return output
+
+    def canvas(self, width, height, chessboard_data, highlight_ratios=None):
+        """在黑色背景上合成 (用于骨骼画布)"""
+        self.prepare(width, height, chessboard_data)
+        return self.compose(None, chessboard_data, highlight_ratios)
+
+
+if __name__ == "__main__":
+    # 简单基准: 与逐帧重画的版本对比
+    import time
+    import matplotlib.colors as mcolors
+    import matplotlib.pyplot as plt
+    from chart_renderer import build_heatmap_lut
+
+    lut = build_heatmap_lut(mcolors.Normalize(vmin=0, vmax=100), plt.get_cmap('hot'))
+    cells = []
+    for row in range(6):
+        for col in range(3):
+            x0, y0 = 0.3 + col * 0.12, 0.3 + row * 0.1
+            cells.append([(x0, y0), (x0 + 0.12, y0), (x0 + 0.12, y0 + 0.1), (x0, y0 + 0.1)])
+    data = {'chessboard_vertices': cells}
+    ratios = {tuple(map(tuple, cell)): 0 for cell in cells}
+    frame = np.zeros((720, 1280, 3), dtype=np.uint8)
+
+    compositor = OverlayCompositor(lut, buffer_count=3)
+    start = time.time()
+    for i in range(200):
+        ratios[tuple(map(tuple, cells[i % 18]))] += 1
+        compositor.compose(frame, data, ratios)
+    print(f"compose: {(time.time() - start) / 200 * 1000:.3f} ms/frame")